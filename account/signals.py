@@ -0,0 +1,21 @@
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+
+from .models import Branch, User
+
+
+@receiver(m2m_changed, sender=Branch.admins.through)
+def forget_managed_branch(sender, instance, action, reverse, pk_set, **kwargs):
+    """Drop the memoized User.managed_branch when a user's assignments change"""
+    if reverse:
+        # Changed through user.managed_branches, so ``instance`` is the user
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            User.clear_managed_branch_caches([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        # Changed through branch.admins: ``pk_set`` names the users
+        User.clear_managed_branch_caches(pk_set)
+    elif action == 'pre_clear':
+        # clear() doesn't name the users, so note them before they are removed
+        instance._cleared_admin_ids = list(instance.admins.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        User.clear_managed_branch_caches(instance.__dict__.pop('_cleared_admin_ids', ()))
@@ -1,3 +1,38 @@
 from django.test import TestCase
 
-# Create your tests here.
+from .models import Branch, User
+
+
+class ManagedBranchMemoTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("branchadmin", user_type="branch_admin")
+        self.lagos = Branch.objects.create(name="Lagos", location="Ikeja", state="Lagos", address="x")
+        self.abuja = Branch.objects.create(name="Abuja", location="Wuse", state="FCT", address="x")
+
+    def test_changes_through_branch_admins(self):
+        self.assertIsNone(self.user.managed_branch)
+
+        self.lagos.admins.add(self.user)
+        self.assertEqual(self.user.managed_branch, self.lagos)
+
+        self.lagos.admins.remove(self.user)
+        self.assertIsNone(self.user.managed_branch)
+
+        self.abuja.admins.add(self.user)
+        self.assertEqual(self.user.managed_branch, self.abuja)
+
+        self.abuja.admins.clear()
+        self.assertIsNone(self.user.managed_branch)
+
+    def test_changes_through_user_managed_branches(self):
+        # Another instance of the same user, e.g. request.user
+        other = User.objects.get(pk=self.user.pk)
+        self.assertIsNone(other.managed_branch)
+
+        self.user.managed_branches.add(self.abuja)
+        self.assertEqual(self.user.managed_branch, self.abuja)
+        self.assertEqual(other.managed_branch, self.abuja)
+
+        self.user.managed_branches.clear()
+        self.assertIsNone(self.user.managed_branch)
+        self.assertIsNone(other.managed_branch)
@@ -11,6 +11,7 @@ from decimal import Decimal
 from .models import *
 from .forms import *
 from tripled.models import Commission, Realtor
+from tripled.ratelimit import login_throttled_message
 from django.core.paginator import Paginator
 
 
@@ -21,19 +22,10 @@ def login_view(request):
     if request.method == 'POST':
         form = LoginForm(request, data=request.POST)
         if form.is_valid():
-            username = form.cleaned_data.get('username')
-            password = form.cleaned_data.get('password')
             remember_me = form.cleaned_data.get('remember_me', False)
 
-            # Support email login
-            if '@' in username:
-                try:
-                    user_obj = User.objects.get(email=username)
-                    username = user_obj.username
-                except User.DoesNotExist:
-                    pass  # Let authenticate fail naturally
-
-            user = authenticate(request, username=username, password=password)
+            # Already authenticated by the form (username or email, see tripled.backends)
+            user = form.get_user()
             if user is not None:
                 if not user.is_active:
                     messages.error(request, 'Your account has been deactivated. Please contact the administrator.')
@@ -63,6 +55,8 @@ def login_view(request):
                 return redirect('accounting:dashboard')
             else:
                 messages.error(request, 'Invalid username or password.')
+        elif getattr(request, 'login_throttled', 0):
+            messages.error(request, login_throttled_message(request.login_throttled))
         else:
             # Convert form errors to messages
             for field, errors in form.errors.items():
@@ -242,15 +236,18 @@ def manage_users(request):
 
     from django.db.models import Count
 
-    users = User.objects.filter(user_type='branch_admin') \
-        .prefetch_related('managed_branches') \
-        .annotate(branch_count=Count('managed_branches', distinct=True)) \
+    users = User.prefetch_managed_branches(
+        User.objects.filter(user_type='branch_admin')
+        .annotate(branch_count=Count('managed_branches', distinct=True))
         .order_by('-date_joined')
+    )
 
-    total_admins = users.count()
-    active_admins = users.filter(is_active=True).count()
+    # The page lists every branch admin anyway, so count from the loaded rows
+    users = list(users)
+    total_admins = len(users)
+    active_admins = sum(1 for user in users if user.is_active)
     inactive_admins = total_admins - active_admins
-    unassigned_admins = users.filter(managed_branches__isnull=True).distinct().count()
+    unassigned_admins = sum(1 for user in users if not user.branch_count)
     total_assigned_branches = Branch.objects.filter(admins__user_type='branch_admin').distinct().count()
 
     branches = Branch.objects.filter(is_active=True).order_by('name')
@@ -0,0 +1,138 @@
+"""
+Route access policy for the secretary dashboard, admin portal and accounting app.
+
+ROUTE_POLICY is declarative: every entry names a URL (reversed once, when the
+policy is compiled) or a literal path, plus an ordered list of
+``(role, outcome)`` checks. The first role the user holds decides the
+outcome; ``'*'`` matches everyone.
+Role names come from ``tripled.helper.UserRoles.names``.
+
+compile_policy() turns the config into a path-segment trie, so enforcing it
+costs a single walk over the request path. The compiled RoutePolicy has no
+request or database dependencies and can be exercised on its own::
+
+    policy = compile_policy()
+    policy.check('/accounting/reports/', {'user_type:admin', 'chief_admin'})
+"""
+from django.urls import reverse
+
+ALLOW = None
+
+
+class Deny:
+    """Outcome of a failed check: redirect to ``redirect_to`` with an optional error"""
+
+    def __init__(self, redirect_to, message=None):
+        self.redirect_to = redirect_to
+        self.message = message
+
+    def __repr__(self):
+        return f"Deny({self.redirect_to!r})"
+
+
+SECRETARY_ONLY = "Access Denied. This dashboard is for Secretaries only."
+
+ROUTE_POLICY = [
+    # Secretary dashboard: secretaries and superusers only
+    {
+        "url": "secretary_dashboard",
+        "match": "prefix",
+        "checks": [
+            ("secretary", ALLOW),
+            ("superuser", ALLOW),
+            ("accountant", Deny("accounting:dashboard", SECRETARY_ONLY)),
+            ("*", Deny("user", SECRETARY_ONLY)),
+        ],
+    },
+    # Admin portal dashboard: keep secretaries (who aren't also admins) in their lane.
+    # Sub-pages are handled by their respective decorators (admin_required).
+    {
+        "url": "user",
+        "match": "exact",
+        "checks": [
+            ("chief_admin", ALLOW),
+            ("secretary", Deny("secretary_dashboard")),
+        ],
+    },
+    # Accounting app: superusers, chief accountants and branch admins. The old
+    # branch admin allow-list included '/accounting/' itself, which admitted
+    # them to every accounting URL; the views scope them to their branch.
+    {
+        "path": "/accounting/",
+        "match": "prefix",
+        "checks": [
+            ("superuser", ALLOW),
+            ("user_type:chief_accountant", ALLOW),
+            ("user_type:branch_admin", ALLOW),
+            ("user_type:secretary", Deny(
+                "secretary_dashboard",
+                "Access Denied. Secretaries are not authorized to access the Accounting system.",
+            )),
+            ("*", Deny(
+                "user",
+                "Access Denied. Only Chief Accountants and System Administrators can access the Accounting system.",
+            )),
+        ],
+    },
+]
+
+
+def _segments(path):
+    return [segment for segment in path.split("/") if segment]
+
+
+class _Node:
+    __slots__ = ("children", "prefix", "exact")
+
+    def __init__(self):
+        self.children = {}
+        self.prefix = None
+        self.exact = None
+
+
+class RoutePolicy:
+    """Prefix trie from URL path segments to ordered role checks"""
+
+    def __init__(self):
+        self.root = _Node()
+
+    def add(self, path, checks, exact=False):
+        node = self.root
+        for segment in _segments(path):
+            node = node.children.setdefault(segment, _Node())
+        if exact:
+            node.exact = tuple(checks)
+        else:
+            node.prefix = tuple(checks)
+
+    def lookup(self, path):
+        """Return the checks governing ``path``: an exact rule, else the longest prefix rule"""
+        node = self.root
+        checks = node.prefix
+        for segment in _segments(path):
+            node = node.children.get(segment)
+            if node is None:
+                return checks
+            if node.prefix is not None:
+                checks = node.prefix
+        return node.exact if node.exact is not None else checks
+
+    def evaluate(self, checks, role_names):
+        """Run looked-up ``checks`` for a user holding ``role_names``"""
+        for role, outcome in checks or ():
+            if role == "*" or role in role_names:
+                return outcome
+        return ALLOW
+
+    def check(self, path, role_names):
+        """Return the Deny outcome for a user holding ``role_names``, or None if allowed"""
+        return self.evaluate(self.lookup(path), role_names)
+
+
+def compile_policy(config=ROUTE_POLICY):
+    """Build a RoutePolicy from a declarative config (reverses the URL names)"""
+    policy = RoutePolicy()
+    for rule in config:
+        path = rule["path"] if "path" in rule else reverse(rule["url"])
+        policy.add(path, rule["checks"], exact=rule.get("match") == "exact")
+    return policy
@@ -1,10 +1,13 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.db import transaction
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
+from . import rollups
 from .models import (
-    User, Realtor, Commission, Property, PropertySale, Payment, General, SecretaryAdmin
+    User, Realtor, Commission, Property, PropertySale, Payment, General, SecretaryAdmin,
+    EmailOutbox,
 )
 
 
@@ -180,7 +183,12 @@ class CommissionAdmin(admin.ModelAdmin):
     
     def mark_as_unpaid(self, request, queryset):
         """Mark selected commissions as unpaid"""
-        count = queryset.update(is_paid=False, paid_date=None)
+        # update() skips the rollup signals, so refresh the slices it touched
+        with transaction.atomic():
+            buckets = rollups.commission_buckets(queryset)
+            count = queryset.update(is_paid=False, paid_date=None)
+            for bucket in buckets:
+                rollups.refresh_commission_bucket(*bucket)
         self.message_user(request, f'{count} commission(s) marked as unpaid.')
     mark_as_unpaid.short_description = 'Mark selected commissions as unpaid'
 
@@ -369,7 +377,7 @@ class PropertySaleAdmin(admin.ModelAdmin):
         if obj.client_picture:
             return format_html(
                 '<img src="{}" style="max-width: 200px; max-height: 200px;" />',
-                obj.client_picture.url
+                reverse('property_sale_client_picture', args=[obj.id])
             )
         return 'No image'
     client_picture_preview.short_description = 'Client Picture Preview'
@@ -487,6 +495,28 @@ class SecretaryAdminAdmin(admin.ModelAdmin):
     created_by_link.short_description = 'Created By'
 
 
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    """Admin interface for queued emails"""
+    list_display = ['subject', 'recipients', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['subject', 'to']
+    readonly_fields = ['attempts', 'last_error', 'created_at', 'sent_at']
+    actions = ['retry_now']
+
+    def recipients(self, obj):
+        return ', '.join(obj.to)
+    recipients.short_description = 'To'
+
+    @admin.action(description='Retry selected emails now')
+    def retry_now(self, request, queryset):
+        from django.utils import timezone
+        updated = queryset.exclude(status='sent').update(
+            status='pending', attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f"{updated} email(s) queued for another attempt.")
+
+
 # Customize admin site headers
 admin.site.site_header = "Triple D Big Dream Homes Administration"
 admin.site.site_title = "Triple D Big Dream Homes Admin"
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TripledConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tripled'
+
+    def ready(self):
+        # Register model signal handlers (dashboard rollups, cache invalidation)
+        from . import signals  # noqa: F401
@@ -0,0 +1,59 @@
+"""
+Authentication backend for the portal and accounting sign-in forms.
+
+Users sign in with their username or email address. The account is looked
+up with one query on the indexed username and email columns, and login
+attempts are throttled (see tripled.ratelimit.login_wait()) before the
+password is hashed, so credential-stuffing bursts are turned away without
+spending PBKDF2 time on them.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q
+
+from . import ratelimit
+
+
+class EmailOrUsernameBackend(ModelBackend):
+    def get_account(self, identifier):
+        """The user signing in as ``identifier``; a username match wins over an email match"""
+        UserModel = get_user_model()
+        matches = list(
+            UserModel._default_manager.filter(
+                Q(**{UserModel.USERNAME_FIELD: identifier}) | Q(email=identifier)
+            )[:2]
+        )
+        for user in matches:
+            if user.get_username() == identifier:
+                return user
+        # Email addresses aren't unique; an ambiguous one signs nobody in
+        return matches[0] if len(matches) == 1 else None
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if not username or password is None:
+            return None
+
+        user = self.get_account(username)
+        account = f"user:{user.pk}" if user else f"name:{username}"
+        if request is not None:
+            wait = ratelimit.login_wait(request, account)
+            if wait:
+                # Remembered for the sign-in views' message; stops authenticate() here
+                request.login_throttled = wait
+                raise PermissionDenied
+
+        if user is None:
+            # Hash anyway, so unknown accounts take as long as wrong passwords
+            UserModel().set_password(password)
+        elif user.check_password(password) and self.user_can_authenticate(user):
+            if request is not None:
+                ratelimit.login_succeeded(request, account)
+            return user
+
+        if request is not None:
+            ratelimit.login_failed(request, account)
+        return None
@@ -0,0 +1,133 @@
+"""
+Namespaced, versioned cache keys.
+
+A Namespace owns every key under ``tripled:<name>:``. Keys also embed the
+namespace's ``version`` (bump it in code when the shape of the cached values
+changes) and a generation token kept in the cache, so invalidate() expires
+the whole namespace at once, the way tripled.page_cache versions pages per
+model::
+
+    DASHBOARD = Namespace("dashboard", timeout=300)
+
+    stats = DASHBOARD.get_or_set(("stats", year), compute_stats)
+    DASHBOARD.get_many(["a", "b"])  # one round trip
+    DASHBOARD.invalidate()          # after the data changes
+
+Keys are a string/number or a tuple of them. get_or_set() guards against
+stampedes. A value stays in the cache for ``grace`` seconds past its
+timeout. The first caller that sees it stale takes a short lock and
+recomputes it, and the others keep getting the stale value meanwhile. On
+a cold miss, callers that lose the lock wait up to ``wait`` seconds for
+the winner's value before computing it themselves.
+"""
+import time
+import uuid
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+
+# Polling interval of callers waiting for another one to fill a key
+WAIT_STEP = 0.05
+
+
+class Namespace:
+    def __init__(self, name, version=1, timeout=300, grace=None, alias=DEFAULT_CACHE_ALIAS):
+        self.name = name
+        self.version = version
+        self.timeout = timeout
+        self.grace = timeout if grace is None else grace
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _generation(self):
+        key = f"tripled:{self.name}:generation"
+        generation = self.cache.get(key)
+        if generation is None:
+            generation = uuid.uuid4().hex[:12]
+            # Another worker may have created it meanwhile; keep whichever won
+            if not self.cache.add(key, generation, None):
+                generation = self.cache.get(key, generation)
+        return generation
+
+    def key(self, key, generation=None):
+        """The full cache key of ``key`` in this namespace"""
+        parts = key if isinstance(key, tuple) else (key,)
+        generation = generation or self._generation()
+        return ":".join(["tripled", self.name, f"v{self.version}", generation, *map(str, parts)])
+
+    def invalidate(self):
+        """Expire every key of the namespace"""
+        self.cache.set(f"tripled:{self.name}:generation", uuid.uuid4().hex[:12], None)
+
+    # Values are stored as (value, fresh_until) and kept ``grace`` seconds past
+    # fresh_until, for get_or_set() to serve while one caller recomputes them
+    def _entry(self, value, timeout):
+        timeout = self.timeout if timeout is None else timeout
+        return (value, time.time() + timeout), timeout + self.grace
+
+    def get(self, key, default=None):
+        entry = self.cache.get(self.key(key))
+        if entry is None or entry[1] <= time.time():
+            return default
+        return entry[0]
+
+    def set(self, key, value, timeout=None):
+        entry, cache_timeout = self._entry(value, timeout)
+        self.cache.set(self.key(key), entry, cache_timeout)
+
+    def delete(self, key):
+        self.cache.delete(self.key(key))
+
+    def get_many(self, keys):
+        """{key: value} for the ``keys`` that are cached and fresh"""
+        generation = self._generation()
+        full_keys = {self.key(key, generation): key for key in keys}
+        now = time.time()
+        return {
+            full_keys[full_key]: value
+            for full_key, (value, fresh_until) in self.cache.get_many(full_keys).items()
+            if fresh_until > now
+        }
+
+    def set_many(self, mapping, timeout=None):
+        generation = self._generation()
+        timeout = self.timeout if timeout is None else timeout
+        fresh_until = time.time() + timeout
+        self.cache.set_many(
+            {self.key(key, generation): (value, fresh_until) for key, value in mapping.items()},
+            timeout + self.grace,
+        )
+
+    def get_or_set(self, key, compute, timeout=None, lock_timeout=30, wait=5):
+        """
+        The cached value of ``key``, computing it with ``compute()`` (and
+        caching it for ``timeout`` seconds) when it's missing or stale
+        """
+        full_key = self.key(key)
+        lock_key = f"{full_key}:lock"
+
+        entry = self.cache.get(full_key)
+        if entry is not None:
+            value, fresh_until = entry
+            if fresh_until > time.time() or not self.cache.add(lock_key, 1, lock_timeout):
+                return value  # fresh, or stale while another caller refreshes it
+        elif not self.cache.add(lock_key, 1, lock_timeout):
+            deadline = time.monotonic() + wait
+            while time.monotonic() < deadline:
+                time.sleep(WAIT_STEP)
+                entry = self.cache.get(full_key)
+                if entry is not None:
+                    return entry[0]
+            # The lock holder is too slow (or died); compute without it
+            value = compute()
+            self.cache.set(full_key, *self._entry(value, timeout))
+            return value
+
+        try:
+            value = compute()
+            self.cache.set(full_key, *self._entry(value, timeout))
+            return value
+        finally:
+            self.cache.delete(lock_key)
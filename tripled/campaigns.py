@@ -0,0 +1,260 @@
+"""
+Bulk email campaigns.
+
+A Campaign records what was sent and to whom: an audience plus either
+hand-picked ids or recipient filters (a segment). Recipients are resolved
+server-side as a queryset and streamed into the outbox. Its per-recipient emails are EmailOutbox rows carrying the campaign and
+the recipient's id, so the outbox worker delivers them like any other mail and
+their status (pending/sending/sent/failed) is the recipient's status.
+
+queue() only creates rows for recipients that don't have one yet, so running
+it again resumes a campaign whose queueing was interrupted. Two resumes may
+race (a double click, a retried request); the unique (campaign, recipient)
+constraint keeps a recipient from getting two emails, and the rows the other
+run inserted first are skipped. retry_failed() puts just the failed
+recipients back in the queue. A resumed filter-based campaign also picks up
+new matches.
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+from django.core.mail import BadHeaderError
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from . import mail_templates
+from .models import Campaign, EmailOutbox, EmailSegment, Property, PropertySale, Realtor
+from .outbox import ENQUEUE_CHUNK_SIZE, build, enqueue_many
+
+FAILURES_SHOWN = 50
+PAGE_SIZE = 50
+# Matches PropertySale.development_status
+EXPIRING_WITHIN = timedelta(days=180)
+
+
+def client_fields(sale):
+    return {
+        "client_name": sale.client_name,
+        "reference_number": sale.reference_number,
+        "estate": sale.property_item.name,
+        "property_type": sale.get_property_type_display(),
+    }
+
+
+def realtor_fields(realtor):
+    return {
+        "full_name": realtor.full_name,
+        "email": realtor.email,
+        "phone": realtor.phone or "Not provided",
+        "status": realtor.status_display,
+        "referral_code": realtor.referral_code,
+    }
+
+
+def filter_clients(filters):
+    sales = PropertySale.objects.select_related("property_item").order_by("-created_at")
+    if filters.get("q"):
+        q = filters["q"]
+        sales = sales.filter(
+            Q(client_name__icontains=q) | Q(reference_number__icontains=q) | Q(client_email__icontains=q)
+        )
+    if filters.get("estate", "").isdigit():
+        sales = sales.filter(property_item_id=filters["estate"])
+    if filters.get("property_type"):
+        sales = sales.filter(property_type=filters["property_type"])
+    if filters.get("payment_status") == "fully_paid":
+        sales = sales.filter(amount_paid__gte=F("selling_price"))
+    elif filters.get("payment_status") == "partially_paid":
+        sales = sales.filter(amount_paid__lt=F("selling_price"))
+    status = filters.get("development_status")
+    if status == "developed":
+        sales = sales.filter(is_developed=True)
+    elif status:
+        today = timezone.now().date()
+        sales = sales.filter(is_developed=False)
+        if status == "expired":
+            sales = sales.filter(plot_development_expiry_date__lt=today)
+        elif status == "expiring":
+            sales = sales.filter(plot_development_expiry_date__range=(today, today + EXPIRING_WITHIN))
+        elif status == "valid":
+            sales = sales.filter(plot_development_expiry_date__gt=today + EXPIRING_WITHIN)
+        elif status == "no_timeline":
+            sales = sales.filter(plot_development_expiry_date__isnull=True)
+    return sales
+
+
+def filter_realtors(filters):
+    realtors = Realtor.objects.order_by("-created_at")
+    if filters.get("q"):
+        q = filters["q"]
+        realtors = realtors.filter(
+            Q(first_name__icontains=q) | Q(last_name__icontains=q)
+            | Q(email__icontains=q) | Q(referral_code__icontains=q)
+        )
+    if filters.get("status"):
+        realtors = realtors.filter(status=filters["status"])
+    if filters.get("has_email") == "has_email":
+        realtors = realtors.exclude(email__isnull=True).exclude(email="")
+    elif filters.get("has_email") == "no_email":
+        realtors = realtors.filter(Q(email__isnull=True) | Q(email=""))
+    return realtors
+
+
+Audience = namedtuple("Audience", "filter_fields filter email_field template fields")
+
+AUDIENCES = {
+    "clients": Audience(
+        ("q", "estate", "property_type", "payment_status", "development_status"),
+        filter_clients,
+        "client_email",
+        "emails/bulk_client.txt",
+        client_fields,
+    ),
+    "realtors": Audience(
+        ("q", "status", "has_email"),
+        filter_realtors,
+        "email",
+        "emails/bulk_realtor.txt",
+        realtor_fields,
+    ),
+}
+
+BUILTIN_SEGMENTS = {
+    "clients": [
+        ("Clients with expired development timelines", {"development_status": "expired"}),
+        ("Clients with timelines expiring soon", {"development_status": "expiring"}),
+        ("Clients with outstanding balances", {"payment_status": "partially_paid"}),
+    ],
+    "realtors": [
+        ("Executive realtors", {"status": "executive"}),
+        ("Regular realtors", {"status": "regular"}),
+    ],
+}
+
+
+def clean_filters(audience, data):
+    """The audience's filters present in ``data`` (a dict or QueryDict), as strings"""
+    return {
+        field: str(data.get(field)).strip()
+        for field in AUDIENCES[audience].filter_fields
+        if data.get(field) not in (None, "") and str(data.get(field)).strip()
+    }
+
+
+def filter_recipients(audience, filters):
+    """Every row matching the filters, with or without an email address"""
+    return AUDIENCES[audience].filter(filters)
+
+
+def recipients(audience, ids=None, filters=None):
+    """Queryset of the recipients to mail: the given ids, or else everyone matching the filters"""
+    field = AUDIENCES[audience].email_field
+    rows = filter_recipients(audience, {} if ids else filters or {})
+    if ids:
+        rows = rows.filter(id__in=ids)
+    return rows.exclude(**{f"{field}__isnull": True}).exclude(**{field: ""})
+
+
+def segments(audience):
+    """(name, filters) of the built-in segments, one per estate for clients, then the saved ones"""
+    options = list(BUILTIN_SEGMENTS[audience])
+    if audience == "clients":
+        options += [
+            (f"All clients of {name}", {"estate": str(pk)})
+            for pk, name in Property.objects.order_by("name").values_list("id", "name")
+        ]
+    options += [
+        (segment.name, clean_filters(audience, segment.filters))
+        for segment in EmailSegment.objects.filter(audience=audience)
+    ]
+    return options
+
+
+def create(audience, subject, message, ids=None, filters=None, segment="", user=None):
+    """
+    Record a new campaign to the hand-picked ``ids``, or to everyone matching
+    ``filters``; raises BadHeaderError for a multi-line subject.
+    """
+    if "\n" in subject or "\r" in subject:
+        raise BadHeaderError("Header values can't contain newlines")
+    ids = list(ids or [])
+    filters = {} if ids else clean_filters(audience, filters or {})
+    return Campaign.objects.create(
+        audience=audience,
+        subject=subject,
+        message=message,
+        recipient_ids=ids,
+        filters=filters,
+        segment=segment,
+        total=recipients(audience, ids, filters).count(),
+        created_by=user if user and user.is_authenticated else None,
+    )
+
+
+def queue(campaign):
+    """Queue an email for every recipient not queued yet; returns how many were added"""
+    audience = AUDIENCES[campaign.audience]
+    pending = recipients(campaign.audience, campaign.recipient_ids, campaign.filters).exclude(
+        pk__in=campaign.emails.values("recipient_id")
+    )
+
+    def rows():
+        template = None
+        for recipient in pending.iterator(chunk_size=ENQUEUE_CHUNK_SIZE):
+            address = getattr(recipient, audience.email_field)
+            try:
+                values = audience.fields(recipient)
+                # Compiled once per mailing; each email only fills in its fields
+                template = template or mail_templates.compiled(
+                    audience.template, values.keys(), message=campaign.message
+                )
+                body, _ = template.render(values)
+                row = build(campaign.subject, body, [address])
+            except Exception as exc:
+                # Keep the recipient on the books as failed rather than dropping it
+                row = EmailOutbox(
+                    subject=campaign.subject, body="", to=[address], status="failed",
+                    last_error=f"{type(exc).__name__}: {exc}",
+                )
+            row.campaign = campaign
+            row.recipient_id = recipient.pk
+            yield row
+
+    queued_before = campaign.emails.count()
+    enqueue_many(rows(), ignore_conflicts=True)
+    campaign.queued_at = timezone.now()
+    campaign.save(update_fields=["queued_at"])
+    return campaign.emails.count() - queued_before
+
+
+def retry_failed(campaign):
+    """Queue the failed recipients again; returns how many"""
+    return campaign.emails.filter(status="failed").update(
+        status="pending", attempts=0, last_error="", next_attempt_at=timezone.now()
+    )
+
+
+def progress(campaign):
+    """Counts per recipient status, plus the latest failures"""
+    counts = campaign.emails.aggregate(
+        queued=Count("id", filter=Q(status__in=("pending", "sending"))),
+        retrying=Count("id", filter=Q(status="pending", attempts__gt=0)),
+        sent=Count("id", filter=Q(status="sent")),
+        failed=Count("id", filter=Q(status="failed")),
+    )
+    failures = [
+        {"email": ", ".join(row["to"]), "error": row["last_error"]}
+        for row in campaign.emails.filter(status="failed")
+        .order_by("-id")
+        .values("to", "last_error")[:FAILURES_SHOWN]
+    ]
+    return {
+        "campaign_id": campaign.id,
+        "subject": campaign.subject,
+        "total": campaign.total,
+        # Not fully queued: the request queueing it died; resume() finishes the job
+        "interrupted": campaign.queued_at is None,
+        "done": campaign.queued_at is not None and counts["queued"] == 0,
+        **counts,
+        "failures": failures,
+    }
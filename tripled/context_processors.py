@@ -6,8 +6,9 @@ def general_settings(request):
     Ensures 'general_settings' variable is available in all templates.
     """
     try:
-        # Get the first (and only) General object, or None if it doesn't exist
-        general = General.objects.first()
+        # Get the first (and only) General object, or None if it doesn't exist.
+        # Served from the per-process settings cache, so no query per render.
+        general = General.load(create=False)
         return {'general_settings': general}
     except Exception:
         # Fail gracefully if database is not ready or other error
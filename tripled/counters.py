@@ -0,0 +1,88 @@
+"""
+Buffered download counters.
+
+With a cache whose incr is atomic (redis or memcached, see
+settings.CACHE_HAS_ATOMIC_INCR), download_form() doesn't write to the
+database: increment_download() bumps a per-form counter in the cache.
+flush_downloads() moves the buffered counts into
+DownloadableForm.download_count with one F() UPDATE per form. It runs at most
+every FLUSH_INTERVAL seconds from the request path, and
+``manage.py flush_counters`` runs it on demand (e.g. before shutdown).
+Counters are stored without an expiry, so Redis's volatile-* eviction
+policies never drop them.
+
+Flushes take turns (FLUSH_MUTEX_KEY), and counts are taken out of the cache
+with decr before they are applied, so increments that race with a flush are
+kept for the next one and none are counted twice. A counter evicted after it
+was read is still applied. The stored totals are exact once everything has
+been flushed.
+
+Any other cache (the file cache, or one per process) would lose increments,
+so each download is written straight to the database instead.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import DownloadableForm
+
+FLUSH_INTERVAL = getattr(settings, "DOWNLOAD_COUNTER_FLUSH_INTERVAL", 60)
+FLUSH_LOCK_KEY = "tripled:counters:downloads:flush"
+# Held while a flush runs; expires in case its worker dies mid-flush
+FLUSH_MUTEX_KEY = "tripled:counters:downloads:flushing"
+FLUSH_MUTEX_TIMEOUT = 60
+
+
+def _key(form_id):
+    return f"tripled:counters:downloads:{form_id}"
+
+
+def increment_download(form_id):
+    """Count one download of a form, flushing the buffer when it is due"""
+    if not getattr(settings, "CACHE_HAS_ATOMIC_INCR", False):
+        DownloadableForm.objects.filter(id=form_id).update(download_count=F("download_count") + 1)
+        return
+
+    key = _key(form_id)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, 1, None)
+
+    # Whoever claims the lock flushes; everyone else skips until it expires
+    if cache.add(FLUSH_LOCK_KEY, time.time(), FLUSH_INTERVAL):
+        flush_downloads(wait=0)
+
+
+def flush_downloads(wait=10):
+    """
+    Apply all buffered download counts to the database; returns the number
+    applied. Waits up to ``wait`` seconds for a flush already running.
+    """
+    deadline = time.monotonic() + wait
+    while not cache.add(FLUSH_MUTEX_KEY, 1, FLUSH_MUTEX_TIMEOUT):
+        if time.monotonic() >= deadline:
+            return 0  # the running flush applies what is buffered
+        time.sleep(0.1)
+
+    try:
+        ids = list(DownloadableForm.objects.values_list("id", flat=True))
+        pending = cache.get_many([_key(form_id) for form_id in ids])
+        applied = 0
+        for form_id in ids:
+            count = pending.get(_key(form_id)) or 0
+            if count <= 0:
+                continue
+            try:
+                cache.decr(_key(form_id), count)
+            except ValueError:
+                pass  # evicted since it was read; the count read is still owed
+            DownloadableForm.objects.filter(id=form_id).update(download_count=F("download_count") + count)
+            applied += count
+        return applied
+    finally:
+        cache.delete(FLUSH_MUTEX_KEY)
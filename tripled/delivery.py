@@ -0,0 +1,137 @@
+"""
+File delivery for downloads and protected media.
+
+serve_file() hands the transfer to the front web server when FILE_DELIVERY
+is configured, so a Gunicorn worker only spends a few milliseconds per
+download:
+
+* ``x-accel`` (nginx): responds with ``X-Accel-Redirect`` pointing at
+  FILE_DELIVERY_ACCEL_PREFIX + file name. Map that prefix to MEDIA_ROOT in
+  an ``internal`` location, e.g.
+  ``location /protected-media/ { internal; alias /app/media/; }``. Files in
+  PrivateStorage use FILE_DELIVERY_PRIVATE_ACCEL_PREFIX, mapped the same way
+  to PRIVATE_MEDIA_ROOT (which must not be under any public location).
+* ``x-sendfile`` (Apache mod_xsendfile, lighttpd): responds with
+  ``X-Sendfile`` set to the absolute file path.
+
+Otherwise (the default, ``django``) the file is streamed with FileResponse,
+which uses the server's sendfile for whole files, and single byte ranges are
+answered with 206 Partial Content so resumed downloads and media seeking
+don't start over.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+CHUNK_SIZE = 64 * 1024
+
+
+class _RangeReader:
+    """Read at most ``length`` bytes from ``fileobj`` starting at ``start``"""
+
+    def __init__(self, fileobj, start, length):
+        self.fileobj = fileobj
+        self.remaining = length
+        fileobj.seek(start)
+
+    def read(self, size=CHUNK_SIZE):
+        if self.remaining <= 0:
+            return b""
+        data = self.fileobj.read(min(size if size > 0 else CHUNK_SIZE, self.remaining))
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.fileobj.close()
+
+
+def _parse_range(header, size):
+    """Return (start, end) for a single satisfiable byte range, False if unsatisfiable, None to ignore"""
+    match = RANGE_RE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None  # multiple or malformed ranges: send the whole file
+    first, last = match.groups()
+    if first == "":
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _offloaded(fieldfile, content_type, disposition):
+    backend = getattr(settings, "FILE_DELIVERY", "django")
+    if backend == "x-accel":
+        prefix = getattr(fieldfile.storage, "accel_prefix", None) or getattr(
+            settings, "FILE_DELIVERY_ACCEL_PREFIX", "/protected-media/"
+        )
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = prefix + quote(fieldfile.name)
+    elif backend == "x-sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = fieldfile.storage.path(fieldfile.name)
+    else:
+        return None
+    if disposition:
+        response["Content-Disposition"] = disposition
+    return response
+
+
+def serve_file(request, fieldfile, as_attachment=False, filename=None, content_type=None):
+    """
+    Return a response delivering ``fieldfile`` (a FieldFile on local storage).
+    Raises FileNotFoundError if the file is missing.
+    """
+    filename = filename or os.path.basename(fieldfile.name)
+    if content_type is None:
+        content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    disposition = content_disposition_header(as_attachment, filename)
+
+    path = fieldfile.storage.path(fieldfile.name)
+    stat = os.stat(path)  # FileNotFoundError for missing files, whatever the backend
+
+    response = _offloaded(fieldfile, content_type, disposition)
+    if response is not None:
+        return response
+
+    size = stat.st_size
+    last_modified = http_date(stat.st_mtime)
+    byte_range = None
+    range_header = request.META.get("HTTP_RANGE")
+    if range_header and request.method in ("GET", "HEAD"):
+        # If-Range: only honour the range while the file is unchanged
+        if_range = request.META.get("HTTP_IF_RANGE")
+        if not if_range or parse_http_date_safe(if_range) == int(stat.st_mtime):
+            byte_range = _parse_range(range_header, size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+    elif byte_range:
+        start, end = byte_range
+        response = FileResponse(
+            _RangeReader(open(path, "rb"), start, end - start + 1),
+            status=206,
+            content_type=content_type,
+        )
+        response["Content-Length"] = str(end - start + 1)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        if disposition:
+            response["Content-Disposition"] = disposition
+    else:
+        response = FileResponse(
+            open(path, "rb"), as_attachment=as_attachment, filename=filename, content_type=content_type
+        )
+    response["Accept-Ranges"] = "bytes"
+    response["Last-Modified"] = last_modified
+    return response
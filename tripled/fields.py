@@ -0,0 +1,139 @@
+"""
+Image fields that normalize uploads before they reach storage.
+
+NormalizedImageField downscales images to ``max_dimension`` on their longest
+side, applies and then drops EXIF (orientation, GPS, camera data) and
+recompresses them: JPEG for opaque images, optimized PNG when there is
+transparency. Memory stays bounded per upload: JPEGs are decoded at a reduced
+scale via Image.draft(), other formats are refused before decoding when they
+hold more than MAX_PIXELS pixels, and the output is spooled to a temporary
+file once it grows past SPOOL_MAX_SIZE. Files Pillow cannot read (and
+animations) are stored untouched.
+"""
+import logging
+import os
+from tempfile import SpooledTemporaryFile
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import models
+from django.db.models.fields.files import ImageFieldFile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_DIMENSION = 2560
+DEFAULT_QUALITY = 85
+SPOOL_MAX_SIZE = 2 * 1024 * 1024
+# Decoded size budget, about 200MB as RGBA; PNG, WebP and TIFF have no draft mode
+MAX_PIXELS = 50_000_000
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+def open_image(content, max_dimension=DEFAULT_MAX_DIMENSION):
+    """
+    Open the image in ``content`` (headers only) for decoding at up to
+    ``max_dimension``; raises ImageTooLarge when it would still decode to more
+    than MAX_PIXELS pixels
+    """
+    from PIL import Image
+
+    content.seek(0)
+    try:
+        image = Image.open(content)
+    except Image.DecompressionBombError:
+        raise ImageTooLarge("This image has too many pixels to process.")
+    if image.format in ("JPEG", "MPO"):
+        # Let the decoder downscale by 1/2, 1/4 or 1/8 while reading
+        image.draft("RGB", (max_dimension, max_dimension))
+    width, height = image.size
+    if width * height > MAX_PIXELS:
+        raise ImageTooLarge(
+            f"This image is {width}x{height} pixels; "
+            f"upload one under {MAX_PIXELS // 1_000_000} megapixels."
+        )
+    return image
+
+
+def normalize_image(content, name, max_dimension=DEFAULT_MAX_DIMENSION, quality=DEFAULT_QUALITY):
+    """Return ``(content, name)`` for the normalized image, or the input unchanged"""
+    from PIL import Image, ImageOps
+
+    try:
+        image = open_image(content, max_dimension)
+        if getattr(image, "is_animated", False):
+            content.seek(0)
+            return content, name
+        icc_profile = image.info.get("icc_profile")
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+
+        output = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        has_alpha = image.mode in ("RGBA", "LA") or (
+            image.mode == "P" and "transparency" in image.info
+        )
+        if has_alpha:
+            image.save(output, "PNG", optimize=True)
+            extension = ".png"
+        else:
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            image.save(
+                output, "JPEG", quality=quality, optimize=True, progressive=True,
+                icc_profile=icc_profile,
+            )
+            extension = ".jpg"
+        output.seek(0)
+    except ImageTooLarge:
+        raise
+    except Exception:
+        logger.warning("Storing %s without normalization", name, exc_info=True)
+        content.seek(0)
+        return content, name
+
+    name = os.path.splitext(name)[0] + extension
+    return File(output, name=os.path.basename(name)), name
+
+
+def validate_pixel_budget(fieldfile):
+    """Reject new uploads that open_image() would refuse, before they are saved"""
+    if not fieldfile or getattr(fieldfile, "_committed", True):
+        return
+    try:
+        open_image(fieldfile.file)
+    except ImageTooLarge as error:
+        raise ValidationError(str(error), code="image_too_large")
+    except Exception:
+        pass  # Unreadable files are stored untouched
+    finally:
+        fieldfile.file.seek(0)
+
+
+class NormalizedImageFieldFile(ImageFieldFile):
+    def save(self, name, content, save=True):
+        content, name = normalize_image(
+            content, name, self.field.max_dimension, self.field.quality
+        )
+        super().save(name, content, save)
+
+
+class NormalizedImageField(models.ImageField):
+    """ImageField that downscales, strips metadata and recompresses uploads"""
+
+    attr_class = NormalizedImageFieldFile
+    default_validators = [validate_pixel_budget]
+
+    def __init__(self, *args, max_dimension=DEFAULT_MAX_DIMENSION, quality=DEFAULT_QUALITY, **kwargs):
+        self.max_dimension = max_dimension
+        self.quality = quality
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.max_dimension != DEFAULT_MAX_DIMENSION:
+            kwargs["max_dimension"] = self.max_dimension
+        if self.quality != DEFAULT_QUALITY:
+            kwargs["quality"] = self.quality
+        return name, path, args, kwargs
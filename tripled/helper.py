@@ -1,10 +1,79 @@
 from functools import wraps
 from django.shortcuts import redirect
 from django.contrib import messages
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
 from .models import SecretaryAdmin
 
 
+# Secretary status is the only role fact that needs a query, so it is cached
+# per user and dropped by tripled.signals whenever SecretaryAdmin/User change.
+# That drop must reach every worker, so without a shared cache (see
+# settings.CACHE_IS_SHARED) roles are resolved once per request instead.
+ROLE_CACHE_TIMEOUT = 60 * 60
+
+
+def role_cache_key(user_id):
+    return f"tripled:roles:{user_id}"
+
+
+def invalidate_roles(user_id):
+    """Forget the cached roles of a user (call after SecretaryAdmin/User writes)"""
+    cache.delete(role_cache_key(user_id))
+
+
+class UserRoles:
+    """Role flags for one user, resolved once and shared by middleware and decorators"""
+
+    def __init__(self, user, secretary_status=None):
+        # secretary_status: None (no secretary account), 'active' or 'inactive'
+        authenticated = user.is_authenticated
+        self.secretary_status = secretary_status
+        self.has_secretary_account = secretary_status is not None
+        self.is_secretary = secretary_status == 'active'
+        self.is_admin = authenticated and (user.is_superuser or user.is_staff)
+        self.is_chief_admin = authenticated and (user.is_superuser or user.user_type == 'admin')
+        self.is_accountant = authenticated and user.user_type in ['chief_accountant', 'branch_admin']
+
+        # Role names understood by tripled.access_policy
+        names = set()
+        if authenticated:
+            names.add(f'user_type:{user.user_type}')
+            if user.is_superuser:
+                names.add('superuser')
+        for name in ('is_secretary', 'is_admin', 'is_chief_admin', 'is_accountant'):
+            if getattr(self, name):
+                names.add(name[3:])
+        self.names = frozenset(names)
+
+
+def get_user_roles(user):
+    """Resolve a user's roles, hitting SecretaryAdmin only on a cache miss"""
+    if not user.is_authenticated:
+        return UserRoles(user)
+
+    shared = getattr(settings, 'CACHE_IS_SHARED', False)
+    key = role_cache_key(user.pk)
+    status = cache.get(key) if shared else None
+    if status is None:
+        is_active = SecretaryAdmin.objects.filter(user=user).values_list('is_active', flat=True).first()
+        status = 'none' if is_active is None else ('active' if is_active else 'inactive')
+        if shared:
+            cache.set(key, status, ROLE_CACHE_TIMEOUT)
+    return UserRoles(user, None if status == 'none' else status)
+
+
+def get_roles(request):
+    """Roles of request.user, memoized on the request"""
+    cached = getattr(request, '_user_roles', None)
+    # login()/logout() swap request.user mid-request, so key the memo on it
+    if cached is None or cached[0] != request.user.pk:
+        cached = (request.user.pk, get_user_roles(request.user))
+        request._user_roles = cached
+    return cached[1]
+
+
 def admin_required(view_func):
     """
     Decorator that ensures only admin users (not secretaries) can access the view.
@@ -23,14 +92,13 @@ def admin_required(view_func):
             return view_func(request, *args, **kwargs)
         
         # If not admin, check if they're a secretary and redirect appropriately
-        try:
-            secretary = SecretaryAdmin.objects.get(user=request.user)
+        if get_roles(request).has_secretary_account:
             messages.error(request, 'Access denied. Admin privileges required.')
             return redirect('secretary_dashboard')
-        except SecretaryAdmin.DoesNotExist:
-            # User is neither admin nor secretary - redirect to login
-            messages.error(request, 'Access denied. Please contact administrator.')
-            return redirect('signin')
+
+        # User is neither admin nor secretary - redirect to login
+        messages.error(request, 'Access denied. Please contact administrator.')
+        return redirect('signin')
     
     return wrapper
 
@@ -58,13 +126,12 @@ def admin_required_custom(view_func):
             return view_func(request, *args, **kwargs)
         
         # Not an admin - check if secretary for appropriate redirect
-        try:
-            secretary = SecretaryAdmin.objects.get(user=request.user)
+        if get_roles(request).has_secretary_account:
             messages.error(request, 'Access denied. Admin privileges required.')
             return redirect('secretary_dashboard')
-        except SecretaryAdmin.DoesNotExist:
-            messages.error(request, 'Access denied. Please contact administrator.')
-            return redirect('signin')
+
+        messages.error(request, 'Access denied. Please contact administrator.')
+        return redirect('signin')
     
     return wrapper
 
@@ -81,14 +148,10 @@ def admin_or_secretary_required(view_func):
             return redirect('signin')
         
         # Check if user is a secretary and if they're active
-        try:
-            secretary = SecretaryAdmin.objects.get(user=request.user)
-            if not secretary.is_active:
-                messages.error(request, 'Your secretary account is inactive.')
-                return redirect('signin')
-        except SecretaryAdmin.DoesNotExist:
-            # User is not a secretary (they're an admin), which is fine
-            pass
+        # (users without a secretary account are admins, which is fine)
+        if get_roles(request).secretary_status == 'inactive':
+            messages.error(request, 'Your secretary account is inactive.')
+            return redirect('signin')
         
         return view_func(request, *args, **kwargs)
     
@@ -106,16 +169,15 @@ def secretary_required(view_func):
             messages.error(request, 'Please log in to access this page.')
             return redirect('signin')
         
-        try:
-            secretary = SecretaryAdmin.objects.get(user=request.user)
-            if not secretary.is_active:
-                messages.error(request, 'Your secretary account is inactive.')
-                return redirect('signin')
-            # Secretary exists and is active - allow access
-        except SecretaryAdmin.DoesNotExist:
+        roles = get_roles(request)
+        if not roles.has_secretary_account:
             # User is not a secretary - deny access
             messages.error(request, 'Access denied. Secretary privileges required.')
             return redirect('user')  # Redirect to admin dashboard
+        if not roles.is_secretary:
+            messages.error(request, 'Your secretary account is inactive.')
+            return redirect('signin')
+        # Secretary exists and is active - allow access
         
         return view_func(request, *args, **kwargs)
     
@@ -124,9 +186,5 @@ def secretary_required(view_func):
 # Helper function to check if user is secretary
 def is_secretary(user):
     """Check if user is a secretary admin"""
-    try:
-        secretary = SecretaryAdmin.objects.get(user=user)
-        return secretary.is_active
-    except SecretaryAdmin.DoesNotExist:
-        return False
+    return get_user_roles(user).is_secretary
 
@@ -0,0 +1,77 @@
+"""
+Precompiled email templates for mass mailings.
+
+A mailing renders the same template thousands of times, and only a few
+fields change per recipient. compiled() renders the template once, with
+placeholders for those per-recipient ``fields`` and the ``shared`` values
+(logo URL, date, the campaign message) filled in. The output is split around
+the placeholders, and the plain-text alternative of an HTML template is
+derived from the result once. render() then only escapes the recipient's
+values and joins them between the cached static parts.
+
+Per-recipient fields must be output as a plain ``{{ field }}``: a tag or
+filter applied to one would see the placeholder, not the value. Anything
+the template branches on belongs in ``shared``. Text templates (``.txt``) are
+expected to switch autoescaping off, like user/password_reset_email.txt.
+"""
+import re
+from functools import lru_cache
+
+from django.template.loader import get_template
+from django.utils.html import conditional_escape, strip_tags
+from django.utils.safestring import mark_safe
+
+PLACEHOLDER = "\x1f{}\x1f"
+PLACEHOLDER_RE = re.compile("\x1f(\\d+)\x1f")
+
+
+def _split(rendered, fields):
+    """['static', field name, 'static', ...] for the rendered template"""
+    pieces = PLACEHOLDER_RE.split(rendered)
+    return [piece if i % 2 == 0 else fields[int(piece)] for i, piece in enumerate(pieces)]
+
+
+class CompiledMailTemplate:
+    def __init__(self, template_name, fields, shared):
+        self.is_html = template_name.endswith(".html")
+        context = dict(shared)
+        context.update((field, mark_safe(PLACEHOLDER.format(i))) for i, field in enumerate(fields))
+        rendered = get_template(template_name).render(context)
+        if self.is_html:
+            self.html_parts = _split(rendered, fields)
+            self.text_parts = _split(strip_tags(rendered), fields)
+        else:
+            self.html_parts = None
+            self.text_parts = _split(rendered, fields)
+
+    @staticmethod
+    def _fill(parts, values, escape):
+        out = []
+        for i, part in enumerate(parts):
+            if i % 2 == 0:
+                out.append(part)
+            else:
+                value = values.get(part, "")
+                out.append(conditional_escape(value) if escape else str(value))
+        return "".join(out)
+
+    def render(self, values):
+        """Return ``(text, html)`` for one recipient; html is None for text templates"""
+        text = self._fill(self.text_parts, values, escape=False)
+        html = self._fill(self.html_parts, values, escape=True) if self.is_html else None
+        return text, html
+
+
+@lru_cache(maxsize=64)
+def _compiled(template_name, fields, shared):
+    return CompiledMailTemplate(template_name, fields, shared)
+
+
+def compiled(template_name, fields, **shared):
+    """The compiled template for these per-recipient ``fields`` and ``shared`` values (cached)"""
+    return _compiled(template_name, tuple(fields), tuple(sorted(shared.items())))
+
+
+def render(template_name, values, **shared):
+    """Render one message; returns ``(text, html)``"""
+    return compiled(template_name, values.keys(), **shared).render(values)
@@ -0,0 +1,176 @@
+import json
+import multiprocessing
+import time
+import tracemalloc
+import uuid
+from datetime import timedelta
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from tripled import outbox
+from tripled.models import EmailOutbox, Property, PropertySale, Realtor, User
+from tripled.smtp_sink import SMTPSink
+
+PATHS = ("bulk_clients", "bulk_realtors", "reminder")
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure email throughput end to end against a local SMTP sink: the bulk client, "
+        "bulk realtor and development reminder views, then outbox delivery. Benchmark rows "
+        "are created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--recipients",
+            type=int,
+            nargs="+",
+            default=[1000, 10000],
+            help="Recipient counts to run (default: 1000 10000)",
+        )
+        parser.add_argument(
+            "--path",
+            action="append",
+            dest="paths",
+            choices=PATHS,
+            help="Path to measure (repeatable; default: all)",
+        )
+        parser.add_argument("--batch-size", type=int, default=100, help="Outbox batch size (default: 100)")
+        parser.add_argument("--rate", type=float, default=0, help="Delivery rate limit, msg/s (default: none)")
+        parser.add_argument("--latency", type=float, default=0, help="Sink latency per message in seconds")
+        parser.add_argument("--failure-rate", type=float, default=0, help="Sink temporary failure rate")
+        parser.add_argument("--disconnect-rate", type=float, default=0, help="Sink dropped connection rate")
+
+    def handle(self, *args, **options):
+        sink = SMTPSink(
+            latency=options["latency"],
+            failure_rate=options["failure_rate"],
+            disconnect_rate=options["disconnect_rate"],
+            seed=0,
+        )
+        # Serve from another process so the sink doesn't compete with the sender for the GIL
+        server = multiprocessing.Process(target=sink.serve_forever, daemon=True)
+        server.start()
+        sink.server.server_close()
+        try:
+            with override_settings(**sink.email_settings()):
+                self.stdout.write(
+                    f"{'path':<14}{'recipients':>11}{'queue msg/s':>13}{'queue peak':>12}"
+                    f"{'send msg/s':>12}{'send peak':>11}{'sent':>8}{'failed':>8}"
+                )
+                for count in options["recipients"]:
+                    for path in options["paths"] or PATHS:
+                        self.run(path, count, options)
+        finally:
+            server.terminate()
+            server.join()
+
+    def run(self, path, count, options):
+        with transaction.atomic():
+            # Keep mail already waiting in the outbox out of the measurement
+            EmailOutbox.objects.filter(status__in=("pending", "sending")).update(
+                next_attempt_at=timezone.now() + timedelta(days=365)
+            )
+            first_id = (EmailOutbox.objects.order_by("-id").values_list("id", flat=True).first() or 0) + 1
+            marker = f"bench{uuid.uuid4().hex[:8]}"
+            client = self.client(marker)
+            queue = {
+                "bulk_clients": self.queue_bulk_clients,
+                "bulk_realtors": self.queue_bulk_realtors,
+                "reminder": self.queue_reminders,
+            }[path]
+            prepare = self.create_sales if path != "bulk_realtors" else self.create_realtors
+            ids = prepare(marker, count)
+
+            queue_rate, queue_peak = self.measure(lambda: queue(client, marker, ids), count)
+            send_rate, send_peak = self.measure(lambda: self.deliver(options), count)
+
+            emails = EmailOutbox.objects.filter(id__gte=first_id)
+            sent = emails.filter(status="sent").count()
+            failed = emails.exclude(status="sent").count()
+            self.stdout.write(
+                f"{path:<14}{count:>11}{queue_rate:>13,.0f}{queue_peak / 1048576:>10.1f}MB"
+                f"{send_rate:>12,.0f}{send_peak / 1048576:>9.1f}MB{sent:>8}{failed:>8}"
+            )
+            transaction.set_rollback(True)
+
+    def measure(self, work, count):
+        """(messages per second, peak traced memory in bytes) of ``work``"""
+        tracemalloc.start()
+        started = time.perf_counter()
+        work()
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return count / elapsed, peak
+
+    def client(self, marker):
+        admin = User.objects.create_superuser(marker, f"{marker}@example.invalid", uuid.uuid4().hex)
+        client = Client(HTTP_HOST="localhost")
+        client.force_login(admin)
+        return client
+
+    def create_realtors(self, marker, count):
+        Realtor.objects.bulk_create(
+            Realtor(
+                first_name=f"{marker} {i}", last_name="Realtor", email=f"{marker}.{i}@example.invalid",
+                referral_code=f"Z{i:07d}",
+            )
+            for i in range(count)
+        )
+        return None
+
+    def create_sales(self, marker, count):
+        estate = Property.objects.create(
+            name=f"{marker} Estate", description="Benchmark", location="Lagos", address="Benchmark"
+        )
+        realtor = Realtor.objects.create(first_name=marker, referral_code="Z9999999")
+        expiry = timezone.now().date() + timedelta(days=90)
+        sales = PropertySale.objects.bulk_create(
+            PropertySale(
+                reference_number=f"B{i:07d}", description="Benchmark", property_type="land",
+                property_item=estate, quantity=1, client_name=f"{marker} client {i}",
+                client_email=f"{marker}.{i}@example.invalid", original_price=1000000,
+                selling_price=1000000, realtor=realtor, plot_development_expiry_date=expiry,
+            )
+            for i in range(count)
+        )
+        return [sale.id for sale in sales]
+
+    def post(self, client, url, data):
+        response = client.post(url, data, HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        result = response.json()
+        if not result.get("success"):
+            raise CommandError(f"{url} failed: {result}")
+
+    def queue_bulk_clients(self, client, marker, ids):
+        self.post(client, reverse("send_bulk_email"), {
+            "subject": "Benchmark", "message": "Benchmark message", "mode": "filtered",
+            "filters": json.dumps({"q": marker}),
+        })
+
+    def queue_bulk_realtors(self, client, marker, ids):
+        self.post(client, reverse("send_bulk_email_realtors"), {
+            "subject": "Benchmark", "message": "Benchmark message", "mode": "filtered",
+            "filters": json.dumps({"q": marker}),
+        })
+
+    def queue_reminders(self, client, marker, ids):
+        for sale_id in ids:
+            self.post(client, reverse("send_client_email", args=[sale_id]), {"email_type": "reminder"})
+
+    def deliver(self, options):
+        """Drain the outbox the way send_outbox does"""
+        mail_connection = get_connection(fail_silently=False)
+        throttle = outbox.Throttle(options["rate"])
+        try:
+            while rows := outbox.claim(options["batch_size"]):
+                outbox.deliver(rows, mail_connection, throttle)
+        finally:
+            mail_connection.close()
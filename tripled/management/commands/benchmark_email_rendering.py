@@ -0,0 +1,77 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.utils.html import strip_tags
+
+from tripled import mail_templates
+
+SHARED = {
+    "development_duration": "3 years",
+    "current_date": "January 01, 2026",
+    "logo_url": "https://example.com/static/user/images/tripledlogo.jpeg",
+}
+
+
+def recipient(i):
+    return {
+        "client_name": f"Client {i} O'Neil & Sons",
+        "property_name": f"Estate {i % 7}",
+        "expiry_date": "March 15, 2027",
+        "reference_number": f"TDH{i:07d}",
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure email rendering throughput: render_to_string + strip_tags per message "
+        "against the precompiled templates of tripled.mail_templates"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--messages",
+            type=int,
+            default=5000,
+            help="Messages rendered per template and method (default: 5000)",
+        )
+        parser.add_argument(
+            "--template",
+            action="append",
+            dest="templates",
+            help="Template to benchmark (repeatable; default: the development reminder and revocation emails)",
+        )
+
+    def handle(self, *args, **options):
+        count = options["messages"]
+        templates = options["templates"] or [
+            "emails/development_reminder.html",
+            "emails/plot_revocation.html",
+        ]
+        for template_name in templates:
+            def per_message(i):
+                html = render_to_string(template_name, {**SHARED, **recipient(i)})
+                return strip_tags(html), html
+
+            def precompiled(i):
+                return mail_templates.render(template_name, recipient(i), **SHARED)
+
+            baseline = self.measure(per_message, count)
+            compiled = self.measure(precompiled, count)
+            self.stdout.write(f"{template_name} ({count} messages)")
+            for label, (rate, peak) in (("render_to_string + strip_tags", baseline), ("precompiled", compiled)):
+                self.stdout.write(f"  {label:<30} {rate:>10,.0f} msg/s   peak {peak / 1024:,.0f} KiB")
+            self.stdout.write(self.style.SUCCESS(f"  speedup x{compiled[0] / baseline[0]:.1f}"))
+
+    def measure(self, render, count):
+        """(messages per second, peak traced memory in bytes)"""
+        render(0)  # warm the template loader and compile caches
+        tracemalloc.start()
+        started = time.perf_counter()
+        for i in range(count):
+            render(i)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return count / elapsed, peak
@@ -0,0 +1,81 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from tripled.models import User
+
+SESSION_ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}
+MESSAGE_STORAGES = {
+    "session": "django.contrib.messages.storage.session.SessionStorage",
+    "cookie": "django.contrib.messages.storage.cookie.CookieStorage",
+}
+PAGES = ("user", "realtors_page", "property_sales_list", "commissions_list", "bulk_email")
+
+
+class Command(BaseCommand):
+    help = (
+        "Count the queries and time of portal requests under each session engine and "
+        "message storage: a sign-in POST with its redirect and flash message, then the "
+        "portal pages. Benchmark rows are created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rounds", type=int, default=20, help="Times each page is requested (default: 20)")
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'sessions':<16}{'messages':<10}{'request':<22}{'queries':>9}{'session':>9}{'ms':>8}"
+        )
+        for engine_name, engine in SESSION_ENGINES.items():
+            for storage_name, storage in MESSAGE_STORAGES.items():
+                if engine_name == "signed_cookies" and storage_name == "session":
+                    continue  # same as cookie messages: the session is the cookie
+                with override_settings(SESSION_ENGINE=engine, MESSAGE_STORAGE=storage):
+                    for label, queries, session_queries, ms in self.run(options["rounds"]):
+                        self.stdout.write(
+                            f"{engine_name:<16}{storage_name:<10}{label:<22}"
+                            f"{queries:>9.1f}{session_queries:>9.1f}{ms:>8.1f}"
+                        )
+
+    def run(self, rounds):
+        """(request, queries, session table queries, milliseconds) per request, averaged over ``rounds``"""
+        results = {}
+
+        def record(label, request):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = request()
+                elapsed = time.perf_counter() - started
+            session_queries = sum("django_session" in query["sql"] for query in captured.captured_queries)
+            totals = results.setdefault(label, [0, 0, 0])
+            totals[0] += len(captured.captured_queries)
+            totals[1] += session_queries
+            totals[2] += elapsed * 1000
+            return response
+
+        with transaction.atomic():
+            username = f"bench{uuid.uuid4().hex[:8]}"
+            password = uuid.uuid4().hex
+            User.objects.create_superuser(username, f"{username}@example.invalid", password)
+            client = Client(HTTP_HOST="localhost")
+            for _ in range(rounds):
+                client.cookies.clear()
+                record("signin POST", lambda: client.post(
+                    reverse("signin"), {"username": username, "password": password}
+                ))
+                # The redirect target shows (and consumes) the "Login Successful!" message
+                record("redirect + message", lambda: client.get(reverse("user")))
+                for page in PAGES:
+                    record(page, lambda: client.get(reverse(page)))
+            transaction.set_rollback(True)
+
+        return [(label, q / rounds, s / rounds, ms / rounds) for label, (q, s, ms) in results.items()]
@@ -0,0 +1,68 @@
+import os
+import re
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from tripled.storage import BLOB_DIR, referenced_names
+
+RENDITION_SUFFIX = re.compile(r"-\d+w\.(?:jpg|webp)(?:\.part)?$")
+
+
+class Command(BaseCommand):
+    help = "Delete content-addressed media blobs (and their renditions) that no row references"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-minutes",
+            type=int,
+            default=60,
+            help="Keep unreferenced blobs younger than this, e.g. uploads still in flight (default: 60)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be deleted",
+        )
+
+    def handle(self, *args, **options):
+        root = default_storage.path(BLOB_DIR)
+        if not os.path.isdir(root):
+            self.stdout.write("No blob directory, nothing to collect.")
+            return
+
+        # Mark: every referenced blob, by name without extension (renditions share it)
+        live = {os.path.splitext(name)[0] for name in referenced_names() if name.startswith(BLOB_DIR + "/")}
+        cutoff = time.time() - options["grace_minutes"] * 60
+
+        # A blob touched within the grace period (a fresh upload, or one just
+        # deduplicated onto it) keeps its renditions too
+        files = []
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, default_storage.location).replace(os.sep, "/")
+                stem = RENDITION_SUFFIX.sub("", name)
+                stem = os.path.splitext(stem)[0] if stem == name else stem
+                files.append((path, stem))
+                if os.path.getmtime(path) > cutoff:
+                    live.add(stem)
+
+        # Sweep
+        removed = kept = freed = 0
+        for path, stem in files:
+            if stem in live:
+                kept += 1
+                continue
+            freed += os.path.getsize(path)
+            removed += 1
+            if not options["dry_run"]:
+                os.remove(path)
+
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {removed} unreferenced files ({freed / 1048576:.1f} MB); kept {kept}."
+            )
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from tripled.counters import flush_downloads
+
+
+class Command(BaseCommand):
+    help = "Write buffered download counts to the database (run before shutting down workers)"
+
+    def handle(self, *args, **options):
+        applied = flush_downloads()
+        self.stdout.write(self.style.SUCCESS(f"Flushed {applied} buffered downloads."))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from tripled.rollups import rebuild_all
+
+
+class Command(BaseCommand):
+    help = "Rebuild the SalesMonthly and CommissionMonthly rollup tables from scratch"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Rows inserted per bulk_create batch (default: 500)",
+        )
+
+    def handle(self, *args, **options):
+        sales_rows, commission_rows = rebuild_all(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {sales_rows} sales and {commission_rows} commission rollup rows."
+            )
+        )
@@ -0,0 +1,130 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tripled import renditions
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfill WebP/JPEG renditions for every image already in media/, "
+        "resizing in parallel worker processes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Worker processes (default: number of CPU cores)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=200,
+            help="Rows read from the database and handed to the pool at a time (default: 200)",
+        )
+        parser.add_argument(
+            "--state-file",
+            default=os.path.join(settings.BASE_DIR, ".rendition_backfill.json"),
+            help="Checkpoint file recording the last row done per field (default: in the project directory)",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Continue after the rows recorded in --state-file",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate renditions even when they are newer than the original",
+        )
+
+    def handle(self, *args, **options):
+        state_file = options["state_file"]
+        state = {}
+        if options["resume"] and os.path.exists(state_file):
+            with open(state_file) as fh:
+                state = json.load(fh)
+
+        totals = {"generated": 0, "fresh": 0, "failed": 0, "missing": 0}
+        bytes_read = 0
+        started = time.monotonic()
+
+        with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+            for label, fields in renditions.RENDITION_FIELDS.items():
+                model = apps.get_model(label)
+                for field in fields:
+                    key = f"{label}.{field}"
+                    for last_pk, counts, size in self.process_field(
+                        pool, model, field, state.get(key, 0), options
+                    ):
+                        for status, count in counts.items():
+                            totals[status] += count
+                        bytes_read += size
+                        state[key] = last_pk
+                        with open(state_file, "w") as fh:
+                            json.dump(state, fh)
+                        self.report(key, last_pk, totals, bytes_read, started)
+
+        elapsed = time.monotonic() - started
+        done = totals["generated"] + totals["fresh"]
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Processed {done} images in {elapsed:.1f}s "
+                f"({totals['generated']} regenerated, {totals['fresh']} already up to date, "
+                f"{totals['missing']} missing, {totals['failed']} failed)."
+            )
+        )
+
+    def process_field(self, pool, model, field, after_pk, options):
+        """Yield (last pk, status counts, bytes read) for each chunk of ``model.field``"""
+        storage = model._meta.get_field(field).storage
+        workers, chunk_size = options["workers"], options["chunk_size"]
+        last_pk = after_pk
+        while True:
+            # Keyset pagination: each chunk starts after the last pk handled
+            chunk = list(
+                model.objects.filter(pk__gt=last_pk)
+                .exclude(**{field: ""})
+                .exclude(**{f"{field}__isnull": True})
+                .order_by("pk")
+                .values_list("pk", field)[:chunk_size]
+            )
+            if not chunk:
+                return
+            try:
+                existing = [(name, storage.path(name)) for _, name in chunk]
+            except NotImplementedError:
+                raise CommandError("Renditions can only be backfilled on local file storage.")
+            existing = [(name, path) for name, path in existing if os.path.exists(path)]
+
+            counts = {"generated": 0, "fresh": 0, "failed": 0, "missing": len(chunk) - len(existing)}
+            size = 0
+            results = pool.map(
+                renditions.render_to_disk,
+                [path for _, path in existing],
+                [options["force"]] * len(existing),
+                chunksize=max(1, len(existing) // (workers * 4)),
+            )
+            for (name, _), (status, widths, read) in zip(existing, results):
+                counts[status] += 1
+                size += read
+                if status != "failed":
+                    renditions.set_available(name, widths)
+
+            last_pk = chunk[-1][0]
+            yield last_pk, counts, size
+
+    def report(self, key, last_pk, totals, bytes_read, started):
+        elapsed = max(time.monotonic() - started, 0.001)
+        done = totals["generated"] + totals["fresh"]
+        self.stdout.write(
+            f"{key} up to pk {last_pk}: {done} images, "
+            f"{done / elapsed:.1f} img/s, {bytes_read / elapsed / 1048576:.1f} MB/s read"
+        )
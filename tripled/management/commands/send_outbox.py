@@ -0,0 +1,62 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from tripled import outbox
+
+
+class Command(BaseCommand):
+    help = "Deliver queued emails from the outbox (runs until stopped unless --once is given)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="Messages claimed and sent per batch (default: 50)",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=5,
+            help="Seconds to wait before checking an empty outbox again (default: 5)",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=outbox.RATE_LIMIT,
+            help="Maximum messages per second, 0 for no limit (default: EMAIL_OUTBOX_RATE_LIMIT)",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit as soon as no message is due instead of polling",
+        )
+
+    def handle(self, *args, **options):
+        # One connection for as long as there is work; closed while idle so
+        # the SMTP server doesn't time it out under us
+        mail_connection = get_connection(fail_silently=False)
+        throttle = outbox.Throttle(options["rate"])
+        totals = {"sent": 0, "failed": 0}
+        try:
+            while True:
+                rows = outbox.claim(options["batch_size"])
+                if not rows:
+                    mail_connection.close()
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll_interval"])
+                    continue
+                sent, failed = outbox.deliver(rows, mail_connection, throttle)
+                totals["sent"] += sent
+                totals["failed"] += failed
+                self.stdout.write(f"Batch of {len(rows)}: {sent} sent, {failed} failed")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            mail_connection.close()
+        self.stdout.write(
+            self.style.SUCCESS(f"Sent {totals['sent']} emails ({totals['failed']} failed attempts).")
+        )
@@ -0,0 +1,76 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tripled.smtp_sink import SMTPSink
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local SMTP server that accepts and discards mail, optionally slow or failing, "
+        "for measuring the email subsystem without real inboxes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=2525, help="(default: 2525)")
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0,
+            help="Seconds to wait before answering each message (default: 0)",
+        )
+        parser.add_argument(
+            "--failure-rate",
+            type=float,
+            default=0,
+            help="Fraction of messages answered with a temporary 451 error (default: 0)",
+        )
+        parser.add_argument(
+            "--disconnect-rate",
+            type=float,
+            default=0,
+            help="Fraction of messages answered by dropping the connection (default: 0)",
+        )
+        parser.add_argument(
+            "--report-every",
+            type=float,
+            default=10,
+            help="Seconds between throughput reports (default: 10)",
+        )
+
+    def handle(self, *args, **options):
+        sink = SMTPSink(
+            options["host"],
+            options["port"],
+            latency=options["latency"],
+            failure_rate=options["failure_rate"],
+            disconnect_rate=options["disconnect_rate"],
+        )
+        self.stdout.write(
+            f"SMTP sink listening on {sink.host}:{sink.port}. Send mail to it with "
+            f"EMAIL_HOST={sink.host} EMAIL_PORT={sink.port} EMAIL_USE_TLS=False. Ctrl-C to stop."
+        )
+        sink.start()
+        last = sink.stats()
+        try:
+            while True:
+                time.sleep(options["report_every"])
+                stats = sink.stats()
+                rate = (stats["accepted"] - last["accepted"]) / options["report_every"]
+                self.stdout.write(
+                    f"{stats['accepted']} accepted ({rate:.1f} msg/s), {stats['failed']} failed, "
+                    f"{stats['disconnected']} disconnected"
+                )
+                last = stats
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sink.stop()
+        stats = sink.stats()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Accepted {stats['accepted']} messages ({stats['bytes'] / 1048576:.1f} MB); "
+                f"{stats['failed']} failed, {stats['disconnected']} disconnected."
+            )
+        )
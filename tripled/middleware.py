@@ -1,7 +1,8 @@
 from django.shortcuts import redirect
 from django.contrib import messages
-from django.urls import reverse
-from .helper import is_secretary
+from django.utils.functional import SimpleLazyObject
+from .access_policy import compile_policy
+from .helper import get_roles
 
 class RoleDiscoveryMiddleware:
     """
@@ -12,20 +13,12 @@ class RoleDiscoveryMiddleware:
         self.get_response = get_response
 
     def __call__(self, request):
-        # Default flags
-        request.is_secretary = False
-        request.is_accountant = False
-        request.is_chief_admin = False
-
-        if request.user.is_authenticated:
-            # Check for secretary status using helper
-            request.is_secretary = is_secretary(request.user)
-            
-            # Check for accounting roles
-            request.is_accountant = request.user.user_type in ['chief_accountant', 'branch_admin']
-            
-            # Check for chief admin roles
-            request.is_chief_admin = request.user.is_superuser or request.user.user_type == 'admin'
+        # Resolved once per request (cached per user); decorators reuse it.
+        # Lazy, so public pages that never read them don't load the session.
+        request.roles = SimpleLazyObject(lambda: get_roles(request))
+        request.is_secretary = SimpleLazyObject(lambda: request.roles.is_secretary)
+        request.is_accountant = SimpleLazyObject(lambda: request.roles.is_accountant)
+        request.is_chief_admin = SimpleLazyObject(lambda: request.roles.is_chief_admin)
 
         response = self.get_response(request)
         return response
@@ -33,30 +26,26 @@ class RoleDiscoveryMiddleware:
 
 class PortalSecurityMiddleware:
     """
-    Enforces bidirectional isolation between the Secretary Dashboard 
-    and the Admin/Realtor Portal.
+    Enforces bidirectional isolation between the Secretary Dashboard,
+    the Admin/Realtor Portal and the Accounting app.
+
+    Rules live in tripled.access_policy and are compiled once, when the
+    middleware is loaded; each request is a single trie lookup.
     """
     def __init__(self, get_response):
         self.get_response = get_response
+        self.policy = compile_policy()
 
     def __call__(self, request):
-        if not request.user.is_authenticated:
+        # Unprotected paths (the public website) never touch the session
+        checks = self.policy.lookup(request.path)
+        if checks is None or not request.user.is_authenticated:
             return self.get_response(request)
 
-        path = request.path
-
-        # 1. Protect Secretary Dashboard from non-secretaries
-        if path.startswith(reverse('secretary_dashboard')):
-            if not request.is_secretary and not request.user.is_superuser:
-                messages.error(request, "Access Denied. This dashboard is for Secretaries only.")
-                if request.is_accountant:
-                    return redirect('accounting:dashboard')
-                return redirect('user')
-
-        # 2. Protect Admin Portal Dashboard from Secretaries (who aren't also admins)
-        # Note: We only block the main dashboard redirect to keep them in their lanes.
-        # Sub-pages are handled by their respective decorators (admin_required).
-        if path == reverse('user') and request.is_secretary and not request.is_chief_admin:
-            return redirect('secretary_dashboard')
+        denied = self.policy.evaluate(checks, get_roles(request).names)
+        if denied is not None:
+            if denied.message:
+                messages.error(request, denied.message)
+            return redirect(denied.redirect_to)
 
         return self.get_response(request)
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_monthly_rollups(apps, schema_editor):
+    PropertySale = apps.get_model('tripled', 'PropertySale')
+    Commission = apps.get_model('tripled', 'Commission')
+    SalesMonthly = apps.get_model('tripled', 'SalesMonthly')
+    CommissionMonthly = apps.get_model('tripled', 'CommissionMonthly')
+    month = TruncMonth('created_at', output_field=models.DateField())
+
+    sales = PropertySale.objects.annotate(month=month).values('month', 'realtor_id') \
+        .annotate(sale_count=Count('id'), total_amount=Sum('selling_price')).order_by()
+    SalesMonthly.objects.bulk_create([SalesMonthly(**row) for row in sales], batch_size=500)
+
+    commissions = Commission.objects.annotate(month=month).values('month', 'realtor_id', 'is_paid') \
+        .annotate(commission_count=Count('id'), total_amount=Sum('amount')).order_by()
+    CommissionMonthly.objects.bulk_create([CommissionMonthly(**row) for row in commissions], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tripled', '0011_general_facebook_url_general_instagram_url_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommissionMonthly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('is_paid', models.BooleanField(default=False)),
+                ('commission_count', models.PositiveIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('realtor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='commissions_monthly', to='tripled.realtor')),
+            ],
+            options={
+                'verbose_name': 'Monthly Commission Rollup',
+                'verbose_name_plural': 'Monthly Commission Rollups',
+                'constraints': [models.UniqueConstraint(fields=('month', 'realtor', 'is_paid'), name='unique_commission_monthly_bucket')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesMonthly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('sale_count', models.PositiveIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('realtor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_monthly', to='tripled.realtor')),
+            ],
+            options={
+                'verbose_name': 'Monthly Sales Rollup',
+                'verbose_name_plural': 'Monthly Sales Rollups',
+                'constraints': [models.UniqueConstraint(fields=('month', 'realtor'), name='unique_sales_monthly_bucket')],
+            },
+        ),
+        migrations.RunPython(backfill_monthly_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,110 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+
+
+def clear_monthly_rollups(apps, schema_editor):
+    # Rows are rebuilt with the new dimensions at the end of this migration
+    apps.get_model('tripled', 'SalesMonthly').objects.all().delete()
+    apps.get_model('tripled', 'CommissionMonthly').objects.all().delete()
+
+
+def rebuild_monthly_rollups(apps, schema_editor):
+    PropertySale = apps.get_model('tripled', 'PropertySale')
+    Commission = apps.get_model('tripled', 'Commission')
+    SalesMonthly = apps.get_model('tripled', 'SalesMonthly')
+    CommissionMonthly = apps.get_model('tripled', 'CommissionMonthly')
+    month = TruncMonth('created_at', output_field=models.DateField())
+
+    sales = PropertySale.objects.annotate(month=month, state=F('property_item__location')) \
+        .values('month', 'realtor_id', 'property_item_id', 'state', 'payment_plan') \
+        .annotate(sale_count=Count('id'), total_amount=Sum('selling_price'), amount_paid=Sum('amount_paid')) \
+        .order_by()
+    SalesMonthly.objects.bulk_create(
+        [SalesMonthly(property_id=row.pop('property_item_id'), **row) for row in sales], batch_size=500
+    )
+
+    sale = PropertySale.objects.filter(reference_number=OuterRef('property_reference'))
+    commissions = Commission.objects.annotate(
+        month=month,
+        property_id=Subquery(sale.values('property_item_id')[:1]),
+        state=Coalesce(Subquery(sale.values('property_item__location')[:1]), Value('')),
+        payment_plan=Coalesce(Subquery(sale.values('payment_plan')[:1]), Value('')),
+    ).values('month', 'realtor_id', 'property_id', 'state', 'payment_plan', 'is_paid') \
+        .annotate(commission_count=Count('id'), total_amount=Sum('amount')).order_by()
+    CommissionMonthly.objects.bulk_create([CommissionMonthly(**row) for row in commissions], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tripled', '0012_salesmonthly_commissionmonthly'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_monthly_rollups, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='commissionmonthly',
+            name='unique_commission_monthly_bucket',
+        ),
+        migrations.RemoveConstraint(
+            model_name='salesmonthly',
+            name='unique_sales_monthly_bucket',
+        ),
+        migrations.AddField(
+            model_name='commissionmonthly',
+            name='payment_plan',
+            field=models.CharField(blank=True, default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='commissionmonthly',
+            name='property',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='commissions_monthly', to='tripled.property'),
+        ),
+        migrations.AddField(
+            model_name='commissionmonthly',
+            name='state',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='salesmonthly',
+            name='amount_paid',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=15),
+        ),
+        migrations.AddField(
+            model_name='salesmonthly',
+            name='payment_plan',
+            field=models.CharField(choices=[('outright', 'Outright Purchase'), ('3_months', '3 Months Plan'), ('6_months', '6 Months Plan')], default='outright', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='salesmonthly',
+            name='property',
+            field=models.ForeignKey(default=1, on_delete=django.db.models.deletion.CASCADE, related_name='sales_monthly', to='tripled.property'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='salesmonthly',
+            name='state',
+            field=models.CharField(blank=True, default='', help_text='Estate location at rollup time', max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='commissionmonthly',
+            index=models.Index(fields=['state', 'month'], name='tripled_com_state_127fb4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salesmonthly',
+            index=models.Index(fields=['state', 'month'], name='tripled_sal_state_31a5f3_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='commissionmonthly',
+            constraint=models.UniqueConstraint(fields=('month', 'realtor', 'property', 'payment_plan', 'is_paid'), name='unique_commission_monthly_bucket'),
+        ),
+        migrations.AddConstraint(
+            model_name='salesmonthly',
+            constraint=models.UniqueConstraint(fields=('month', 'realtor', 'property', 'payment_plan'), name='unique_sales_monthly_bucket'),
+        ),
+        migrations.RunPython(rebuild_monthly_rollups, clear_monthly_rollups),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:40
+
+import tripled.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tripled', '0014_updated_at_validators'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gallery',
+            name='image',
+            field=tripled.fields.NormalizedImageField(upload_to='gallery/'),
+        ),
+        migrations.AlterField(
+            model_name='propertysale',
+            name='client_picture',
+            field=tripled.fields.NormalizedImageField(blank=True, null=True, upload_to='client_pictures/'),
+        ),
+        migrations.AlterField(
+            model_name='realtor',
+            name='image',
+            field=tripled.fields.NormalizedImageField(blank=True, null=True, upload_to='realtors/'),
+        ),
+        migrations.AlterField(
+            model_name='websiteproperty',
+            name='main_image',
+            field=tripled.fields.NormalizedImageField(help_text='Main image displayed on the website', upload_to='website_properties/'),
+        ),
+        migrations.AlterField(
+            model_name='websitepropertyimage',
+            name='image',
+            field=tripled.fields.NormalizedImageField(upload_to='website_properties/gallery/'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tripled', '0016_email_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailoutbox',
+            name='recipient_id',
+            field=models.PositiveIntegerField(blank=True, help_text='Sale or realtor the campaign email is for', null=True),
+        ),
+        migrations.CreateModel(
+            name='Campaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('audience', models.CharField(choices=[('clients', 'Property Sale Clients'), ('realtors', 'Realtors')], max_length=20)),
+                ('subject', models.CharField(max_length=998)),
+                ('message', models.TextField()),
+                ('recipient_ids', models.JSONField(blank=True, default=list)),
+                ('total', models.PositiveIntegerField(default=0, help_text='Recipients with an email address when created')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('queued_at', models.DateTimeField(blank=True, help_text='When every recipient had been queued', null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='campaigns', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Email Campaign',
+                'verbose_name_plural': 'Email Campaigns',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='emailoutbox',
+            name='campaign',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='emails', to='tripled.campaign'),
+        ),
+        migrations.AddConstraint(
+            model_name='emailoutbox',
+            constraint=models.UniqueConstraint(fields=('campaign', 'recipient_id'), name='unique_campaign_recipient'),
+        ),
+    ]
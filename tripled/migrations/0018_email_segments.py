@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tripled', '0017_email_campaigns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaign',
+            name='filters',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='campaign',
+            name='segment',
+            field=models.CharField(blank=True, default='', help_text='Name of the segment sent to, if any', max_length=255),
+        ),
+        migrations.CreateModel(
+            name='EmailSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('audience', models.CharField(choices=[('clients', 'Property Sale Clients'), ('realtors', 'Realtors')], max_length=20)),
+                ('filters', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='email_segments', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Email Segment',
+                'verbose_name_plural': 'Email Segments',
+                'ordering': ['name'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('tripled', '0018_email_segments'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['email'], name='tripled_user_email_idx'),
+        ),
+    ]
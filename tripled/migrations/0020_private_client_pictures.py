@@ -0,0 +1,61 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:17
+
+import os
+
+import tripled.fields
+import tripled.storage
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import migrations, models
+
+# Renditions written next to public originals at the time (tripled.renditions)
+RENDITION_WIDTHS = (320, 640, 1024, 1600)
+RENDITION_EXTENSIONS = ("jpg", "webp")
+
+
+def move_client_pictures(apps, schema_editor):
+    """Move client pictures out of public media, with the renditions made of them"""
+    public = FileSystemStorage(location=settings.MEDIA_ROOT)
+    private = tripled.storage.private_storage()
+    PropertySale = apps.get_model("tripled", "PropertySale")
+
+    # Public files other rows still use (content-addressed blobs can be shared)
+    shared = set()
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField) and (model, field.name) != (PropertySale, "client_picture"):
+                shared.update(model._base_manager.exclude(**{field.name: ""}).values_list(field.name, flat=True))
+
+    moved = set()
+    for sale in PropertySale._base_manager.exclude(client_picture="").exclude(client_picture__isnull=True):
+        name = sale.client_picture.name
+        if name not in moved and not private.exists(name):
+            if not public.exists(name):
+                continue
+            with public.open(name, "rb") as source:
+                stored = private.save(name, source)
+            if stored != name:
+                PropertySale._base_manager.filter(client_picture=name).update(client_picture=stored)
+        moved.add(name)
+
+    for name in moved - shared:
+        stem = os.path.splitext(name)[0]
+        for path in [name] + [f"{stem}-{width}w.{ext}" for width in RENDITION_WIDTHS for ext in RENDITION_EXTENSIONS]:
+            if public.exists(path):
+                public.delete(path)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tripled', '0019_user_email_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='propertysale',
+            name='client_picture',
+            field=tripled.fields.NormalizedImageField(blank=True, null=True, storage=tripled.storage.private_storage, upload_to='client_pictures/'),
+        ),
+        migrations.RunPython(move_client_pictures, migrations.RunPython.noop),
+    ]
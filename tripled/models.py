@@ -6,9 +6,21 @@ from django.utils import timezone
 import uuid
 from decimal import Decimal
 from django.contrib.auth.models import AbstractUser
+from django.core.cache import cache
+import copy
+import time
+import weakref
+
+from .fields import NormalizedImageField
+from .storage import private_storage
 
 import os
 
+# Live User instances holding a memoized managed_branch, so assignment changes
+# made through branch.admins (which only name user ids) can reach them
+_managed_branch_holders = weakref.WeakValueDictionary()
+
+
 class User(AbstractUser):
     USER_TYPE_CHOICES = [
         ('admin', 'Admin'),
@@ -31,13 +43,52 @@ class User(AbstractUser):
     
     @property
     def managed_branch(self):
-        """Get the first branch this user manages (for accounting)"""
-        if hasattr(self, 'managed_branches'):
-            return self.managed_branches.filter(is_active=True).first()
-        return None
+        """
+        Get the first branch this user manages (for accounting).
+        Memoized on the instance, so request.user resolves it once per request;
+        uses prefetched managed_branches when available.
+        """
+        if '_managed_branch' not in self.__dict__:
+            branch = None
+            if hasattr(self, 'managed_branches'):
+                if 'managed_branches' in getattr(self, '_prefetched_objects_cache', {}):
+                    branch = min(
+                        (b for b in self.managed_branches.all() if b.is_active),
+                        key=lambda b: b.pk,
+                        default=None,
+                    )
+                else:
+                    branch = self.managed_branches.filter(is_active=True).first()
+            self._managed_branch = branch
+            _managed_branch_holders[id(self)] = self
+        return self._managed_branch
+
+    def clear_managed_branch_cache(self):
+        """Forget the memoized managed_branch (after branch assignments change)"""
+        self.__dict__.pop('_managed_branch', None)
+        _managed_branch_holders.pop(id(self), None)
+
+    @staticmethod
+    def clear_managed_branch_caches(user_ids):
+        """Forget the memoized managed_branch of every loaded instance of these users"""
+        user_ids = set(user_ids)
+        for user in list(_managed_branch_holders.values()):
+            if user.pk in user_ids:
+                user.clear_managed_branch_cache()
+
+    def refresh_from_db(self, *args, **kwargs):
+        self.clear_managed_branch_cache()
+        super().refresh_from_db(*args, **kwargs)
+
+    @staticmethod
+    def prefetch_managed_branches(queryset):
+        """Prefetch branch assignments so managed_branch/managed_branches.all() cost no queries per user"""
+        return queryset.prefetch_related('managed_branches')
 
     class Meta:
         app_label = 'tripled'
+        # Sign-in looks users up by username or email
+        indexes = [models.Index(fields=['email'], name='tripled_user_email_idx')]
 
 
 
@@ -54,7 +105,7 @@ class Realtor(models.Model):
     last_name = models.CharField(max_length=100,blank=True, null=True)
     email = models.EmailField(unique=True, blank=True, null=True)
     phone = models.CharField(max_length=20,blank=True, null=True)
-    image = models.ImageField(upload_to='realtors/', blank=True, null=True)
+    image = NormalizedImageField(upload_to='realtors/', blank=True, null=True)
     address = models.CharField(max_length=255,blank=True, null=True)
     country = models.CharField(max_length=100,blank=True, null=True)
     
@@ -334,7 +385,7 @@ class WebsiteProperty(models.Model):
     nearby_landmarks = models.TextField(blank=True, null=True, help_text="Key landmarks near the property")
     plot_size = models.CharField(max_length=100, blank=True, null=True)
     video_url = models.URLField(blank=True, null=True, help_text="Link to YouTube/Vimeo video tour")
-    main_image = models.ImageField(upload_to='website_properties/', help_text="Main image displayed on the website")
+    main_image = NormalizedImageField(upload_to='website_properties/', help_text="Main image displayed on the website")
     
     status = models.CharField(max_length=20, choices=PROPERTY_STATUS_CHOICES, default='available')
     is_visible = models.BooleanField(default=True, help_text="Show this property on the public website")
@@ -352,8 +403,9 @@ class WebsiteProperty(models.Model):
 class WebsitePropertyImage(models.Model):
     """Gallery images for a specific website property"""
     property = models.ForeignKey(WebsiteProperty, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='website_properties/gallery/')
+    image = NormalizedImageField(upload_to='website_properties/gallery/')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Image for {self.property.name}"
@@ -363,6 +415,7 @@ class Plot(models.Model):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='plots')
     number = models.CharField(max_length=50)
     is_taken = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.property.name} - {self.number}"
@@ -418,7 +471,8 @@ class PropertySale(models.Model):
     client_phone = models.CharField(max_length=20, blank=True, null=True)
     client_email = models.EmailField(max_length=255, blank=True, null=True)
     # Add to client information section
-    client_picture = models.ImageField(upload_to='client_pictures/', blank=True, null=True, )
+    # Personal data: kept out of public media, served by property_sale_client_picture
+    client_picture = NormalizedImageField(upload_to='client_pictures/', storage=private_storage, blank=True, null=True, )
 
     
     
@@ -684,7 +738,11 @@ class Payment(models.Model):
                 
                 # Save without triggering the calculate_commission in PropertySale.save()
                 PropertySale.objects.filter(pk=self.property_sale.pk).update(amount_paid=total_payments)
-                
+
+                # update() bypasses the sale's signals, so refresh its rollup slice here
+                from .rollups import month_start, refresh_sales_bucket
+                refresh_sales_bucket(month_start(self.property_sale.created_at), self.property_sale.realtor_id)
+
                 # Calculate commissions directly based on the new payment amount only
                 new_payment_amount = self.amount
                 
@@ -775,6 +833,8 @@ class General(models.Model):
     instagram_url = models.URLField(blank=True, null=True, help_text="Full Instagram Profile URL")
     whatsapp_number = models.CharField(max_length=20, blank=True, null=True, help_text="WhatsApp Number (e.g., +234...)")
 
+    updated_at = models.DateTimeField(auto_now=True)
+
     def save(self, *args, **kwargs):
         is_new = self.pk is None
         super().save(*args, **kwargs)
@@ -785,6 +845,46 @@ class General(models.Model):
 
     def __str__(self):
             return self.company_bank_name
+
+    # Site settings are read on every render, so each process keeps the row in
+    # memory and only re-reads it when the shared version key changes, or at
+    # the latest MAX_AGE seconds after it was read: a cache that isn't shared
+    # between workers (or loses the key) can't leave a worker stale for longer.
+    VERSION_CACHE_KEY = 'tripled:general:version'
+    MAX_AGE = 60
+    _loaded = {'version': None, 'instance': None, 'loaded_at': 0}
+
+    @classmethod
+    def load(cls, create=True):
+        """
+        Return the General settings singleton (the first row).
+        Creates it when missing unless ``create`` is False, in which case None
+        may be returned. Callers get their own copy, safe to modify and save.
+        """
+        version = cache.get(cls.VERSION_CACHE_KEY)
+        if version is None:
+            version = uuid.uuid4().hex
+            if not cache.add(cls.VERSION_CACHE_KEY, version, None):
+                version = cache.get(cls.VERSION_CACHE_KEY, version)
+
+        loaded = cls._loaded
+        now = time.monotonic()
+        if (
+            loaded['version'] != version
+            or now - loaded['loaded_at'] > cls.MAX_AGE
+            or (create and loaded['instance'] is None)
+        ):
+            instance = cls.objects.order_by('pk').first()
+            if instance is None and create:
+                instance = cls.objects.create()
+            cls._loaded = loaded = {'version': version, 'instance': instance, 'loaded_at': now}
+        return copy.copy(loaded['instance'])
+
+    @classmethod
+    def invalidate_cache(cls):
+        """Make every process re-read the settings row (called on save/delete)"""
+        cls._loaded = {'version': None, 'instance': None, 'loaded_at': 0}
+        cache.set(cls.VERSION_CACHE_KEY, uuid.uuid4().hex, None)
         
         
         
@@ -796,7 +896,7 @@ class Gallery(models.Model):
     
     title = models.CharField(max_length=255, blank=True, null=True)
     description = models.TextField(blank=True, null=True)
-    image = models.ImageField(upload_to='gallery/')
+    image = NormalizedImageField(upload_to='gallery/')
     order = models.PositiveIntegerField(default=0, help_text="Display order in gallery")
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(default=timezone.now)
@@ -881,4 +981,161 @@ class SecretaryAdmin(models.Model):
         return f"{self.full_name} - {self.email}"
     
     
-    
\ No newline at end of file
+    
+
+# ==============================================================================
+# Reporting rollups (maintained by tripled.rollups, never edited by hand)
+
+
+class SalesMonthly(models.Model):
+    """Monthly property sale totals per realtor, estate and payment plan"""
+    month = models.DateField(help_text="First day of the month")
+    realtor = models.ForeignKey(Realtor, on_delete=models.CASCADE, related_name='sales_monthly')
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='sales_monthly')
+    state = models.CharField(max_length=100, blank=True, default='', help_text="Estate location at rollup time")
+    payment_plan = models.CharField(max_length=10, choices=PropertySale.PAYMENT_PLAN_CHOICES, default='outright')
+    sale_count = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    amount_paid = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Monthly Sales Rollup'
+        verbose_name_plural = 'Monthly Sales Rollups'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['month', 'realtor', 'property', 'payment_plan'],
+                name='unique_sales_monthly_bucket',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['state', 'month']),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%b %Y} - {self.property_id}/{self.realtor_id}: {self.total_amount}"
+
+
+class CommissionMonthly(models.Model):
+    """Monthly commission totals per realtor, estate and payment status"""
+    month = models.DateField(help_text="First day of the month")
+    realtor = models.ForeignKey(Realtor, on_delete=models.CASCADE, related_name='commissions_monthly')
+    # Commissions only reference their sale by reference number, so these
+    # stay empty when the reference no longer matches a sale
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, null=True, blank=True, related_name='commissions_monthly')
+    state = models.CharField(max_length=100, blank=True, default='')
+    payment_plan = models.CharField(max_length=10, blank=True, default='')
+    is_paid = models.BooleanField(default=False)
+    commission_count = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Monthly Commission Rollup'
+        verbose_name_plural = 'Monthly Commission Rollups'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['month', 'realtor', 'property', 'payment_plan', 'is_paid'],
+                name='unique_commission_monthly_bucket',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['state', 'month']),
+        ]
+
+    def __str__(self):
+        status = "Paid" if self.is_paid else "Unpaid"
+        return f"{self.month:%b %Y} - {self.property_id}/{self.realtor_id} ({status}): {self.total_amount}"
+
+
+# ==============================================================================
+# Outgoing email (written by tripled.outbox, delivered by `manage.py send_outbox`)
+
+
+class EmailOutbox(models.Model):
+    """An email waiting for, or done with, delivery by the outbox worker"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=998)
+    body = models.TextField()
+    html_body = models.TextField(blank=True, default='')
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list)
+    reply_to = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="Not delivered before this time (retry backoff, or the lease of a worker sending it)"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    # Set for the per-recipient emails of a bulk mailing
+    campaign = models.ForeignKey('Campaign', on_delete=models.CASCADE, blank=True, null=True, related_name='emails')
+    recipient_id = models.PositiveIntegerField(blank=True, null=True, help_text="Sale or realtor the campaign email is for")
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'Outgoing Email'
+        verbose_name_plural = 'Email Outbox'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['campaign', 'recipient_id'], name='unique_campaign_recipient'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.get_status_display()})"
+
+
+class Campaign(models.Model):
+    """A bulk mailing; its emails are the EmailOutbox rows pointing at it (see tripled.campaigns)"""
+    AUDIENCE_CHOICES = [
+        ('clients', 'Property Sale Clients'),
+        ('realtors', 'Realtors'),
+    ]
+
+    audience = models.CharField(max_length=20, choices=AUDIENCE_CHOICES)
+    subject = models.CharField(max_length=998)
+    message = models.TextField()
+    # Hand-picked recipients, or else everyone matching the filters
+    recipient_ids = models.JSONField(default=list, blank=True)
+    filters = models.JSONField(default=dict, blank=True)
+    segment = models.CharField(max_length=255, blank=True, default='', help_text="Name of the segment sent to, if any")
+    total = models.PositiveIntegerField(default=0, help_text="Recipients with an email address when created")
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='campaigns')
+    created_at = models.DateTimeField(auto_now_add=True)
+    queued_at = models.DateTimeField(blank=True, null=True, help_text="When every recipient had been queued")
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Email Campaign'
+        verbose_name_plural = 'Email Campaigns'
+
+    def __str__(self):
+        return f"{self.subject} ({self.get_audience_display()}, {self.total} recipients)"
+
+
+class EmailSegment(models.Model):
+    """A saved set of bulk email recipient filters, resolved when a campaign is sent"""
+    name = models.CharField(max_length=255)
+    audience = models.CharField(max_length=20, choices=Campaign.AUDIENCE_CHOICES)
+    filters = models.JSONField(default=dict)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='email_segments')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['name']
+        verbose_name = 'Email Segment'
+        verbose_name_plural = 'Email Segments'
+
+    def __str__(self):
+        return f"{self.name} ({self.get_audience_display()})"
@@ -0,0 +1,191 @@
+"""
+Durable outgoing email.
+
+Views never talk to SMTP: they enqueue() a row in EmailOutbox and return.
+``manage.py send_outbox`` claims pending rows in batches, sends them over one
+SMTP connection it keeps open while there is work (reconnecting once if the
+server drops it), optionally paced to EMAIL_OUTBOX_RATE_LIMIT messages per
+second, and records the outcome per message. Failed sends are retried with exponential backoff until
+EMAIL_OUTBOX_MAX_ATTEMPTS is reached; errors that cannot succeed on a retry
+(bad headers, every recipient refused) fail the message straight away.
+
+Claimed rows are leased for CLAIM_LEASE, and each outcome is saved as soon as
+the send returns: if a worker dies mid-batch, only the rows it hadn't finished
+become due again once the lease runs out. On databases with SKIP LOCKED
+(PostgreSQL, MySQL 8) several workers can share the queue; on SQLite run one.
+"""
+import logging
+import smtplib
+import socket
+import time
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.mail import BadHeaderError, EmailMultiAlternatives
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = getattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 5)
+BACKOFF_BASE = timedelta(seconds=getattr(settings, "EMAIL_OUTBOX_BACKOFF_SECONDS", 60))
+BACKOFF_MAX = timedelta(hours=6)
+CLAIM_LEASE = timedelta(minutes=10)
+RATE_LIMIT = getattr(settings, "EMAIL_OUTBOX_RATE_LIMIT", 0)  # messages per second, 0 for no limit
+ENQUEUE_CHUNK_SIZE = 500
+
+# Errors after which the SMTP connection can't be reused. Not OSError as a
+# whole: every SMTPException is one, and a refused recipient or a 4xx reply
+# leaves the connection perfectly usable.
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout)
+# Errors a retry won't fix
+PERMANENT_ERRORS = (BadHeaderError, smtplib.SMTPRecipientsRefused)
+
+
+def build(subject, body, to, from_email=None, html_body="", reply_to=None):
+    """Return an unsaved EmailOutbox row; raises BadHeaderError like send_mail()"""
+    if "\n" in subject or "\r" in subject:
+        raise BadHeaderError("Header values can't contain newlines (got %r for header 'Subject')" % subject)
+    if isinstance(to, str):
+        to = [to]
+    if isinstance(reply_to, str):
+        reply_to = [reply_to]
+    return EmailOutbox(
+        subject=subject,
+        body=body,
+        html_body=html_body or "",
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+        reply_to=list(reply_to or []),
+    )
+
+
+def enqueue(subject, body, to, from_email=None, html_body="", reply_to=None):
+    """Queue one email for the worker and return its EmailOutbox row"""
+    row = build(subject, body, to, from_email, html_body, reply_to)
+    row.save()
+    return row
+
+
+def enqueue_many(rows, chunk_size=ENQUEUE_CHUNK_SIZE, ignore_conflicts=False):
+    """
+    Queue rows made with build() using one INSERT per ``chunk_size`` rows.
+    ``rows`` may be a generator, so a mailing never has to be held in memory
+    at once. Returns how many were handed to the database; with
+    ``ignore_conflicts``, rows clashing with a unique constraint are skipped
+    but still counted.
+    """
+    rows = iter(rows)
+    queued = 0
+    while chunk := list(islice(rows, chunk_size)):
+        queued += len(EmailOutbox.objects.bulk_create(chunk, ignore_conflicts=ignore_conflicts))
+    return queued
+
+
+def claim(batch_size):
+    """Lease up to ``batch_size`` due messages to this worker"""
+    now = timezone.now()
+    with transaction.atomic():
+        due = EmailOutbox.objects.filter(
+            status__in=("pending", "sending"), next_attempt_at__lte=now
+        ).order_by("id")
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        rows = list(due[:batch_size])
+        if rows:
+            EmailOutbox.objects.filter(id__in=[row.id for row in rows]).update(
+                status="sending", next_attempt_at=now + CLAIM_LEASE
+            )
+    return rows
+
+
+def to_message(row, mail_connection=None):
+    message = EmailMultiAlternatives(
+        subject=row.subject,
+        body=row.body,
+        from_email=row.from_email,
+        to=row.to,
+        reply_to=row.reply_to or None,
+        connection=mail_connection,
+    )
+    if row.html_body:
+        message.attach_alternative(row.html_body, "text/html")
+    return message
+
+
+def backoff(attempts):
+    return min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+
+
+class Throttle:
+    """Space calls to wait() at least 1/rate seconds apart (no-op when rate is 0)"""
+
+    def __init__(self, rate=RATE_LIMIT):
+        self.interval = 1 / rate if rate else 0
+        self.next_at = 0
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self.next_at > now:
+            time.sleep(self.next_at - now)
+        self.next_at = max(now, self.next_at) + self.interval
+
+
+def send(mail_connection, message):
+    """
+    Send one message over the shared connection. The connection is opened
+    explicitly so send_messages() leaves it open for the next message; if the
+    server dropped it, reconnect and try once more.
+    """
+    for retry in (False, True):
+        try:
+            mail_connection.open()
+            return mail_connection.send_messages([message])
+        except CONNECTION_ERRORS:
+            mail_connection.close()
+            if retry:
+                raise
+
+
+def deliver(rows, mail_connection, throttle=None):
+    """
+    Send claimed rows over ``mail_connection`` and save the outcome of each.
+    Returns (sent, failed) counts; failed includes retries.
+    """
+    throttle = throttle or Throttle()
+    sent = failed = 0
+    for row in rows:
+        row.attempts += 1
+        throttle.wait()
+        try:
+            if not send(mail_connection, to_message(row)):
+                raise smtplib.SMTPException("Message was not accepted")
+        except Exception as exc:
+            failed += 1
+            row.last_error = f"{type(exc).__name__}: {exc}"
+            if isinstance(exc, PERMANENT_ERRORS) or row.attempts >= MAX_ATTEMPTS:
+                row.status = "failed"
+                logger.error("Giving up on email %s to %s: %s", row.id, row.to, row.last_error)
+            else:
+                row.status = "pending"
+                row.next_attempt_at = timezone.now() + backoff(row.attempts)
+                logger.warning("Email %s to %s failed, retrying: %s", row.id, row.to, row.last_error)
+        else:
+            sent += 1
+            row.status = "sent"
+            row.sent_at = timezone.now()
+            row.last_error = ""
+        # Saved right away, so a crash later in the batch can't resend this one
+        EmailOutbox.objects.filter(pk=row.pk).update(
+            status=row.status,
+            attempts=row.attempts,
+            last_error=row.last_error,
+            next_attempt_at=row.next_attempt_at,
+            sent_at=row.sent_at,
+        )
+    return sent, failed
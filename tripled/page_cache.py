@@ -0,0 +1,165 @@
+"""
+Full-page cache for the public marketing website.
+
+Each cached page declares the models it is rendered from. Every model has a
+version token in the shared cache; the page key embeds the current tokens, so
+saving or deleting a row (see tripled.signals) bumps one token and orphans
+exactly the pages built from that model. Only anonymous GET/HEAD requests are
+served from, or stored in, the cache.
+
+Visitors without a session cookie are treated as anonymous without loading
+the session, so these responses don't pick up ``Vary: Cookie`` and are sent
+with public Cache-Control, ETag and Last-Modified headers that browsers and
+reverse proxies can reuse. Conditional requests are answered with 304.
+
+Views that can compute validators cheaply (see conditional()) answer
+conditional requests before anything is rendered; the page cache then reuses
+those validators instead of hashing the body.
+"""
+import hashlib
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import condition
+
+PAGE_CACHE_TIMEOUT = getattr(settings, "PUBLIC_PAGE_CACHE_TIMEOUT", 60 * 10)
+# How long browsers and proxies may reuse a public page without revalidating
+PAGE_MAX_AGE = getattr(settings, "PUBLIC_PAGE_MAX_AGE", 60 * 5)
+
+
+def _version_key(model):
+    return f"tripled:pagever:{model._meta.label_lower}"
+
+
+def model_versions(models):
+    """Return the current version token of each model, creating missing ones"""
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            token = uuid.uuid4().hex
+            # Another worker may have created it meanwhile; keep whichever won
+            if not cache.add(key, token, None):
+                token = cache.get(key, token)
+            versions[key] = token
+    return [versions[key] for key in keys]
+
+
+def bump_model_version(model):
+    """Invalidate every cached page that depends on ``model``"""
+    cache.set(_version_key(model), uuid.uuid4().hex, None)
+
+
+def is_anonymous(request):
+    """Anonymous check that leaves the session untouched for cookieless visitors"""
+    if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        return True
+    return not request.user.is_authenticated
+
+
+def last_modified(models):
+    """Latest updated_at (or created_at) across ``models``, as a timestamp"""
+    latest = None
+    for model in models:
+        field_names = {field.name for field in model._meta.concrete_fields}
+        field = next((name for name in ("updated_at", "created_at") if name in field_names), None)
+        if field is None:
+            continue
+        value = model.objects.aggregate(latest=Max(field))["latest"]
+        if value is not None and (latest is None or value > latest):
+            latest = value
+    return int(latest.timestamp()) if latest else None
+
+
+def _public_response(request, entry):
+    content, content_type, etag, modified = entry
+    conditional = get_conditional_response(request, etag=etag, last_modified=modified)
+    response = conditional or HttpResponse(content, content_type=content_type)
+    response["ETag"] = etag
+    if modified:
+        response["Last-Modified"] = http_date(modified)
+    patch_cache_control(response, public=True, max_age=PAGE_MAX_AGE)
+    return response
+
+
+def cache_public_page(*models, timeout=None):
+    """
+    Cache an anonymous page's rendered HTML until one of ``models`` changes,
+    and serve it with public caching headers.
+
+    Usage::
+
+        @cache_public_page(Gallery, General)
+        def gallery(request): ...
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD") or not is_anonymous(request):
+                return view_func(request, *args, **kwargs)
+
+            versions = ".".join(model_versions(models))
+            key = f"tripled:page:{view_func.__name__}:{request.get_full_path()}:{versions}"
+            entry = cache.get(key)
+            if entry is not None:
+                return _public_response(request, entry)
+
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 304:
+                patch_cache_control(response, public=True, max_age=PAGE_MAX_AGE)
+                return response
+            # Pages that set cookies or use {% csrf_token %} are per-visitor
+            if (
+                response.status_code != 200
+                or response.streaming
+                or response.cookies
+                or request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+            ):
+                return response
+
+            # Prefer validators already set by @conditional on the view
+            etag = response.get("ETag") or '"%s"' % hashlib.md5(response.content).hexdigest()
+            modified = parse_http_date_safe(response.get("Last-Modified", "")) or last_modified(models)
+            entry = (response.content, response["Content-Type"], etag, modified)
+            cache.set(key, entry, PAGE_CACHE_TIMEOUT if timeout is None else timeout)
+            return _public_response(request, entry)
+
+        return wrapper
+
+    return decorator
+
+
+def conditional(validators):
+    """
+    Django's @condition for views whose ETag and Last-Modified come from one
+    query: ``validators(request, *args, **kwargs)`` returns
+    ``(etag, last_modified)`` (either may be None) and runs once per request.
+    Matching conditional requests get a 304 before the view renders anything.
+    Signed-in users get their own ETag, since their pages differ from the
+    public copy a browser or proxy may hold.
+    """
+    def resolve(request, *args, **kwargs):
+        if not hasattr(request, "_conditional_validators"):
+            etag, modified = validators(request, *args, **kwargs)
+            if etag and not is_anonymous(request):
+                etag = f"{etag}-u{request.user.pk}"
+            request._conditional_validators = (etag, modified)
+        return request._conditional_validators
+
+    return condition(
+        etag_func=lambda request, *args, **kwargs: resolve(request, *args, **kwargs)[0],
+        last_modified_func=lambda request, *args, **kwargs: resolve(request, *args, **kwargs)[1],
+    )
+
+
+def validators_from(*parts):
+    """Build (etag, last_modified) from a list of version parts and timestamps"""
+    stamps = [part for part in parts if hasattr(part, "timestamp")]
+    etag = hashlib.md5(repr(parts).encode()).hexdigest()
+    return etag, max(stamps) if stamps else None
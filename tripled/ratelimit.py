@@ -0,0 +1,174 @@
+"""
+Token-bucket rate limiting for the public forms.
+
+Each limited view names a scope in settings.RATE_LIMITS, which gives a
+``(capacity, period)`` bucket per client IP and, optionally, per submitted
+email address::
+
+    RATE_LIMITS = {
+        "contact": {"ip": (5, 600), "email": (3, 3600)},
+    }
+
+A bucket holds up to ``capacity`` requests and refills at ``capacity / period``
+per second, so short bursts pass and sustained floods are cut down to the
+refill rate. Requests over the limit get a 429 with Retry-After before the view
+runs, so they cost one cache read and no database or SMTP work.
+
+Buckets live in the shared cache (see CACHES). Reads and writes aren't atomic,
+so concurrent requests can occasionally let an extra request through; that's
+fine for shedding load. With a per-process cache the limits apply per worker.
+
+Behind the nginx proxy of the deployment, REMOTE_ADDR is nginx itself, so the
+client IP is taken from X-Forwarded-For: RATE_LIMIT_PROXY_COUNT (default 1)
+is the number of proxies that append to it, and the address the outermost
+one saw is used. nginx must send
+``proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;``. Without an
+X-Forwarded-For header (runserver) REMOTE_ADDR is used; set the count to 0 when
+Django faces clients directly, or they could pick their own address.
+
+Logins are throttled on failures rather than requests (see login_wait()):
+only failed attempts take tokens, and an empty bucket blocks further attempts
+before the password is hashed.
+"""
+import hashlib
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+
+def _enabled():
+    return getattr(settings, "RATE_LIMIT_ENABLED", True)
+
+
+def client_ip(request):
+    """The client's address, trusting only the last RATE_LIMIT_PROXY_COUNT X-Forwarded-For hops"""
+    proxy_count = getattr(settings, "RATE_LIMIT_PROXY_COUNT", 1)
+    if proxy_count:
+        hops = [hop.strip() for hop in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",") if hop.strip()]
+        if len(hops) >= proxy_count:
+            return hops[-proxy_count]
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def _key(scope, kind, value):
+    digest = hashlib.sha1(value.encode()).hexdigest()
+    return f"tripled:ratelimit:{scope}:{kind}:{digest}"
+
+
+def _level(key, capacity, period, now):
+    tokens, stamp = cache.get(key) or (capacity, now)
+    return min(capacity, tokens + (now - stamp) * capacity / period)
+
+
+def peek(key, capacity, period):
+    """Seconds until the bucket has a token, without taking one (0 if it has one now)"""
+    tokens = _level(key, capacity, period, time.time())
+    return 0 if tokens >= 1 else (1 - tokens) * period / capacity
+
+
+def take(key, capacity, period):
+    """Take a token from the bucket; returns 0 if allowed, else seconds until one is available"""
+    now = time.time()
+    tokens = _level(key, capacity, period, now)
+    if tokens < 1:
+        return (1 - tokens) * period / capacity
+    # An untouched bucket is full again after ``period``, so it can expire then
+    cache.set(key, (tokens - 1, now), math.ceil(period))
+    return 0
+
+
+def check(request, scope, fields=()):
+    """Seconds the request must wait under ``scope``'s limits, or 0 if it may proceed"""
+    limits = getattr(settings, "RATE_LIMITS", {}).get(scope)
+    if not _enabled() or not limits:
+        return 0
+
+    buckets = []
+    if "ip" in limits:
+        buckets.append((_key(scope, "ip", client_ip(request)), limits["ip"]))
+    if "email" in limits:
+        data = request.POST if request.method == "POST" else request.GET
+        for field in fields:
+            email = data.get(field, "").strip().lower()
+            if email:
+                buckets.append((_key(scope, "email", email), limits["email"]))
+
+    for key, (capacity, period) in buckets:
+        wait = take(key, capacity, period)
+        if wait:
+            return wait
+    return 0
+
+
+def too_many_requests(request, wait):
+    message = "Too many requests. Please wait a moment and try again."
+    if request.headers.get("x-requested-with") == "XMLHttpRequest":
+        response = JsonResponse({"success": False, "message": message}, status=429)
+    else:
+        response = HttpResponse(message, content_type="text/plain", status=429)
+    response["Retry-After"] = str(math.ceil(wait))
+    return response
+
+
+def rate_limit(scope, methods=("POST",), fields=("email",)):
+    """
+    Answer requests over ``scope``'s limits with a 429. Only ``methods`` are
+    counted; ``fields`` name the request parameters holding an email address.
+
+    Usage::
+
+        @rate_limit("contact")
+        def contact(request): ...
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods:
+                wait = check(request, scope, fields)
+                if wait:
+                    return too_many_requests(request, wait)
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _login_keys(request, account):
+    limits = getattr(settings, "RATE_LIMITS", {}).get("login", {}) if _enabled() else {}
+    keys = []
+    if "ip" in limits:
+        keys.append((_key("login", "ip", client_ip(request)), limits["ip"]))
+    if "account" in limits and account:
+        keys.append((_key("login", "account", account.lower()), limits["account"]))
+    return keys
+
+
+def login_wait(request, account):
+    """
+    Seconds before another login may be attempted from this client or for
+    ``account`` (any string naming it), or 0 if one may be attempted now
+    """
+    return max((peek(key, *limit) for key, limit in _login_keys(request, account)), default=0)
+
+
+def login_throttled_message(wait):
+    minutes = max(1, math.ceil(wait / 60))
+    return f"Too many failed sign-in attempts. Please try again in {minutes} minute{'s' if minutes > 1 else ''}."
+
+
+def login_failed(request, account):
+    """Count a failed login against the client and the account"""
+    for key, limit in _login_keys(request, account):
+        take(key, *limit)
+
+
+def login_succeeded(request, account):
+    """
+    Forgive the failed attempts of the account and of the client, so a
+    flood of failures from elsewhere behind the same address can't keep a
+    user who knows their password locked out
+    """
+    cache.delete_many([key for key, limit in _login_keys(request, account)])
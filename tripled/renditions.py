@@ -0,0 +1,168 @@
+"""
+Resized WebP/JPEG renditions of uploaded images.
+
+Every image in RENDITION_FIELDS gets a copy at each width in RENDITION_WIDTHS
+that is narrower than the original, in both formats, saved next to the
+original (``gallery/photo.jpg`` -> ``gallery/photo-640w.webp``). They are
+generated when the file is uploaded (tripled.signals) and picked up by the
+``responsive_image`` template tag, and deleted once no row shows the original
+any more.
+
+Renditions are public files, so private images (client pictures) get none.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+
+logger = logging.getLogger(__name__)
+
+RENDITION_WIDTHS = (320, 640, 1024, 1600)
+RENDITION_FORMATS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "jpeg": {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True},
+}
+# Image fields that get renditions, by model label
+RENDITION_FIELDS = {
+    "tripled.websiteproperty": ["main_image"],
+    "tripled.websitepropertyimage": ["image"],
+    "tripled.gallery": ["image"],
+    "tripled.realtor": ["image"],
+}
+AVAILABLE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def rendition_name(name, width, fmt):
+    stem, _ = os.path.splitext(name)
+    return f"{stem}-{width}w.{'jpg' if fmt == 'jpeg' else fmt}"
+
+
+def _available_key(name):
+    return f"tripled:renditions:{name}"
+
+
+def _encode(image, fmt):
+    options = dict(RENDITION_FORMATS[fmt])
+    output_format = options.pop("format")
+    if output_format == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    buffer = BytesIO()
+    image.save(buffer, output_format, **options)
+    return buffer.getvalue()
+
+
+def render(source):
+    """
+    Yield ``(width, fmt, bytes)`` for every rendition of the image in the
+    binary file object ``source``. Pure Pillow work: no storage access.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        for width in RENDITION_WIDTHS:
+            if width >= image.width:
+                break
+            height = round(image.height * width / image.width)
+            resized = image.resize((width, height), Image.Resampling.LANCZOS)
+            for fmt in RENDITION_FORMATS:
+                yield width, fmt, _encode(resized, fmt)
+
+
+def generate(fieldfile):
+    """Create (or replace) the renditions of an image field's file; returns the widths made"""
+    if not fieldfile:
+        return []
+    storage, name = fieldfile.storage, fieldfile.name
+    widths = set()
+    try:
+        with storage.open(name, "rb") as source:
+            for width, fmt, data in render(source):
+                target = rendition_name(name, width, fmt)
+                if storage.exists(target):
+                    storage.delete(target)
+                storage.save(target, ContentFile(data))
+                widths.add(width)
+    except Exception:
+        logger.exception("Could not generate renditions for %s", name)
+        return []
+    set_available(name, widths)
+    return sorted(widths)
+
+
+def discard(storage, name):
+    """Delete the renditions of the file ``name``"""
+    for width in RENDITION_WIDTHS:
+        for fmt in RENDITION_FORMATS:
+            target = rendition_name(name, width, fmt)
+            if storage.exists(target):
+                storage.delete(target)
+    cache.delete(_available_key(name))
+
+
+def set_available(name, widths):
+    """Record which rendition widths exist for the file ``name``"""
+    cache.set(_available_key(name), sorted(widths), AVAILABLE_CACHE_TIMEOUT)
+
+
+def render_to_disk(path, force=False):
+    """
+    Write the renditions of the local image file ``path`` next to it, unless
+    they already exist and are newer than the original. Runs without Django
+    (safe in worker processes); returns ``(status, widths, bytes_read)`` where
+    status is 'generated', 'fresh' or 'failed'.
+    """
+    from PIL import Image
+
+    try:
+        source_mtime = os.path.getmtime(path)
+        size = os.path.getsize(path)
+        with Image.open(path) as image:
+            # Header only; orientations 5-8 are rotated by exif_transpose()
+            width_px, height_px = image.size
+            if image.getexif().get(0x0112) in (5, 6, 7, 8):
+                width_px = height_px
+            expected = [width for width in RENDITION_WIDTHS if width < width_px]
+        targets = [rendition_name(path, width, fmt) for width in expected for fmt in RENDITION_FORMATS]
+        if not force and all(
+            os.path.exists(target) and os.path.getmtime(target) >= source_mtime
+            for target in targets
+        ):
+            return "fresh", expected, 0
+
+        widths = set()
+        with open(path, "rb") as source:
+            for width, fmt, data in render(source):
+                target = rendition_name(path, width, fmt)
+                partial = f"{target}.part"
+                with open(partial, "wb") as output:
+                    output.write(data)
+                os.replace(partial, target)
+                widths.add(width)
+        return "generated", sorted(widths), size
+    except Exception:
+        return "failed", [], 0
+
+
+def available(fieldfile):
+    """Widths that have renditions on disk for ``fieldfile`` (cached)"""
+    if not fieldfile:
+        return []
+    key = _available_key(fieldfile.name)
+    widths = cache.get(key)
+    if widths is None:
+        storage = fieldfile.storage
+        widths = [
+            width for width in RENDITION_WIDTHS
+            if storage.exists(rendition_name(fieldfile.name, width, "jpeg"))
+        ]
+        cache.set(key, widths, AVAILABLE_CACHE_TIMEOUT)
+    return widths
+
+
+def url(fieldfile, width, fmt):
+    return fieldfile.storage.url(rendition_name(fieldfile.name, width, fmt))
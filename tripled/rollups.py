@@ -0,0 +1,148 @@
+"""
+Materialized monthly rollups backing the admin dashboard and sales analytics.
+
+Rows are keyed by (month, realtor, property/state, payment plan). Whenever a
+sale, payment or commission is written, the (month, realtor) slice it falls
+into is recomputed from its source rows (see tripled.signals and
+Payment.save), so reads never have to scan PropertySale or Commission.
+
+The dashboard figures computed from the rollups are cached in DASHBOARD,
+which expires once any rollup (or realtor) write commits.
+"""
+from datetime import date, datetime, time
+
+from django.db import models, transaction
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from .cache_keys import Namespace
+from .models import Commission, CommissionMonthly, PropertySale, SalesMonthly
+
+DASHBOARD = Namespace("dashboard", timeout=300)
+
+
+def dashboard_changed():
+    """Expire the cached dashboard figures when the current transaction commits"""
+    transaction.on_commit(DASHBOARD.invalidate)
+
+
+def month_start(value):
+    """Return the first day of the month containing ``value`` (current timezone)"""
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        value = value.date()
+    return value.replace(day=1)
+
+
+def month_range(month):
+    """Return the aware ``[start, end)`` datetimes covering ``month``"""
+    if month.month == 12:
+        next_month = date(month.year + 1, 1, 1)
+    else:
+        next_month = date(month.year, month.month + 1, 1)
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(month, time.min), tz),
+        timezone.make_aware(datetime.combine(next_month, time.min), tz),
+    )
+
+
+def _sales_rows(queryset):
+    """Group PropertySale rows into SalesMonthly instances"""
+    rows = (
+        queryset.annotate(
+            month=TruncMonth("created_at", output_field=models.DateField()),
+            state=models.F("property_item__location"),
+        )
+        .values("month", "realtor_id", "property_item_id", "state", "payment_plan")
+        .annotate(
+            sale_count=Count("id"),
+            total_amount=Sum("selling_price"),
+            amount_paid=Sum("amount_paid"),
+        )
+        .order_by()
+    )
+    return [
+        SalesMonthly(property_id=row.pop("property_item_id"), **row)
+        for row in rows
+    ]
+
+
+def _commission_rows(queryset):
+    """Group Commission rows into CommissionMonthly instances"""
+    sale = PropertySale.objects.filter(reference_number=OuterRef("property_reference"))
+    rows = (
+        queryset.annotate(
+            month=TruncMonth("created_at", output_field=models.DateField()),
+            property_id=Subquery(sale.values("property_item_id")[:1]),
+            state=Coalesce(Subquery(sale.values("property_item__location")[:1]), models.Value("")),
+            payment_plan=Coalesce(Subquery(sale.values("payment_plan")[:1]), models.Value("")),
+        )
+        .values("month", "realtor_id", "property_id", "state", "payment_plan", "is_paid")
+        .annotate(commission_count=Count("id"), total_amount=Sum("amount"))
+        .order_by()
+    )
+    return [CommissionMonthly(**row) for row in rows]
+
+
+def refresh_sales_bucket(month, realtor_id):
+    """Recompute the SalesMonthly rows for one realtor and month"""
+    start, end = month_range(month)
+    rows = _sales_rows(
+        PropertySale.objects.filter(
+            realtor_id=realtor_id, created_at__gte=start, created_at__lt=end
+        )
+    )
+    with transaction.atomic():
+        SalesMonthly.objects.filter(month=month, realtor_id=realtor_id).delete()
+        SalesMonthly.objects.bulk_create(rows)
+    dashboard_changed()
+
+
+def refresh_commission_bucket(month, realtor_id):
+    """Recompute the CommissionMonthly rows for one realtor and month"""
+    start, end = month_range(month)
+    rows = _commission_rows(
+        Commission.objects.filter(
+            realtor_id=realtor_id, created_at__gte=start, created_at__lt=end
+        )
+    )
+    with transaction.atomic():
+        CommissionMonthly.objects.filter(month=month, realtor_id=realtor_id).delete()
+        CommissionMonthly.objects.bulk_create(rows)
+    dashboard_changed()
+
+
+def commission_buckets(commissions):
+    """The (month, realtor_id) CommissionMonthly slices the ``commissions`` queryset falls into"""
+    return set(
+        commissions.annotate(month=TruncMonth("created_at", output_field=models.DateField()))
+        .values_list("month", "realtor_id")
+        .order_by()
+        .distinct()
+    )
+
+
+def refresh_sale(sale):
+    """Recompute every rollup slice a sale contributes to"""
+    month = month_start(sale.created_at)
+    refresh_sales_bucket(month, sale.realtor_id)
+    for bucket in commission_buckets(Commission.objects.filter(property_reference=sale.reference_number)):
+        refresh_commission_bucket(*bucket)
+
+
+def rebuild_all(batch_size=500):
+    """Drop and recompute every rollup row from the source tables"""
+    with transaction.atomic():
+        SalesMonthly.objects.all().delete()
+        CommissionMonthly.objects.all().delete()
+        SalesMonthly.objects.bulk_create(
+            _sales_rows(PropertySale.objects.all()), batch_size=batch_size
+        )
+        CommissionMonthly.objects.bulk_create(
+            _commission_rows(Commission.objects.all()), batch_size=batch_size
+        )
+        dashboard_changed()
+    return SalesMonthly.objects.count(), CommissionMonthly.objects.count()
@@ -0,0 +1,183 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.apps import apps
+from django.dispatch import receiver
+
+from . import renditions, rollups
+from .page_cache import bump_model_version
+from .storage import references
+from .helper import invalidate_roles
+from .models import (
+    Commission,
+    CommissionMonthly,
+    DownloadableForm,
+    Gallery,
+    General,
+    Property,
+    PropertySale,
+    Realtor,
+    SalesMonthly,
+    SecretaryAdmin,
+    User,
+    WebsiteProperty,
+    WebsitePropertyImage,
+)
+
+
+def _bucket(created_at, realtor_id):
+    """Return the (month, realtor_id) rollup slice for a row, if it has one"""
+    if not created_at or not realtor_id:
+        return None
+    return rollups.month_start(created_at), realtor_id
+
+
+@receiver(pre_save, sender=PropertySale)
+@receiver(pre_save, sender=Commission)
+def remember_rollup_bucket(sender, instance, raw=False, **kwargs):
+    """Remember where an existing row was rolled up, in case the save moves it"""
+    instance._previous_rollup = None
+    if raw or not instance.pk:
+        return
+    fields = ["created_at", "realtor_id"]
+    if sender is PropertySale:
+        fields += ["property_item_id", "payment_plan"]
+    instance._previous_rollup = sender.objects.filter(pk=instance.pk).values(*fields).first()
+
+
+def _refresh(refresh_bucket, instance, raw):
+    if raw:
+        return
+    buckets = {_bucket(instance.created_at, instance.realtor_id)}
+    previous = getattr(instance, "_previous_rollup", None)
+    if previous:
+        buckets.add(_bucket(previous["created_at"], previous["realtor_id"]))
+    for bucket in buckets - {None}:
+        refresh_bucket(*bucket)
+
+
+@receiver(post_save, sender=PropertySale)
+@receiver(post_delete, sender=PropertySale)
+def refresh_sales_rollup(sender, instance, raw=False, **kwargs):
+    _refresh(rollups.refresh_sales_bucket, instance, raw)
+
+    # Commission rows inherit the sale's estate and plan
+    previous = getattr(instance, "_previous_rollup", None)
+    if not raw and previous and (
+        previous["property_item_id"] != instance.property_item_id
+        or previous["payment_plan"] != instance.payment_plan
+    ):
+        rollups.refresh_sale(instance)
+
+
+@receiver(post_save, sender=Commission)
+@receiver(post_delete, sender=Commission)
+def refresh_commission_rollup(sender, instance, raw=False, **kwargs):
+    _refresh(rollups.refresh_commission_bucket, instance, raw)
+
+
+@receiver(post_save, sender=Property)
+def sync_rollup_state(sender, instance, raw=False, **kwargs):
+    """Keep the denormalized state column in step with the estate's location"""
+    if raw:
+        return
+    for model in (SalesMonthly, CommissionMonthly):
+        model.objects.filter(property=instance).exclude(state=instance.location).update(
+            state=instance.location
+        )
+
+
+@receiver(post_save, sender=Realtor)
+@receiver(post_delete, sender=Realtor)
+def drop_dashboard_figures(sender, raw=False, **kwargs):
+    """The dashboard counts realtors"""
+    if not raw:
+        rollups.dashboard_changed()
+
+
+@receiver(post_save, sender=SecretaryAdmin)
+@receiver(post_delete, sender=SecretaryAdmin)
+def drop_secretary_roles(sender, instance, **kwargs):
+    """Secretary accounts drive role resolution, so forget the cached roles"""
+    invalidate_roles(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_user_roles(sender, instance, **kwargs):
+    invalidate_roles(instance.pk)
+
+
+@receiver(post_save, sender=General)
+@receiver(post_delete, sender=General)
+def drop_general_settings(sender, **kwargs):
+    General.invalidate_cache()
+
+
+@receiver(post_save, sender=WebsiteProperty)
+@receiver(post_save, sender=WebsitePropertyImage)
+@receiver(post_save, sender=Gallery)
+@receiver(post_save, sender=DownloadableForm)
+@receiver(post_save, sender=General)
+@receiver(post_delete, sender=WebsiteProperty)
+@receiver(post_delete, sender=WebsitePropertyImage)
+@receiver(post_delete, sender=Gallery)
+@receiver(post_delete, sender=DownloadableForm)
+@receiver(post_delete, sender=General)
+def drop_public_pages(sender, **kwargs):
+    """Expire the cached public pages rendered from this model"""
+    bump_model_version(sender)
+
+
+def remember_new_uploads(sender, instance, raw=False, **kwargs):
+    """Note which image fields hold a freshly uploaded (not yet stored) file, and what they held before"""
+    fields = renditions.RENDITION_FIELDS[sender._meta.label_lower]
+    instance._new_uploads = [] if raw else [
+        name for name in fields
+        if getattr(instance, name) and not getattr(instance, name)._committed
+    ]
+    instance._previous_files = {}
+    if not raw and instance.pk:
+        instance._previous_files = sender._base_manager.filter(pk=instance.pk).values(*fields).first() or {}
+
+
+def drop_renditions(storage, name):
+    """Delete the renditions of ``name`` unless a row still shows it"""
+    if not references(name):
+        renditions.discard(storage, name)
+
+
+def _drop_renditions_on_commit(fieldfile, name):
+    if name:
+        transaction.on_commit(partial(drop_renditions, fieldfile.storage, name))
+
+
+def generate_renditions(sender, instance, raw=False, **kwargs):
+    """Resize newly uploaded images once the originals are in storage"""
+    for name in getattr(instance, "_new_uploads", ()):
+        fieldfile = getattr(instance, name)
+        # Deduplicated uploads land on a blob whose renditions already exist
+        if not renditions.available(fieldfile):
+            renditions.generate(fieldfile)
+    instance._new_uploads = []
+
+    # Replaced or cleared images leave their renditions behind
+    for name, previous in getattr(instance, "_previous_files", {}).items():
+        fieldfile = getattr(instance, name)
+        if previous != fieldfile.name:
+            _drop_renditions_on_commit(fieldfile, previous)
+    instance._previous_files = {}
+
+
+def delete_renditions(sender, instance, **kwargs):
+    for name in renditions.RENDITION_FIELDS[sender._meta.label_lower]:
+        fieldfile = getattr(instance, name)
+        _drop_renditions_on_commit(fieldfile, fieldfile.name)
+
+
+for label in renditions.RENDITION_FIELDS:
+    model = apps.get_model(label)
+    pre_save.connect(remember_new_uploads, sender=model, dispatch_uid=f"renditions-pre-{label}")
+    post_save.connect(generate_renditions, sender=model, dispatch_uid=f"renditions-post-{label}")
+    post_delete.connect(delete_renditions, sender=model, dispatch_uid=f"renditions-delete-{label}")
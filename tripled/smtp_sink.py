@@ -0,0 +1,175 @@
+"""
+Local SMTP stand-in for measuring and testing email delivery.
+
+SMTPSink speaks just enough SMTP (EHLO/HELO, AUTH PLAIN accepting any
+credentials, MAIL, RCPT, DATA, RSET, NOOP, QUIT; no TLS) for Django's SMTP backend to deliver to it. Messages are
+counted and then thrown away, or kept in ``sink.messages`` when
+``keep_messages`` is set. To exercise the sender's error handling it can:
+
+* ``latency``: wait this many seconds before answering each DATA, like a
+  slow relay;
+* ``failure_rate``: answer that fraction of messages with a temporary
+  ``451`` error (smtplib raises SMTPDataError);
+* ``disconnect_rate``: drop the connection instead of answering, for that
+  fraction of messages (smtplib raises SMTPServerDisconnected).
+
+Point Django at it with EMAIL_HOST/EMAIL_PORT and EMAIL_USE_TLS=False
+(email_settings() has the full set). In a test or script, use it as a
+context manager, which serves from a thread::
+
+    with SMTPSink(failure_rate=0.1) as sink:
+        with override_settings(**sink.email_settings()):
+            ...
+        sink.stats()
+
+or run it on its own with ``manage.py smtp_sink``.
+"""
+import random
+import socketserver
+import threading
+import time
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        sink = self.server.sink
+        self.reply(f"220 {sink.hostname} ESMTP sink ready")
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, _, argument = line.decode("latin-1").strip().partition(" ")
+            command = command.upper()
+            if command == "EHLO":
+                self.wfile.write(
+                    f"250-{sink.hostname}\r\n250-AUTH PLAIN\r\n250-8BITMIME\r\n250-SMTPUTF8\r\n250 PIPELINING\r\n".encode()
+                )
+            elif command == "HELO":
+                self.reply(f"250 {sink.hostname}")
+            elif command == "AUTH":
+                self.reply("235 2.7.0 Authentication successful")
+            elif command == "MAIL":
+                recipients = []
+                self.reply("250 2.1.0 OK")
+            elif command == "RCPT":
+                recipients.append(argument)
+                self.reply("250 2.1.5 OK")
+            elif command == "DATA":
+                if not recipients:
+                    self.reply("503 5.5.1 RCPT first")
+                    continue
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = self.read_data()
+                if data is None:
+                    return
+                outcome = sink.receive(data, recipients)
+                recipients = []
+                if outcome == "disconnect":
+                    return
+                if outcome == "fail":
+                    self.reply("451 4.3.0 Injected temporary failure")
+                else:
+                    self.reply("250 2.0.0 Queued")
+            elif command == "RSET":
+                recipients = []
+                self.reply("250 2.0.0 OK")
+            elif command == "NOOP":
+                self.reply("250 2.0.0 OK")
+            elif command == "QUIT":
+                self.reply("221 2.0.0 Bye")
+                return
+            else:
+                self.reply("502 5.5.2 Command not implemented")
+
+    def read_data(self):
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return None
+            if line in (b".\r\n", b".\n"):
+                return b"".join(lines)
+            # Undo dot-stuffing
+            lines.append(line[1:] if line.startswith(b"..") else line)
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    def __init__(self, host="127.0.0.1", port=0, latency=0, failure_rate=0, disconnect_rate=0,
+                 keep_messages=False, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.disconnect_rate = disconnect_rate
+        self.keep_messages = keep_messages
+        self.hostname = "smtp-sink"
+        self.messages = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counts = {"accepted": 0, "failed": 0, "disconnected": 0, "bytes": 0}
+        self._thread = None
+        # Bound right away, so port=0 picks a free port that is known before serving
+        self.server = _Server((host, port), _Handler)
+        self.server.sink = self
+        self.host, self.port = self.server.server_address[:2]
+
+    def receive(self, data, recipients):
+        """Decide the fate of one message: 'ok', 'fail' or 'disconnect'"""
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            roll = self._random.random()
+            if roll < self.disconnect_rate:
+                self._counts["disconnected"] += 1
+                return "disconnect"
+            if roll < self.disconnect_rate + self.failure_rate:
+                self._counts["failed"] += 1
+                return "fail"
+            self._counts["accepted"] += 1
+            self._counts["bytes"] += len(data)
+            if self.keep_messages:
+                self.messages.append((recipients, data))
+        return "ok"
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def serve_forever(self):
+        self.server.serve_forever(poll_interval=0.1)
+
+    def start(self):
+        """Serve from a daemon thread"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread:
+            self.server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def email_settings(self):
+        """Settings overrides sending Django's mail to this sink"""
+        return {
+            "EMAIL_BACKEND": "django.core.mail.backends.smtp.EmailBackend",
+            "EMAIL_HOST": self.host,
+            "EMAIL_PORT": self.port,
+            "EMAIL_USE_TLS": False,
+            "EMAIL_USE_SSL": False,
+        }
@@ -0,0 +1,117 @@
+"""
+Content-addressed media storage.
+
+Uploads are stored once per distinct content, as ``blobs/<aa>/<sha256><ext>``,
+whatever field or upload_to they came from, so the same estate photo attached
+to a gallery item, a listing and a listing image takes up disk space once.
+Rows share a blob simply by holding the same name, so delete() only removes a
+blob when no file field refers to it any more (see references()). The
+``collect_media_garbage`` command sweeps the blobs left behind by rows deleted
+without calling delete(). An upload that hits an existing blob touches its
+mtime, so the sweep's grace period also covers a blob that is about to be
+referenced again.
+
+Files saved under ``blobs/`` directly (renditions of a blob) keep the given
+name; no row refers to them, so they are deleted without a reference check.
+Files stored before this backend keep working as they are.
+
+Personal data (client pictures) goes to PrivateStorage instead: a directory
+outside MEDIA_ROOT that has no URL, so the front web server never serves it
+and only views that check permissions hand it out (see tripled.delivery).
+"""
+import hashlib
+import os
+import posixpath
+import re
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import models
+
+BLOB_DIR = "blobs"
+# blobs/<aa>/<sha256><ext>, as opposed to the renditions stored next to them
+BLOB_NAME = re.compile(rf"^{BLOB_DIR}/[0-9a-f]{{2}}/[0-9a-f]{{64}}(\.[^/]*)?$")
+
+
+def file_fields():
+    """Yield (model, field name) for every FileField/ImageField in the project"""
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField):
+                yield model, field.name
+
+
+def references(name):
+    """Whether any row's file field points at ``name``"""
+    return any(model._base_manager.filter(**{field: name}).exists() for model, field in file_fields())
+
+
+def referenced_names():
+    """Every file name currently referenced by a row"""
+    names = set()
+    for model, field in file_fields():
+        names.update(
+            model._base_manager.exclude(**{field: ""})
+            .exclude(**{f"{field}__isnull": True})
+            .values_list(field, flat=True)
+            .iterator()
+        )
+    return names
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names uploads by SHA-256 and deduplicates them"""
+
+    def _save(self, name, content):
+        if name.startswith(BLOB_DIR + "/"):
+            return super()._save(name, content)
+
+        digest = hashlib.sha256()
+        if hasattr(content, "seek"):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+
+        hexdigest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        blob = posixpath.join(BLOB_DIR, hexdigest[:2], hexdigest + extension)
+        if self.exists(blob):
+            # Identical content is already stored: share it, and keep the
+            # garbage collector off it until the new row refers to it
+            os.utime(self.path(blob))
+            return blob
+        return super()._save(blob, content)
+
+    def delete(self, name):
+        # Other rows may share this blob; leave it while anything refers to it
+        if BLOB_NAME.match(name) and references(name):
+            return
+        super().delete(name)
+
+
+class PrivateStorage(FileSystemStorage):
+    """Files under PRIVATE_MEDIA_ROOT, reachable only through views"""
+
+    def __init__(self):
+        super().__init__(location=settings.PRIVATE_MEDIA_ROOT)
+
+    @property
+    def accel_prefix(self):
+        """Internal nginx location mapped to PRIVATE_MEDIA_ROOT (FILE_DELIVERY=x-accel)"""
+        return settings.FILE_DELIVERY_PRIVATE_ACCEL_PREFIX
+
+    def url(self, name):
+        raise ValueError(f"{name} is private and has no URL; serve it through a view")
+
+
+_private_storage = None
+
+
+def private_storage():
+    """The PrivateStorage instance (a callable, so migrations don't pin its location)"""
+    global _private_storage
+    if _private_storage is None:
+        _private_storage = PrivateStorage()
+    return _private_storage
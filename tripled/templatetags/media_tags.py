@@ -0,0 +1,44 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from tripled import renditions
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, alt="", sizes="100vw", **attrs):
+    """
+    Render an uploaded image as a lazy-loaded <picture> with WebP and JPEG
+    srcsets built from its renditions.
+
+    Usage: {% responsive_image property.main_image alt=property.name sizes="(max-width: 768px) 100vw, 33vw" class="img-fluid" %}
+    """
+    if not image:
+        return ""
+    attrs = {key.replace("_", "-"): value for key, value in attrs.items()}
+    attrs.setdefault("loading", "lazy")
+    attrs.setdefault("decoding", "async")
+    widths = renditions.available(image)
+    if not widths:
+        return format_html('<img src="{}" alt="{}"{}>', image.url, alt, flatatt(attrs))
+
+    def srcset(fmt):
+        return ", ".join(f"{renditions.url(image, width, fmt)} {width}w" for width in widths)
+
+    return format_html(
+        '<picture style="display: contents"><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}"{}></picture>',
+        srcset("webp"), sizes,
+        image.url, srcset("jpeg"), sizes, alt, flatatt(attrs),
+    )
+
+
+@register.filter
+def rendition_url(image, width):
+    """URL of the largest JPEG rendition no wider than ``width`` (or the original)"""
+    if not image:
+        return ""
+    fitting = [w for w in renditions.available(image) if w <= int(width)]
+    return renditions.url(image, fitting[-1], "jpeg") if fitting else image.url
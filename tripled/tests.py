@@ -1,3 +1,836 @@
-from django.test import TestCase
+import os
+import shutil
+import smtplib
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import campaigns, counters, outbox, renditions, rollups
+from .admin import CommissionAdmin
+from .fields import ImageTooLarge, normalize_image
+from .cache_keys import Namespace
+from .helper import get_user_roles
+from .middleware import PortalSecurityMiddleware
+from .models import (
+    Commission,
+    CommissionMonthly,
+    DownloadableForm,
+    EmailOutbox,
+    Gallery,
+    General,
+    Payment,
+    Property,
+    Plot,
+    PropertySale,
+    Realtor,
+    SalesMonthly,
+    SecretaryAdmin,
+    User,
+    WebsiteProperty,
+    WebsitePropertyImage,
+)
+
+LOCMEM = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tests"}}
+
+
+@override_settings(CACHES=LOCMEM, CACHE_IS_SHARED=True)
+class CacheTestCase(TestCase):
+    """Each test starts from an empty in-memory cache"""
+
+    def setUp(self):
+        cache.clear()
+
+
+@override_settings(CACHES=LOCMEM)
+class NamespaceTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.ns = Namespace("tests", timeout=60)
+
+    def test_bulk_get_and_set(self):
+        self.ns.set_many({"a": 1, ("b", 2): None})
+        self.assertEqual(self.ns.get_many(["a", ("b", 2), "c"]), {"a": 1, ("b", 2): None})
+
+    def test_invalidate_expires_every_key(self):
+        self.ns.set("a", 1)
+        self.ns.invalidate()
+        self.assertEqual(self.ns.get("a", "gone"), "gone")
+
+    def test_version_is_part_of_the_key(self):
+        self.ns.set("a", 1)
+        self.assertIsNone(Namespace("tests", version=2).get("a"))
+
+    def test_cold_miss_is_computed_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return "value"
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.ns.get_or_set("k", compute)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["value"] * 8)
+        self.assertEqual(len(calls), 1)
+
+    def test_stale_value_is_served_while_one_caller_refreshes(self):
+        self.ns.set("k", "old", timeout=0)
+        # Another caller holds the refresh lock
+        cache.add(f"{self.ns.key('k')}:lock", 1, 30)
+        self.assertEqual(self.ns.get_or_set("k", lambda: "new"), "old")
+        cache.delete(f"{self.ns.key('k')}:lock")
+        self.assertEqual(self.ns.get_or_set("k", lambda: "new"), "new")
+
+
+class RateLimitTests(CacheTestCase):
+    def post_contact(self, forwarded_for, email="someone@example.com"):
+        # Behind nginx every request comes from the proxy's address
+        return self.client.post(
+            "/contact/",
+            {"website": "bot", "email": email},
+            REMOTE_ADDR="127.0.0.1",
+            HTTP_X_FORWARDED_FOR=forwarded_for,
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+
+    @override_settings(RATE_LIMITS={"contact": {"ip": (2, 600)}})
+    def test_clients_behind_the_proxy_get_separate_buckets(self):
+        self.assertEqual(self.post_contact("203.0.113.1").status_code, 200)
+        self.assertEqual(self.post_contact("203.0.113.1").status_code, 200)
+        response = self.post_contact("203.0.113.1")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+        self.assertEqual(self.post_contact("203.0.113.2").status_code, 200)
+
+    @override_settings(RATE_LIMITS={"contact": {"ip": (1, 600)}})
+    def test_spoofed_hops_before_the_proxy_are_ignored(self):
+        self.assertEqual(self.post_contact("198.51.100.7, 203.0.113.1").status_code, 200)
+        self.assertEqual(self.post_contact("198.51.100.8, 203.0.113.1").status_code, 429)
+
+    @override_settings(RATE_LIMITS={"contact": {"ip": (10, 600), "email": (1, 600)}})
+    def test_email_bucket_is_shared_across_clients(self):
+        self.assertEqual(self.post_contact("203.0.113.1", "A@example.com").status_code, 200)
+        self.assertEqual(self.post_contact("203.0.113.2", "a@example.com").status_code, 429)
+
+    @override_settings(RATE_LIMITS={"contact": {"ip": (1, 600)}}, RATE_LIMIT_PROXY_COUNT=0)
+    def test_without_a_proxy_remote_addr_is_the_client(self):
+        self.assertEqual(self.post_contact("203.0.113.1").status_code, 200)
+        self.assertEqual(self.post_contact("203.0.113.2").status_code, 429)
+
+
+@override_settings(
+    RATE_LIMITS={"login": {"ip": (3, 600), "account": (2, 600)}},
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class LoginBackendTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("jdoe", "jdoe@example.com", "right-password")
+
+    def login(self, username, password, forwarded_for="203.0.113.1"):
+        request = RequestFactory().post("/admin-portal/signin/", HTTP_X_FORWARDED_FOR=forwarded_for)
+        return authenticate(request, username=username, password=password), request
+
+    def test_username_or_email(self):
+        self.assertEqual(self.login("jdoe", "right-password")[0], self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.login("jdoe@example.com", "right-password")[0], self.user)
+
+    def test_unknown_email_fails_cleanly(self):
+        self.assertIsNone(self.login("nobody@example.com", "right-password")[0])
+
+    def test_ambiguous_email_signs_nobody_in(self):
+        User.objects.create_user("jdoe2", "jdoe@example.com", "right-password")
+        self.assertIsNone(self.login("jdoe@example.com", "right-password")[0])
+
+    def test_locked_out_account_is_refused_before_hashing(self):
+        for _ in range(2):
+            self.login("jdoe", "wrong", forwarded_for="203.0.113.9")
+        with mock.patch.object(User, "check_password") as check_password:
+            user, request = self.login("jdoe", "right-password")
+        self.assertIsNone(user)
+        self.assertGreater(request.login_throttled, 0)
+        check_password.assert_not_called()
+
+    def test_success_clears_the_client_bucket(self):
+        for name in ("a", "b"):
+            self.login(name, "wrong")
+        self.assertEqual(self.login("jdoe", "right-password")[0], self.user)
+        # Three more failures are allowed again from the same address
+        for name in ("c", "d", "e"):
+            self.assertIsNone(self.login(name, "wrong")[0])
+        self.assertGreater(self.login("jdoe", "right-password")[1].login_throttled, 0)
+
+    def test_signin_view_reports_the_lockout(self):
+        for _ in range(2):
+            self.client.post("/admin-portal/signin/", {"username": "jdoe", "password": "wrong"})
+        response = self.client.post("/admin-portal/signin/", {"username": "jdoe@example.com", "password": "right-password"})
+        self.assertContains(response, "Too many failed sign-in attempts")
+
+
+@override_settings(CACHE_HAS_ATOMIC_INCR=True)
+class DownloadCounterTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.form = DownloadableForm.objects.create(name="Form", file="downloadable_forms/form.pdf")
+        # Keep the request path from flushing on its own
+        cache.add(counters.FLUSH_LOCK_KEY, 0, 3600)
+
+    def count(self):
+        self.form.refresh_from_db()
+        return self.form.download_count
+
+    def test_buffered_counts_reach_the_database_after_a_flush(self):
+        for _ in range(3):
+            counters.increment_download(self.form.id)
+        self.assertEqual(self.count(), 0)
+        self.assertEqual(counters.flush_downloads(), 3)
+        self.assertEqual(self.count(), 3)
+        # Nothing is applied twice
+        self.assertEqual(counters.flush_downloads(), 0)
+        self.assertEqual(self.count(), 3)
+
+    def test_flush_counters_command(self):
+        counters.increment_download(self.form.id)
+        call_command("flush_counters", stdout=StringIO())
+        self.assertEqual(self.count(), 1)
+
+    def test_flushed_totals_equal_the_increments(self):
+        for n in range(1, 101):
+            counters.increment_download(self.form.id)
+            if n % 7 == 0:
+                counters.flush_downloads()
+        counters.flush_downloads()
+        self.assertEqual(self.count(), 100)
+
+    def test_counts_evicted_after_being_read_are_still_applied(self):
+        for _ in range(2):
+            counters.increment_download(self.form.id)
+        with mock.patch.object(cache, "decr", side_effect=ValueError):
+            self.assertEqual(counters.flush_downloads(), 2)
+        self.assertEqual(self.count(), 2)
+
+    def test_flushes_take_turns(self):
+        counters.increment_download(self.form.id)
+        cache.add(counters.FLUSH_MUTEX_KEY, 1, 60)
+        self.assertEqual(counters.flush_downloads(wait=0), 0)
+        cache.delete(counters.FLUSH_MUTEX_KEY)
+        self.assertEqual(counters.flush_downloads(wait=0), 1)
+        self.assertEqual(self.count(), 1)
+
+    @override_settings(CACHE_HAS_ATOMIC_INCR=False)
+    def test_without_atomic_incr_downloads_are_written_through(self):
+        counters.increment_download(self.form.id)
+        self.assertEqual(self.count(), 1)
+        self.assertEqual(counters.flush_downloads(), 0)
+
+
+class RoleCacheTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("sec", "sec@example.com", "pw", user_type="secretary")
+        self.secretary = SecretaryAdmin.objects.create(user=self.user, full_name="Sec", email="sec@example.com")
+
+    def test_deactivation_is_seen_on_the_next_request(self):
+        self.assertTrue(get_user_roles(self.user).is_secretary)
+        self.secretary.is_active = False
+        self.secretary.save()
+        self.assertFalse(get_user_roles(self.user).is_secretary)
+
+    @override_settings(CACHE_IS_SHARED=False)
+    def test_roles_are_not_cached_without_a_shared_cache(self):
+        self.assertTrue(get_user_roles(self.user).is_secretary)
+        # A write made by another worker, which this one's cache never hears of
+        SecretaryAdmin.objects.filter(pk=self.secretary.pk).update(is_active=False)
+        self.assertFalse(get_user_roles(self.user).is_secretary)
+
+
+class GeneralSettingsTests(CacheTestCase):
+    def test_save_is_seen_by_the_next_load(self):
+        General.load().save()
+        general = General.load()
+        general.company_bank_name = "New Bank"
+        general.save()
+        self.assertEqual(General.load().company_bank_name, "New Bank")
+
+    def test_copy_held_by_another_worker_expires(self):
+        General.objects.create()
+        General.load()
+        # Changed elsewhere, without this process's cache hearing about it
+        General.objects.update(company_bank_name="Elsewhere")
+        self.assertNotEqual(General.load().company_bank_name, "Elsewhere")
+        with mock.patch("tripled.models.time.monotonic", return_value=time.monotonic() + General.MAX_AGE + 1):
+            self.assertEqual(General.load().company_bank_name, "Elsewhere")
+
+
+class FakeSMTPConnection:
+    """Stands in for the SMTP backend; ``errors`` are raised by the next sends, in order"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.opens = 0
+        self.sent = []
+        self.connected = False
+
+    def open(self):
+        if not self.connected:
+            self.connected = True
+            self.opens += 1
+
+    def close(self):
+        self.connected = False
+
+    def send_messages(self, messages):
+        if self.errors:
+            error = self.errors.pop(0)
+            if error is not None:
+                raise error
+        self.sent.extend(messages)
+        return len(messages)
+
+
+class OutboxDeliveryTests(TestCase):
+    def deliver(self, mail_connection, count=1):
+        for i in range(count):
+            outbox.enqueue("Subject", "Body", [f"client{i}@example.com"])
+        outbox.deliver(outbox.claim(10), mail_connection)
+        return list(EmailOutbox.objects.order_by("id"))
+
+    def test_dropped_connection_is_reopened_and_the_message_resent(self):
+        mail_connection = FakeSMTPConnection(smtplib.SMTPServerDisconnected("gone"))
+        [row] = self.deliver(mail_connection)
+        self.assertEqual(row.status, "sent")
+        self.assertEqual(mail_connection.opens, 2)
+
+    def test_temporary_smtp_error_is_retried_later_without_reconnecting(self):
+        mail_connection = FakeSMTPConnection(smtplib.SMTPDataError(451, b"try later"))
+        [row] = self.deliver(mail_connection)
+        self.assertEqual(row.status, "pending")
+        self.assertGreater(row.next_attempt_at, timezone.now())
+        self.assertEqual(mail_connection.opens, 1)
+        self.assertEqual(mail_connection.sent, [])
+
+    def test_refused_recipients_fail_for_good_without_reconnecting(self):
+        refused = smtplib.SMTPRecipientsRefused({"client0@example.com": (550, b"no such user")})
+        mail_connection = FakeSMTPConnection(refused)
+        [row] = self.deliver(mail_connection)
+        self.assertEqual(row.status, "failed")
+        self.assertIn("SMTPRecipientsRefused", row.last_error)
+        self.assertEqual(mail_connection.opens, 1)
+
+    def test_gives_up_after_max_attempts(self):
+        outbox.enqueue("Subject", "Body", ["client@example.com"])
+        EmailOutbox.objects.update(attempts=outbox.MAX_ATTEMPTS - 1)
+        outbox.deliver(outbox.claim(10), FakeSMTPConnection(smtplib.SMTPDataError(451, b"try later")))
+        self.assertEqual(EmailOutbox.objects.get().status, "failed")
+
+    def test_outcomes_are_saved_as_each_send_finishes(self):
+        # The worker is killed while sending the second message
+        mail_connection = FakeSMTPConnection(None, KeyboardInterrupt())
+        with self.assertRaises(KeyboardInterrupt):
+            self.deliver(mail_connection, count=3)
+        self.assertEqual(
+            list(EmailOutbox.objects.order_by("id").values_list("status", flat=True)),
+            ["sent", "sending", "sending"],
+        )
+
+
+class ClientPictureStorageTests(SimpleTestCase):
+    def test_client_pictures_are_private(self):
+        storage = PropertySale._meta.get_field("client_picture").storage
+        self.assertEqual(storage.location, str(settings.PRIVATE_MEDIA_ROOT))
+        self.assertFalse(storage.location.startswith(str(settings.MEDIA_ROOT)))
+        with self.assertRaises(ValueError):
+            storage.url("blobs/ab/abc.jpg")
+
+
+def image_file(name, color):
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new("RGB", (700, 400), color).save(buffer, "JPEG")
+    return ContentFile(buffer.getvalue(), name=name)
+
+
+def use_temporary_media_root(test):
+    media_root = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, media_root)
+    settings_override = override_settings(MEDIA_ROOT=media_root)
+    settings_override.enable()
+    test.addCleanup(settings_override.disable)
+
+
+class RenditionCleanupTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        use_temporary_media_root(self)
+
+    def renditions_of(self, name):
+        names = [
+            renditions.rendition_name(name, width, fmt)
+            for width in renditions.RENDITION_WIDTHS
+            for fmt in renditions.RENDITION_FORMATS
+        ]
+        return [rendition for rendition in names if default_storage.exists(rendition)]
+
+    def test_replacing_an_image_deletes_the_old_renditions(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            item = Gallery.objects.create(image=image_file("red.jpg", "red"))
+        old = item.image.name
+        self.assertEqual(len(self.renditions_of(old)), 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            item.image = image_file("blue.jpg", "blue")
+            item.save()
+        self.assertEqual(self.renditions_of(old), [])
+        self.assertEqual(len(self.renditions_of(item.image.name)), 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            item.delete()
+        self.assertEqual(self.renditions_of(item.image.name), [])
+
+    def test_renditions_of_a_shared_image_stay(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = Gallery.objects.create(image=image_file("red.jpg", "red"))
+            Gallery.objects.create(image=image_file("copy.jpg", "red"))
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(len(self.renditions_of(first.image.name)), 4)
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        use_temporary_media_root(self)
+
+    def test_deduplicated_upload_touches_the_blob(self):
+        name = default_storage.save("gallery/a.jpg", ContentFile(b"same bytes"))
+        an_hour_ago = time.time() - 3600
+        os.utime(default_storage.path(name), (an_hour_ago, an_hour_ago))
+
+        self.assertEqual(default_storage.save("gallery/b.jpg", ContentFile(b"same bytes")), name)
+        self.assertGreater(os.path.getmtime(default_storage.path(name)), an_hour_ago)
+
+    def test_garbage_collection_spares_recently_touched_blobs_and_their_renditions(self):
+        name = default_storage.save("gallery/a.jpg", ContentFile(b"unreferenced"))
+        rendition = default_storage.save(renditions.rendition_name(name, 320, "webp"), ContentFile(b"small"))
+        an_hour_ago = time.time() - 3600
+        os.utime(default_storage.path(rendition), (an_hour_ago, an_hour_ago))
+
+        call_command("collect_media_garbage", grace_minutes=30, stdout=StringIO())
+        self.assertTrue(default_storage.exists(name))
+        self.assertTrue(default_storage.exists(rendition))
+
+        os.utime(default_storage.path(name), (an_hour_ago, an_hour_ago))
+        call_command("collect_media_garbage", grace_minutes=30, stdout=StringIO())
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(default_storage.exists(rendition))
+
+    def test_renditions_are_deleted_without_a_reference_check(self):
+        name = default_storage.save("gallery/a.jpg", ContentFile(b"original"))
+        rendition = default_storage.save(renditions.rendition_name(name, 320, "jpeg"), ContentFile(b"small"))
+        with self.assertNumQueries(0):
+            default_storage.delete(rendition)
+        self.assertFalse(default_storage.exists(rendition))
+
+    def test_referenced_blobs_are_kept(self):
+        Gallery.objects.create(image="blobs/ab/" + "ab" * 32 + ".jpg")
+        name = default_storage.save("blobs/ab/" + "ab" * 32 + ".jpg", ContentFile(b"shared"))
+        default_storage.delete(name)
+        self.assertTrue(default_storage.exists(name))
+
+
+class ImageNormalizationTests(SimpleTestCase):
+    def png(self, size, mode="RGB"):
+        from PIL import Image
+
+        buffer = BytesIO()
+        Image.new(mode, size).save(buffer, "PNG")
+        return ContentFile(buffer.getvalue(), name="scan.png")
+
+    def test_downscales_to_max_dimension(self):
+        from PIL import Image
+
+        content, name = normalize_image(self.png((3000, 1500)), "scan.png")
+        self.assertEqual(name, "scan.jpg")
+        self.assertEqual(Image.open(content).size, (2560, 1280))
+
+    def test_refuses_images_over_the_pixel_budget_before_decoding(self):
+        with mock.patch("PIL.ImageFile.ImageFile.load") as load:
+            with self.assertRaises(ImageTooLarge):
+                normalize_image(self.png((10000, 6000), mode="1"), "scan.png")
+        load.assert_not_called()
+
+
+class CampaignQueueTests(TestCase):
+    def setUp(self):
+        for n in range(3):
+            Realtor.objects.create(
+                first_name=f"Realtor{n}", email=f"realtor{n}@example.com", referral_code=f"REF0000{n}"
+            )
+        self.campaign = campaigns.create("realtors", "Subject", "Hello", ids=Realtor.objects.values_list("id", flat=True))
+
+    def test_resuming_only_queues_the_missing_recipients(self):
+        self.assertEqual(campaigns.queue(self.campaign), 3)
+        self.campaign.emails.first().delete()
+        self.assertEqual(campaigns.queue(self.campaign), 1)
+        self.assertEqual(self.campaign.emails.count(), 3)
+
+    def test_concurrent_resumes_queue_each_recipient_once(self):
+        enqueue_many = campaigns.enqueue_many
+        raced = []
+
+        def racing_enqueue_many(rows, **kwargs):
+            if not raced:
+                # Another request resumes the campaign after this one picked its recipients
+                rows = list(rows)
+                raced.append(True)
+                campaigns.queue(self.campaign)
+            return enqueue_many(rows, **kwargs)
+
+        with mock.patch.object(campaigns, "enqueue_many", racing_enqueue_many):
+            campaigns.queue(self.campaign)
+        self.assertEqual(self.campaign.emails.count(), 3)
+
+
+class AccessPolicyTests(CacheTestCase):
+    PASS = None
+    # (user, path, where the middleware redirects to, or PASS to let the view decide)
+    CASES = [
+        ("secretary", "/accounting/", "/secretary-dashboard/"),
+        ("secretary", "/accounting/reports/", "/secretary-dashboard/"),
+        ("secretary", "/admin-portal/", "/secretary-dashboard/"),
+        ("secretary", "/secretary-dashboard/", PASS),
+        ("branch_admin", "/accounting/", PASS),
+        ("branch_admin", "/accounting/reports/", PASS),
+        ("branch_admin", "/admin-portal/", PASS),
+        ("branch_admin", "/secretary-dashboard/", "/accounting/dashboard/"),
+        ("admin", "/accounting/", "/admin-portal/"),
+        ("admin", "/accounting/reports/", "/admin-portal/"),
+        ("admin", "/admin-portal/", PASS),
+        ("admin", "/admin-portal/gallery/", PASS),
+        ("admin", "/secretary-dashboard/", "/admin-portal/"),
+        ("superuser", "/accounting/", PASS),
+        ("superuser", "/secretary-dashboard/", PASS),
+        # Anonymous users are left to login_required
+        ("anonymous", "/accounting/", PASS),
+        ("anonymous", "/admin-portal/", PASS),
+        ("anonymous", "/secretary-dashboard/", PASS),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        secretary = User.objects.create_user("secretary", user_type="secretary")
+        SecretaryAdmin.objects.create(user=secretary, full_name="Secretary", email="sec@example.com")
+        cls.users = {
+            "secretary": secretary,
+            "branch_admin": User.objects.create_user("branch", user_type="branch_admin"),
+            "admin": User.objects.create_user("admin", user_type="admin"),
+            "superuser": User.objects.create_superuser("root", "root@example.com", "pw"),
+            "anonymous": AnonymousUser(),
+        }
+
+    def test_route_policy(self):
+        middleware = PortalSecurityMiddleware(lambda request: HttpResponse("view"))
+        for user, path, expected in self.CASES:
+            with self.subTest(user=user, path=path):
+                request = RequestFactory().get(path)
+                request.user = self.users[user]
+                request._messages = CookieStorage(request)
+                response = middleware(request)
+                if expected is self.PASS:
+                    self.assertEqual(response.content, b"view")
+                else:
+                    self.assertEqual(response.status_code, 302)
+                    self.assertEqual(response["Location"], expected)
+
+
+class RollupTestCase(CacheTestCase):
+    """Sales fixtures, and the monthly rollups recomputed by hand from the source rows"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.estate = Property.objects.create(name="Green Acres", description="x", location="lagos", address="x")
+        cls.other_estate = Property.objects.create(name="Palm Court", description="x", location="ogun", address="x")
+        cls.realtor = Realtor.objects.create(
+            first_name="Ada", email="ada@example.com", referral_code="ADA00001", total_commission=Decimal("0")
+        )
+        cls.other_realtor = Realtor.objects.create(
+            first_name="Ben", email="ben@example.com", referral_code="BEN00001", total_commission=Decimal("0")
+        )
+
+    def sell(self, amount_paid="0", **fields):
+        fields = {
+            "description": "Plot",
+            "property_type": "land",
+            "property_item": self.estate,
+            "quantity": 1,
+            "original_price": Decimal("1000"),
+            "selling_price": Decimal("1000"),
+            "amount_paid": Decimal(amount_paid),
+            "realtor": self.realtor,
+            "realtor_commission_percentage": Decimal("10"),
+            **fields,
+        }
+        return PropertySale.objects.create(**fields)
+
+    def expected_sales(self):
+        rows = defaultdict(lambda: [0, Decimal("0"), Decimal("0")])
+        for sale in PropertySale.objects.select_related("property_item"):
+            row = rows[(
+                rollups.month_start(sale.created_at), sale.realtor_id, sale.property_item_id,
+                sale.property_item.location, sale.payment_plan,
+            )]
+            row[0] += 1
+            row[1] += sale.selling_price
+            row[2] += sale.amount_paid
+        return {key: tuple(row) for key, row in rows.items()}
+
+    def expected_commissions(self):
+        sales = {sale.reference_number: sale for sale in PropertySale.objects.select_related("property_item")}
+        rows = defaultdict(lambda: [0, Decimal("0")])
+        for commission in Commission.objects.all():
+            sale = sales.get(commission.property_reference)
+            row = rows[(
+                rollups.month_start(commission.created_at), commission.realtor_id,
+                sale.property_item_id if sale else None,
+                sale.property_item.location if sale else "",
+                sale.payment_plan if sale else "",
+                commission.is_paid,
+            )]
+            row[0] += 1
+            row[1] += commission.amount
+        return {key: tuple(row) for key, row in rows.items()}
+
+    def assertRollupsMatchSources(self):
+        self.assertEqual(
+            {
+                (row.month, row.realtor_id, row.property_id, row.state, row.payment_plan):
+                (row.sale_count, row.total_amount, row.amount_paid)
+                for row in SalesMonthly.objects.all()
+            },
+            self.expected_sales(),
+        )
+        self.assertEqual(
+            {
+                (row.month, row.realtor_id, row.property_id, row.state, row.payment_plan, row.is_paid):
+                (row.commission_count, row.total_amount)
+                for row in CommissionMonthly.objects.all()
+            },
+            self.expected_commissions(),
+        )
+
+
+class RollupSignalTests(RollupTestCase):
+    def test_new_sale(self):
+        self.sell(amount_paid="400")
+        self.sell(property_item=self.other_estate, payment_plan="3_months")
+        self.assertEqual(SalesMonthly.objects.count(), 2)
+        self.assertRollupsMatchSources()
+
+    def test_sale_moved_to_another_month_and_realtor(self):
+        sale = self.sell()
+        sale.created_at = datetime(2025, 3, 15, 12, tzinfo=dt_timezone.utc)
+        sale.realtor = self.other_realtor
+        sale.save()
+        row = SalesMonthly.objects.get()
+        self.assertEqual((row.month.isoformat(), row.realtor_id), ("2025-03-01", self.other_realtor.id))
+        self.assertRollupsMatchSources()
+
+    def test_deleted_sale(self):
+        self.sell().delete()
+        self.assertFalse(SalesMonthly.objects.exists())
+        self.assertRollupsMatchSources()
+
+    def test_payment(self):
+        sale = self.sell()
+        Payment.objects.create(property_sale=sale, amount=Decimal("250"))
+        self.assertEqual(SalesMonthly.objects.get().amount_paid, Decimal("250"))
+        self.assertEqual(CommissionMonthly.objects.get().total_amount, Decimal("25"))
+        self.assertRollupsMatchSources()
+
+    def test_admin_mark_as_unpaid(self):
+        Payment.objects.create(property_sale=self.sell(), amount=Decimal("1000"))
+        Commission.objects.get().mark_as_paid()
+        self.assertTrue(CommissionMonthly.objects.get().is_paid)
+
+        request = RequestFactory().post("/")
+        request._messages = CookieStorage(request)
+        CommissionAdmin(Commission, admin.site).mark_as_unpaid(request, Commission.objects.filter(is_paid=True))
+        self.assertFalse(CommissionMonthly.objects.get().is_paid)
+        self.assertRollupsMatchSources()
+
+
+class RollupDimensionTests(RollupTestCase):
+    def paid_sale(self, **fields):
+        sale = self.sell(**fields)
+        Payment.objects.create(property_sale=sale, amount=Decimal("500"))
+        sale.refresh_from_db()
+        return sale
+
+    def test_sale_moved_to_another_estate_and_plan(self):
+        sale = self.paid_sale()
+        sale.property_item = self.other_estate
+        sale.payment_plan = "6_months"
+        sale.save()
+        self.assertEqual(
+            list(CommissionMonthly.objects.values_list("property_id", "state", "payment_plan")),
+            [(self.other_estate.id, "ogun", "6_months")],
+        )
+        self.assertRollupsMatchSources()
+
+    def test_estate_relocated(self):
+        self.paid_sale()
+        self.estate.location = "oyo"
+        self.estate.save()
+        self.assertRollupsMatchSources()
+
+    def test_commission_changed_and_deleted(self):
+        self.paid_sale()
+        self.paid_sale(realtor=self.other_realtor)
+        commission = Commission.objects.filter(realtor=self.realtor).get()
+        commission.amount = Decimal("75")
+        commission.save()
+        self.assertRollupsMatchSources()
+        commission.delete()
+        self.assertRollupsMatchSources()
+
+    def test_refresh_sale(self):
+        sale = self.paid_sale()
+        self.paid_sale(realtor=self.other_realtor)
+        SalesMonthly.objects.all().delete()
+        CommissionMonthly.objects.all().delete()
+        rollups.refresh_sale(sale)
+        self.assertEqual(set(SalesMonthly.objects.values_list("realtor_id", flat=True)), {self.realtor.id})
+        self.assertEqual(set(CommissionMonthly.objects.values_list("realtor_id", flat=True)), {self.realtor.id})
+
+    def test_rebuild_rollups_command(self):
+        self.paid_sale()
+        self.paid_sale(property_item=self.other_estate, realtor=self.other_realtor, payment_plan="3_months")
+        SalesMonthly.objects.update(sale_count=99)
+        CommissionMonthly.objects.all().delete()
+        call_command("rebuild_rollups", stdout=StringIO())
+        self.assertRollupsMatchSources()
+
+    def test_sales_analytics_api(self):
+        self.paid_sale()
+        self.paid_sale(property_item=self.other_estate, payment_plan="3_months")
+        Commission.objects.filter(property_reference__in=PropertySale.objects.filter(
+            property_item=self.estate).values("reference_number")).get().mark_as_paid()
+        request = RequestFactory().post("/")
+        request._messages = CookieStorage(request)
+        CommissionAdmin(Commission, admin.site).mark_as_unpaid(request, Commission.objects.all())
+
+        self.client.force_login(User.objects.create_user("boss", is_staff=True))
+        response = self.client.get("/api/analytics/sales/", {"group_by": "estate"})
+        self.assertEqual(response.status_code, 200)
+        results = {row["key"]: row for row in response.json()["results"]}
+        for estate in (self.estate, self.other_estate):
+            sales = PropertySale.objects.filter(property_item=estate)
+            commissions = Commission.objects.filter(
+                property_reference__in=sales.values("reference_number")
+            )
+            with self.subTest(estate=estate.name):
+                row = results[estate.id]
+                self.assertEqual(row["sale_count"], sales.count())
+                self.assertEqual(row["sales_total"], float(sum(sale.selling_price for sale in sales)))
+                self.assertEqual(row["amount_paid"], float(sum(sale.amount_paid for sale in sales)))
+                self.assertEqual(row["commission_total"], float(sum(c.amount for c in commissions)))
+                self.assertEqual(row["commission_paid"], 0.0)
+                self.assertEqual(row["commission_unpaid"], row["commission_total"])
+
+
+class ConditionalResponseTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        use_temporary_media_root(self)
+        self.listing = WebsiteProperty.objects.create(
+            name="Green Acres", description="x", location="lagos", exact_location="Ikeja",
+            main_image="website_properties/green.jpg",
+        )
+        self.detail_url = f"/properties/{self.listing.id}/"
+
+    def validators(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response["ETag"], response.get("Last-Modified")
+
+    def test_matching_validators_get_304(self):
+        for url in ("/properties/", self.detail_url):
+            etag, modified = self.validators(url)
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+                self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=modified).status_code, 304)
+
+    def test_property_image_changes_the_detail_validators(self):
+        etag, _ = self.validators(self.detail_url)
+        WebsitePropertyImage.objects.create(property=self.listing, image="website_properties/gallery/a.jpg")
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_site_settings_change_the_listing_validators(self):
+        General.objects.create()
+        etag, _ = self.validators("/properties/")
+        general = General.objects.get()
+        general.save()
+        response = self.client.get("/properties/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_plot_changes_the_plot_validators(self):
+        self.client.force_login(User.objects.create_user("boss", is_staff=True))
+        estate = Property.objects.create(name="Green Acres", description="x", location="lagos", address="x")
+        plot = Plot.objects.create(property=estate, number="A1")
+        etag, _ = self.validators("/api/plots/get/", property_id=estate.id)
+        self.assertEqual(
+            self.client.get("/api/plots/get/", {"property_id": estate.id}, HTTP_IF_NONE_MATCH=etag).status_code,
+            304,
+        )
+        plot.is_taken = True
+        plot.save()
+        response = self.client.get("/api/plots/get/", {"property_id": estate.id}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_realtor_status_validators(self):
+        realtor = Realtor.objects.create(first_name="Ada", email="ada@example.com", referral_code="ADA00001")
+        url = f"/api/realtor/{realtor.id}/status/"
+        etag, _ = self.validators(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        realtor.status = "executive"
+        realtor.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "executive")
+
+    def test_signed_in_users_get_their_own_etag(self):
+        anonymous_etag, _ = self.validators(self.detail_url)
+        self.client.force_login(User.objects.create_user("boss", is_staff=True))
+        signed_in_etag, _ = self.validators(self.detail_url)
+        self.assertNotEqual(signed_in_etag, anonymous_etag)
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=anonymous_etag).status_code, 200)
@@ -14,6 +14,7 @@ urlpatterns = [
     path('', views.homepage, name='homepage'),
     path('home/', views.homepage, name='frontend_home_alias'),
     path('about/', views.about, name='about'),
+    path('csrf-token/', views.csrf_token, name='csrf_token'),
     path('contact/', views.contact, name='contact'),
     
     path("properties/", views.properties, name="properties"),
@@ -23,6 +24,7 @@ urlpatterns = [
     # ======================ADMIN PORTAL URLS=================================
     # Admin/Realtor Dashboard (previously /user/)
     path('admin-portal/', views.userhome, name='user'),
+    path('api/analytics/sales/', views.sales_analytics_api, name='sales_analytics_api'),
     path('admin-portal/signin/', views.signin, name='signin'),
     path('admin-portal/signout/', views.signout, name='signout'),
     path('admin-portal/profile/', views.profile, name='profile'),
@@ -62,6 +64,7 @@ urlpatterns = [
     path('admin-portal/property-sales/', views.property_sales_list, name='property_sales_list'),
     path('admin-portal/property-sales/register/', views.register_property_sale, name='register_property_sale'),
     path('admin-portal/property-sales/<int:id>/', views.property_sale_detail, name='property_sale_detail'),
+    path('admin-portal/property-sales/<int:sale_id>/client-picture/', views.property_sale_client_picture, name='property_sale_client_picture'),
     path('admin-portal/property-sale/<int:sale_id>/invoice/', views.property_sale_invoice, name='property_sale_invoice'),
     
     # Property sale emails
@@ -73,6 +76,11 @@ urlpatterns = [
     path('send-bulk-email/', views.send_bulk_email, name='send_bulk_email'),
     path('bulk-email-realtors/', views.bulk_email_realtors, name='bulk_email_realtors'),
     path('send-bulk-email-realtors/', views.send_bulk_email_realtors, name='send_bulk_email_realtors'),
+    path('bulk-email/segments/<str:audience>/save/', views.save_email_segment, name='save_email_segment'),
+    path('bulk-email/segments/<int:segment_id>/delete/', views.delete_email_segment, name='delete_email_segment'),
+    path('bulk-email/campaigns/<int:campaign_id>/progress/', views.campaign_progress, name='campaign_progress'),
+    path('bulk-email/campaigns/<int:campaign_id>/resume/', views.campaign_resume, name='campaign_resume'),
+    path('bulk-email/campaigns/<int:campaign_id>/retry-failed/', views.campaign_retry_failed, name='campaign_retry_failed'),
 
     # Frontend Extras Management
     path('admin-portal/frontend-extras/', views.frontend_extras, name='frontend_extras'),
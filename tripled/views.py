@@ -2,6 +2,7 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.http import FileResponse, Http404
 
 import os
+from urllib.parse import urlencode
 
 
 from django.contrib.auth import authenticate, login, logout
@@ -30,6 +31,10 @@ from .models import (
     DownloadableForm,
     WebsiteProperty,
     WebsitePropertyImage,
+    SalesMonthly,
+    CommissionMonthly,
+    Campaign,
+    EmailSegment,
 )
 from django.http import JsonResponse
 from decimal import Decimal, InvalidOperation
@@ -40,6 +45,7 @@ from django.utils import timezone
 
 
 from django.db.models import Sum  # Add this import
+from django.db.models import Count, Max
 
 from django.core.paginator import Paginator
 
@@ -52,8 +58,7 @@ from django.db.models.query_utils import Q
 from django.utils.http import urlsafe_base64_encode
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.encoding import force_bytes
-from django.core.mail import send_mail, BadHeaderError
-from django.core.mail import send_mass_mail
+from django.core.mail import BadHeaderError
 from django.http import HttpResponse
 
 # from django.contrib import messages
@@ -82,7 +87,16 @@ import logging
 from django.views.decorators.csrf import csrf_protect
 from django.utils.html import strip_tags
 
-from .helper import admin_required, admin_or_secretary_required, secretary_required
+from .helper import admin_required, admin_or_secretary_required, secretary_required, get_roles
+from .page_cache import cache_public_page, conditional, validators_from
+from .delivery import serve_file
+from .counters import increment_download
+from .ratelimit import login_throttled_message, rate_limit
+from .outbox import build as build_email, enqueue as enqueue_email, enqueue_many as enqueue_emails
+from . import campaigns, mail_templates, rollups
+from django.utils.text import slugify
+from django.middleware.csrf import get_token
+from django.views.decorators.cache import never_cache
 from django.db import transaction
 import string
 import random
@@ -99,6 +113,7 @@ def robots_txt(request):
     return HttpResponse("User-agent: *\nDisallow:", content_type="text/plain")
 
 
+@rate_limit("realtors_check", methods=("GET",), fields=())
 def realtors_check(request):
     """
     View for realtors to search for their profile using a query string.
@@ -242,83 +257,37 @@ def realtors_check(request):
 # ===================================                =================================================================================
 
 
-@login_required
-@admin_required
-def userhome(request):
-    # Calculate total sales amount (in Naira)
-    total_sales_amount = PropertySale.objects.aggregate(Sum("selling_price"))[
-        "selling_price__sum"
-    ] or Decimal("0")
-
-    # Count number of property sales transactions
-    total_sales_count = PropertySale.objects.count()
-
-    # Count total realtors
-    total_realtors = Realtor.objects.count()
-
-    # Count paid commissions
-    paid_commissions_count = Commission.objects.filter(is_paid=True).count()
-
-    # Count unpaid commissions
-    unpaid_commissions_count = Commission.objects.filter(is_paid=False).count()
-
-    # Calculate total paid commissions amount
-    total_paid_commissions = Commission.objects.filter(is_paid=True).aggregate(
-        Sum("amount")
-    )["amount__sum"] or Decimal("0")
-
-    # Calculate total unpaid commissions amount
-    total_unpaid_commissions = Commission.objects.filter(is_paid=False).aggregate(
-        Sum("amount")
-    )["amount__sum"] or Decimal("0")
-
-    # Format the numbers with appropriate suffixes
-    def format_number(number):
-        if number >= 1_000_000_000:  # Billions
-            return f"₦{number / 1_000_000_000:.1f}B"
-        elif number >= 1_000_000:  # Millions
-            return f"₦{number / 1_000_000:.1f}M"
-        elif number >= 1_000:  # Thousands
-            return f"₦{number / 1_000:.1f}K"
-        else:
-            return f"₦{number:.0f}"
-
-    # Get sales data by month for the current year
-    current_year = datetime.now().year
+def _dashboard_figures(year):
+    """Admin dashboard stats and chart series for ``year`` (cached by userhome)"""
+    # Scalar stats come from the monthly rollups (see tripled.rollups) as one
+    # conditional aggregate per table instead of a query per figure
+    sales_totals = SalesMonthly.objects.aggregate(
+        total_sales_amount=Sum("total_amount"),
+        total_sales_count=Sum("sale_count"),
+    )
+    commission_totals = CommissionMonthly.objects.aggregate(
+        paid_commissions_count=Sum("commission_count", filter=Q(is_paid=True)),
+        unpaid_commissions_count=Sum("commission_count", filter=Q(is_paid=False)),
+        total_paid_commissions=Sum("total_amount", filter=Q(is_paid=True)),
+        total_unpaid_commissions=Sum("total_amount", filter=Q(is_paid=False)),
+    )
 
     # Monthly sales data
     monthly_sales = (
-        PropertySale.objects.filter(created_at__year=current_year)
-        .annotate(month=TruncMonth("created_at"))
+        SalesMonthly.objects.filter(month__year=year)
         .values("month")
-        .annotate(total=Sum("selling_price"))
+        .annotate(total=Sum("total_amount"))
         .order_by("month")
     )
 
     # Monthly commissions data
     monthly_commissions = (
-        Commission.objects.filter(created_at__year=current_year)
-        .annotate(month=TruncMonth("created_at"))
+        CommissionMonthly.objects.filter(month__year=year)
         .values("month")
-        .annotate(total=Sum("amount"))
+        .annotate(total=Sum("total_amount"))
         .order_by("month")
     )
 
-    # Prepare chart data
-    months = [
-        "Jan",
-        "Feb",
-        "Mar",
-        "Apr",
-        "May",
-        "Jun",
-        "Jul",
-        "Aug",
-        "Sep",
-        "Oct",
-        "Nov",
-        "Dec",
-    ]
     sales_data = [0] * 12
     commission_data = [0] * 12
 
@@ -332,8 +301,8 @@ def userhome(request):
 
     # Get top 5 realtors by commission earned
     top_realtors = (
-        Realtor.objects.annotate(commission_earned=Sum("commissions__amount"))
-        .exclude(commission_earned=None)
+        CommissionMonthly.objects.values("realtor_id", "realtor__first_name", "realtor__last_name")
+        .annotate(commission_earned=Sum("total_amount"))
         .order_by("-commission_earned")[:5]
     )
 
@@ -341,25 +310,78 @@ def userhome(request):
     for realtor in top_realtors:
         top_realtors_data.append(
             {
-                "name": realtor.full_name,
-                "commission": float(realtor.commission_earned or 0),
+                "name": f"{realtor['realtor__first_name']} {realtor['realtor__last_name']}",
+                "commission": float(realtor["commission_earned"] or 0),
             }
         )
 
+    return {
+        "total_sales_amount": sales_totals["total_sales_amount"] or Decimal("0"),
+        "total_sales_count": sales_totals["total_sales_count"] or 0,
+        "total_realtors": Realtor.objects.count(),
+        "paid_commissions_count": commission_totals["paid_commissions_count"] or 0,
+        "unpaid_commissions_count": commission_totals["unpaid_commissions_count"] or 0,
+        "total_paid_commissions": commission_totals["total_paid_commissions"] or Decimal("0"),
+        "total_unpaid_commissions": commission_totals["total_unpaid_commissions"] or Decimal("0"),
+        "sales_data": sales_data,
+        "commission_data": commission_data,
+        "top_realtors": top_realtors_data,
+    }
+
+
+@login_required
+@admin_required
+def userhome(request):
+    # Get sales data by month for the current year
+    current_year = datetime.now().year
+    # Recomputed only after the rollups or realtors change (see tripled.rollups.DASHBOARD)
+    figures = rollups.DASHBOARD.get_or_set(
+        ("figures", current_year), lambda: _dashboard_figures(current_year)
+    )
+
+    # Format the numbers with appropriate suffixes
+    def format_number(number):
+        if number >= 1_000_000_000:  # Billions
+            return f"₦{number / 1_000_000_000:.1f}B"
+        elif number >= 1_000_000:  # Millions
+            return f"₦{number / 1_000_000:.1f}M"
+        elif number >= 1_000:  # Thousands
+            return f"₦{number / 1_000:.1f}K"
+        else:
+            return f"₦{number:.0f}"
+
+    # Prepare chart data
+    months = [
+        "Jan",
+        "Feb",
+        "Mar",
+        "Apr",
+        "May",
+        "Jun",
+        "Jul",
+        "Aug",
+        "Sep",
+        "Oct",
+        "Nov",
+        "Dec",
+    ]
+
     # Format data for JavaScript
     chart_data = {
         "months": months,
-        "sales": sales_data,
-        "commissions": commission_data,
-        "topRealtors": top_realtors_data,
+        "sales": figures["sales_data"],
+        "commissions": figures["commission_data"],
+        "topRealtors": figures["top_realtors"],
     }
 
+    total_paid_commissions = figures["total_paid_commissions"]
+    total_unpaid_commissions = figures["total_unpaid_commissions"]
     context = {
-        "total_sales_amount": format_number(total_sales_amount),
-        "total_sales_count": total_sales_count,
-        "total_realtors": total_realtors,
-        "paid_commissions_count": paid_commissions_count,
-        "unpaid_commissions_count": unpaid_commissions_count,
+        "total_sales_amount": format_number(figures["total_sales_amount"]),
+        "total_sales_count": figures["total_sales_count"],
+        "total_realtors": figures["total_realtors"],
+        "paid_commissions_count": figures["paid_commissions_count"],
+        "unpaid_commissions_count": figures["unpaid_commissions_count"],
         "total_paid_commissions": format_number(total_paid_commissions),
         "total_unpaid_commissions": format_number(total_unpaid_commissions),
         "total_paid_commissions_raw": float(total_paid_commissions),  # Raw value for calculations
@@ -370,6 +392,122 @@ def userhome(request):
     return render(request, "user/home.html", context)
 
 
+@login_required
+@admin_required
+def sales_analytics_api(request):
+    """
+    Drill-down sales and commission totals, answered only from the monthly
+    rollup tables (SalesMonthly / CommissionMonthly).
+
+    GET parameters:
+        group_by: estate (default), state, realtor, payment_plan or month
+        year, month_from, month_to (YYYY-MM): period filters
+        property_id, state, realtor_id, payment_plan: dimension filters
+    """
+    dimensions = {
+        "estate": ["property_id", "property__name"],
+        "state": ["state"],
+        "realtor": ["realtor_id", "realtor__first_name", "realtor__last_name"],
+        "payment_plan": ["payment_plan"],
+        "month": ["month"],
+    }
+    group_by = request.GET.get("group_by", "estate")
+    if group_by not in dimensions:
+        return JsonResponse(
+            {"success": False, "error": f"group_by must be one of: {', '.join(dimensions)}"},
+            status=400,
+        )
+
+    # Both rollup tables share the dimension columns, so one filter serves both
+    filters = Q()
+    try:
+        if request.GET.get("year"):
+            filters &= Q(month__year=int(request.GET["year"]))
+        if request.GET.get("month_from"):
+            filters &= Q(month__gte=datetime.strptime(request.GET["month_from"], "%Y-%m").date())
+        if request.GET.get("month_to"):
+            filters &= Q(month__lte=datetime.strptime(request.GET["month_to"], "%Y-%m").date())
+        if request.GET.get("property_id"):
+            filters &= Q(property_id=int(request.GET["property_id"]))
+        if request.GET.get("realtor_id"):
+            filters &= Q(realtor_id=int(request.GET["realtor_id"]))
+    except ValueError:
+        return JsonResponse(
+            {"success": False, "error": "Invalid year, month or id filter."}, status=400
+        )
+    if request.GET.get("state"):
+        filters &= Q(state=request.GET["state"])
+    if request.GET.get("payment_plan"):
+        filters &= Q(payment_plan=request.GET["payment_plan"])
+
+    fields = dimensions[group_by]
+    sales = (
+        SalesMonthly.objects.filter(filters)
+        .values(*fields)
+        .annotate(
+            sale_count=Sum("sale_count"),
+            sales_total=Sum("total_amount"),
+            amount_paid=Sum("amount_paid"),
+        )
+        .order_by()
+    )
+    commissions = (
+        CommissionMonthly.objects.filter(filters)
+        .values(*fields)
+        .annotate(
+            commission_count=Sum("commission_count"),
+            commission_total=Sum("total_amount"),
+            commission_paid=Sum("total_amount", filter=Q(is_paid=True)),
+            commission_unpaid=Sum("total_amount", filter=Q(is_paid=False)),
+        )
+        .order_by()
+    )
+
+    state_names = dict(Property.STATES_CHOICES)
+    plan_names = dict(PropertySale.PAYMENT_PLAN_CHOICES)
+
+    def label_for(row):
+        if group_by == "estate":
+            return row["property__name"] or "Unlinked commissions"
+        if group_by == "realtor":
+            return f"{row['realtor__first_name']} {row['realtor__last_name']}"
+        if group_by == "state":
+            return state_names.get(row["state"], row["state"] or "Unknown")
+        if group_by == "payment_plan":
+            return plan_names.get(row["payment_plan"], row["payment_plan"] or "Unknown")
+        return row["month"].strftime("%b %Y")
+
+    results = {}
+    for row in list(sales) + list(commissions):
+        key = row[fields[0]]
+        entry = results.setdefault(
+            key,
+            {
+                "key": key.isoformat() if group_by == "month" else key,
+                "label": label_for(row),
+                "sale_count": 0,
+                "sales_total": 0.0,
+                "amount_paid": 0.0,
+                "commission_count": 0,
+                "commission_total": 0.0,
+                "commission_paid": 0.0,
+                "commission_unpaid": 0.0,
+            },
+        )
+        for measure in entry:
+            if measure not in ("key", "label") and row.get(measure) is not None:
+                entry[measure] = (
+                    row[measure] if measure.endswith("_count") else float(row[measure])
+                )
+
+    if group_by == "month":
+        ordered = sorted(results.values(), key=lambda entry: entry["key"])
+    else:
+        ordered = sorted(results.values(), key=lambda entry: entry["sales_total"], reverse=True)
+
+    return JsonResponse({"success": True, "group_by": group_by, "results": ordered})
+
+
 @login_required
 @admin_required
 def profile(request):
@@ -421,17 +559,8 @@ def signin(request):
         username = request.POST.get("username")
         password = request.POST.get("password")
 
-        # user = authenticate(request, username=username, password=password)
-        user = None
-
-        if "@" in username:  # Email login case
-            user = authenticate(
-                request,
-                username=User.objects.filter(email=username).first().username,
-                password=password,
-            )
-        else:  # Username login case
-            user = authenticate(request, username=username, password=password)
+        # Username or email; see tripled.backends.EmailOrUsernameBackend
+        user = authenticate(request, username=username, password=password)
 
         if user is not None:
             # Strict Access Control: Block Branch Admins
@@ -443,18 +572,18 @@ def signin(request):
             messages.success(request, "Login Successful!")
 
             # Check if user is a secretary admin
-            try:
-                secretary = SecretaryAdmin.objects.get(user=user)
-                if secretary.is_active:
-                    return redirect("secretary_dashboard")
-                else:
-                    messages.error(
-                        request, "Your secretary account is currently inactive."
-                    )
-                    return redirect("signin")
-            except SecretaryAdmin.DoesNotExist:
-                # Regular admin user
-                return redirect("user")
+            roles = get_roles(request)
+            if roles.is_secretary:
+                return redirect("secretary_dashboard")
+            elif roles.has_secretary_account:
+                messages.error(
+                    request, "Your secretary account is currently inactive."
+                )
+                return redirect("signin")
+            # Regular admin user
+            return redirect("user")
+        elif getattr(request, "login_throttled", 0):
+            messages.error(request, login_throttled_message(request.login_throttled))
         else:
             messages.error(request, "Invalid username or password")
     return render(request, "user/signin.html")
@@ -603,19 +732,13 @@ This is an automated message. Please do not reply to this email.
 For support, contact us through our official channels.
                 """.strip()
 
-                # Send the email
-                send_mail(
-                    subject=subject,
-                    message=message,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[email],
-                    fail_silently=False,
-                )
+                # Queue the email for the outbox worker
+                enqueue_email(subject, message, [email])
 
-                logger.info(f"Welcome email sent successfully to {email}")
+                logger.info(f"Welcome email queued for {email}")
                 messages.success(
                     request,
-                    f"Realtor profile created successfully! Referral code: {realtor.referral_code}. A welcome email has been sent to {email}.",
+                    f"Realtor profile created successfully! Referral code: {realtor.referral_code}. A welcome email is on its way to {email}.",
                 )
 
             except Exception as email_error:
@@ -919,7 +1042,18 @@ def edit_property(request, property_id):
     )
 
 
+def _plots_validators(request):
+    property_id = request.GET.get('property_id')
+    if not property_id or not property_id.isdigit():
+        return None, None
+    plots = Plot.objects.filter(property_id=property_id).aggregate(
+        count=Count('id'), latest=Max('updated_at')
+    )
+    return validators_from('plots', property_id, plots['count'], plots['latest'])
+
+
 @login_required
+@conditional(_plots_validators)
 def ajax_get_plots(request):
     property_id = request.GET.get('property_id')
     if not property_id:
@@ -1027,36 +1161,31 @@ def send_client_email(request, sale_id):
         # Build absolute URL for logo (required for email clients)
         logo_url = request.build_absolute_uri('/static/user/images/tripledlogo.jpeg')
 
-        # Prepare context for email template
-        context = {
+        # Per-client fields of the email template
+        values = {
             "client_name": sale.client_name,
             "property_name": sale.property_item.name,
             "expiry_date": sale.plot_development_expiry_date.strftime("%B %d, %Y")
             if sale.plot_development_expiry_date
             else "Not Set",
-            "development_duration": development_duration,
             "reference_number": sale.reference_number,
-            "current_date": datetime.now().strftime("%B %d, %Y"),
-            "logo_url": logo_url,  # Absolute URL for logo in emails
         }
 
-        # Render email content
-        html_message = render_to_string(template_name, context)
-        plain_message = strip_tags(html_message)
-
-        # Send email
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[sale.client_email],
-            html_message=html_message,
-            fail_silently=False,
+        # Render email content from the precompiled template (plain text included)
+        plain_message, html_message = mail_templates.render(
+            template_name,
+            values,
+            development_duration=development_duration,
+            current_date=datetime.now().strftime("%B %d, %Y"),
+            logo_url=logo_url,  # Absolute URL for logo in emails
         )
 
-        # Log the email sent
+        # Queue email
+        enqueue_email(subject, plain_message, [sale.client_email], html_body=html_message)
+
+        # Log the email queued
         logger.info(
-            f"Email sent to {sale.client_email} for sale {sale.reference_number}"
+            f"Email queued for {sale.client_email} for sale {sale.reference_number}"
         )
 
         return JsonResponse(
@@ -1163,17 +1292,11 @@ Reference: {sale.reference_number}
 Property: {sale.property_item.name}
         """
 
-        # Send email
-        send_mail(
-            subject=subject,
-            message=email_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[sale.client_email],
-            fail_silently=False,
-        )
+        # Queue email
+        enqueue_email(subject, email_message, [sale.client_email])
 
         logger.info(
-            f"Private email sent to {sale.client_email} for sale {sale.reference_number}"
+            f"Private email queued for {sale.client_email} for sale {sale.reference_number}"
         )
 
         return JsonResponse({"success": True, "message": "Email sent successfully!"})
@@ -1187,147 +1310,103 @@ Property: {sale.property_item.name}
         )
 
 
-@login_required
-@admin_required
-def bulk_email(request):
-    """Display bulk email page with all sales records"""
-
-    # Get all sales records - no filtering or pagination
-    sales = PropertySale.objects.select_related("property_item", "realtor", "created_by").order_by(
-        "-created_at"
-    )
-
-    # Get all properties for the estate filter dropdown
-    properties = Property.objects.all().order_by("name")
+def _bulk_email_page(request, audience, template, **context):
+    """Recipient picker for a bulk email page: one page of filtered rows plus the segments"""
+    filters = campaigns.clean_filters(audience, request.GET)
+    rows = campaigns.filter_recipients(audience, filters)
+    page = Paginator(rows, campaigns.PAGE_SIZE).get_page(request.GET.get("page"))
+    segments = [
+        {"name": name, "query": urlencode(segment_filters)}
+        for name, segment_filters in campaigns.segments(audience)
+    ]
+    context.update({
+        "page_obj": page,
+        "filters": filters,
+        "current_query": urlencode(filters),
+        "mailable_count": campaigns.recipients(audience, filters=filters).count(),
+        "segments": segments,
+        "saved_segments": EmailSegment.objects.filter(audience=audience),
+        "latest_campaign": Campaign.objects.filter(audience=audience).first(),
+    })
+    return render(request, template, context)
 
-    context = {
-        "sales": sales,
-        "properties": properties,
-    }
 
-    return render(request, "user/bulk_email.html", context)
+def _send_bulk_campaign(request, audience, ids_field, noun):
+    """
+    Start a campaign to the hand-picked ids posted in ``ids_field`` or, with
+    mode=filtered, to everyone matching the posted filters
+    """
+    subject = request.POST.get("subject", "").strip()
+    message = request.POST.get("message", "").strip()
 
+    if not subject or not message:
+        return JsonResponse(
+            {"success": False, "error": "Subject and message are required."}
+        )
 
-@login_required
-@admin_required
-@require_http_methods(["POST"])
-def send_bulk_email(request):
-    """Send bulk emails to selected clients"""
     try:
-        # Get form data
-        subject = request.POST.get("subject", "").strip()
-        message = request.POST.get("message", "").strip()
-        client_ids_json = request.POST.get("client_ids", "[]")
-
-        if not subject or not message:
-            return JsonResponse(
-                {"success": False, "error": "Subject and message are required."}
-            )
-
-        # Parse client IDs
-        try:
-            client_ids = json.loads(client_ids_json)
-        except json.JSONDecodeError:
-            return JsonResponse(
-                {"success": False, "error": "Invalid client selection."}
-            )
-
-        if not client_ids:
-            return JsonResponse(
-                {"success": False, "error": "Please select at least one client."}
-            )
-
-        # Get selected sales - only those with valid emails
-        sales = PropertySale.objects.filter(
-            id__in=client_ids, client_email__isnull=False, client_email__gt=""
-        ).select_related("property_item")
-
-        if not sales.exists():
-            return JsonResponse(
-                {
-                    "success": False,
-                    "error": "No valid email addresses found for selected clients.",
-                }
-            )
-
-        sent_count = 0
-        failed_emails = []
-
-        # Send emails
-        for sale in sales:
-            try:
-                # Personalize the message
-                personalized_message = f"""Dear {sale.client_name},
-
-{message}
-
-Best regards,
-Triple D Big Dream Homes ADMIN
-
-Head office address.
-No 66 Shehu RD Lakeview estate 
-phase 2 Ago palace way Amuwo odofin Lagos.
-
-Branches addresses.
-
-Suit 1 Adonai Complex
-No 2 Onyiuke  Street,
-Off Edimbo Road, Ogui New Layout, Enugu
-
-Shop B8/B11, Block C, Millennium Plaza, 
-Opp. ABS, Behind UBA,Aroma, 
-Enugu-Onitsha Express road, Awka, Anambra State.
-
-
+        ids = json.loads(request.POST.get(ids_field, "[]"))
+        filters = json.loads(request.POST.get("filters", "{}"))
+    except json.JSONDecodeError:
+        return JsonResponse(
+            {"success": False, "error": f"Invalid {noun} selection."}
+        )
 
-Phone: +2348033035633
-Email: info@tripledhomes.com.ng
+    if request.POST.get("mode") == "filtered":
+        ids = []
+        if not isinstance(filters, dict):
+            return JsonResponse({"success": False, "error": f"Invalid {noun} selection."})
+    elif not ids:
+        return JsonResponse(
+            {"success": False, "error": f"Please select at least one {noun}."}
+        )
+    else:
+        filters = {}
 
----
-Property Details:
-Reference: {sale.reference_number}
-Estate: {sale.property_item.name}
-Property Type: {sale.get_property_type_display()}
-                """
-
-                # Send email
-                send_mail(
-                    subject=subject,
-                    message=personalized_message,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[sale.client_email],
-                    fail_silently=False,
-                )
+    # Only recipients with valid emails are mailed
+    if not campaigns.recipients(audience, ids, filters).exists():
+        return JsonResponse(
+            {
+                "success": False,
+                "error": f"No valid email addresses found for selected {noun}s.",
+            }
+        )
 
-                sent_count += 1
+    # Record the campaign, then queue one email per recipient; the outbox
+    # worker delivers them and the UI polls campaign_progress
+    campaign = campaigns.create(
+        audience, subject, message, ids=ids, filters=filters,
+        segment=request.POST.get("segment", "").strip()[:255], user=request.user,
+    )
+    sent_count = campaigns.queue(campaign)
 
-            except Exception as e:
-                failed_emails.append(sale.client_email)
-                # Log the error if you have logging configured
-                print(f"Failed to send email to {sale.client_email}: {str(e)}")
+    return JsonResponse(
+        {
+            "success": True,
+            "campaign_id": campaign.id,
+            "sent_count": sent_count,
+            "progress_url": reverse("campaign_progress", args=[campaign.id]),
+            "message": f"Queued {sent_count} emails for delivery.",
+        }
+    )
 
-        # Prepare response
-        if sent_count > 0:
-            response_data = {
-                "success": True,
-                "sent_count": sent_count,
-                "message": f"Successfully sent {sent_count} emails.",
-            }
 
-            if failed_emails:
-                response_data["warning"] = (
-                    f"Failed to send to: {', '.join(failed_emails)}"
-                )
+@login_required
+@admin_required
+def bulk_email(request):
+    """Display bulk email page with a filtered, paginated list of sales records"""
+    # Properties for the estate filter dropdown
+    properties = Property.objects.all().order_by("name")
+    return _bulk_email_page(request, "clients", "user/bulk_email.html", properties=properties)
 
-            return JsonResponse(response_data)
-        else:
-            return JsonResponse(
-                {
-                    "success": False,
-                    "error": "Failed to send any emails. Please check the email configuration.",
-                }
-            )
 
+@login_required
+@admin_required
+@require_http_methods(["POST"])
+def send_bulk_email(request):
+    """Send bulk emails to selected clients"""
+    try:
+        return _send_bulk_campaign(request, "clients", "client_ids", "client")
     except Exception as e:
         print(f"Error in bulk email sending: {str(e)}")
         return JsonResponse(
@@ -1341,16 +1420,8 @@ Property Type: {sale.get_property_type_display()}
 @login_required
 @admin_required
 def bulk_email_realtors(request):
-    """Display bulk email page with all realtors"""
-    
-    # Get all realtors
-    realtors = Realtor.objects.all().order_by("-created_at")
-    
-    context = {
-        "realtors": realtors,
-    }
-    
-    return render(request, "user/bulk_email_realtors.html", context)
+    """Display bulk email page with a filtered, paginated list of realtors"""
+    return _bulk_email_page(request, "realtors", "user/bulk_email_realtors.html")
 
 
 @login_required
@@ -1359,125 +1430,78 @@ def bulk_email_realtors(request):
 def send_bulk_email_realtors(request):
     """Send bulk emails to selected realtors"""
     try:
-        # Get form data
-        subject = request.POST.get("subject", "").strip()
-        message = request.POST.get("message", "").strip()
-        realtor_ids_json = request.POST.get("realtor_ids", "[]")
-        
-        if not subject or not message:
-            return JsonResponse(
-                {"success": False, "error": "Subject and message are required."}
-            )
-        
-        # Parse realtor IDs
-        try:
-            realtor_ids = json.loads(realtor_ids_json)
-        except json.JSONDecodeError:
-            return JsonResponse(
-                {"success": False, "error": "Invalid realtor selection."}
-            )
-        
-        if not realtor_ids:
-            return JsonResponse(
-                {"success": False, "error": "Please select at least one realtor."}
-            )
-        
-        # Get selected realtors - only those with valid emails
-        realtors = Realtor.objects.filter(
-            id__in=realtor_ids, email__isnull=False, email__gt=""
+        return _send_bulk_campaign(request, "realtors", "realtor_ids", "realtor")
+    except Exception as e:
+        logger.error(f"Error in send_bulk_email_realtors: {str(e)}")
+        return JsonResponse(
+            {"success": False, "error": f"An error occurred: {str(e)}"}
         )
-        
-        if not realtors.exists():
-            return JsonResponse(
-                {
-                    "success": False,
-                    "error": "No valid email addresses found for selected realtors.",
-                }
-            )
-        
-        sent_count = 0
-        failed_emails = []
-        
-        # Send emails
-        for realtor in realtors:
-            try:
-                # Personalize the message
-                personalized_message = f"""Dear {realtor.full_name},
 
-{message}
 
-Best regards,
-Triple D Big Dream Homes ADMIN
+@login_required
+@admin_required
+@require_http_methods(["POST"])
+def save_email_segment(request, audience):
+    """Save the bulk email page's current filters as a named segment"""
+    if audience not in campaigns.AUDIENCES:
+        raise Http404
+    page = "bulk_email" if audience == "clients" else "bulk_email_realtors"
+    name = request.POST.get("name", "").strip()
+    filters = campaigns.clean_filters(audience, request.POST)
+    if not name or not filters:
+        messages.error(request, "Give the segment a name and apply at least one filter first.")
+    else:
+        EmailSegment.objects.create(name=name[:255], audience=audience, filters=filters, created_by=request.user)
+        messages.success(request, f"Segment '{name}' saved.")
+    return redirect(f"{reverse(page)}?{urlencode(filters)}")
 
-Head office address.
-No 66 Shehu RD Lakeview estate 
-phase 2 Ago palace way Amuwo odofin Lagos.
 
-Branches addresses.
+@login_required
+@admin_required
+@require_http_methods(["POST"])
+def delete_email_segment(request, segment_id):
+    """Delete a saved bulk email segment"""
+    segment = get_object_or_404(EmailSegment, id=segment_id)
+    segment.delete()
+    messages.success(request, f"Segment '{segment.name}' deleted.")
+    return redirect("bulk_email" if segment.audience == "clients" else "bulk_email_realtors")
+
+
+def _campaign_payload(campaign, **extra):
+    return {
+        "success": True,
+        **extra,
+        **campaigns.progress(campaign),
+        "progress_url": reverse("campaign_progress", args=[campaign.id]),
+        "resume_url": reverse("campaign_resume", args=[campaign.id]),
+        "retry_url": reverse("campaign_retry_failed", args=[campaign.id]),
+    }
 
-Suit 1 Adonai Complex
-No 2 Onyiuke  Street,
-Off Edimbo Road, Ogui New Layout, Enugu
 
-Shop B8/B11, Block C, Millennium Plaza, 
-Opp. ABS, Behind UBA,Aroma, 
-Enugu-Onitsha Express road, Awka, Anambra State.
+@login_required
+@admin_required
+def campaign_progress(request, campaign_id):
+    """Delivery progress of a bulk email campaign (polled by the bulk email pages)"""
+    campaign = get_object_or_404(Campaign, id=campaign_id)
+    return JsonResponse(_campaign_payload(campaign))
 
-Phone: +2348033035633
-Email: info@tripledhomes.com.ng
 
----
-Realtor Details:
-Name: {realtor.full_name}
-Email: {realtor.email}
-Phone: {realtor.phone or 'Not provided'}
-Status: {realtor.status_display}
-Referral Code: {realtor.referral_code}
-                """
-                
-                # Send email
-                send_mail(
-                    subject=subject,
-                    message=personalized_message,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[realtor.email],
-                    fail_silently=False,
-                )
-                
-                sent_count += 1
-                
-            except Exception as e:
-                failed_emails.append(realtor.email)
-                # Log the error if you have logging configured
-                print(f"Failed to send email to {realtor.email}: {str(e)}")
-        
-        # Prepare response
-        if sent_count > 0:
-            response_data = {
-                "success": True,
-                "sent_count": sent_count,
-                "message": f"Successfully sent {sent_count} emails.",
-            }
-            
-            if failed_emails:
-                response_data["warning"] = (
-                    f"Failed to send to: {', '.join(failed_emails)}"
-                )
-            
-            return JsonResponse(response_data)
-        else:
-            return JsonResponse(
-                {
-                    "success": False,
-                    "error": "Failed to send emails. Please try again.",
-                }
-            )
-            
-    except Exception as e:
-        logger.error(f"Error in send_bulk_email_realtors: {str(e)}")
-        return JsonResponse(
-            {"success": False, "error": f"An error occurred: {str(e)}"}
-        )
+@login_required
+@admin_required
+@require_http_methods(["POST"])
+def campaign_resume(request, campaign_id):
+    """Queue the recipients an interrupted campaign never got to"""
+    campaign = get_object_or_404(Campaign, id=campaign_id)
+    return JsonResponse(_campaign_payload(campaign, added=campaigns.queue(campaign)))
+
+
+@login_required
+@admin_required
+@require_http_methods(["POST"])
+def campaign_retry_failed(request, campaign_id):
+    """Send a campaign again to the recipients it failed for"""
+    campaign = get_object_or_404(Campaign, id=campaign_id)
+    return JsonResponse(_campaign_payload(campaign, added=campaigns.retry_failed(campaign)))
 
 
 @login_required
@@ -1807,7 +1831,7 @@ def register_property_sale(request):  # with expiry date
                     plots = Plot.objects.filter(id__in=selected_plots_ids, property=property_obj)
                     if plots.exists():
                         property_sale.plots.set(plots)
-                        plots.update(is_taken=True)
+                        plots.update(is_taken=True, updated_at=timezone.now())
                         # Ensure quantity matches selected plots
                         if property_sale.quantity != plots.count():
                             property_sale.quantity = plots.count()
@@ -2081,7 +2105,7 @@ def frontend_extras(request):
 def manage_social_media(request):
     """View to manage social media links"""
     # Ensure a General object exists
-    general, created = General.objects.get_or_create(id=1)
+    general = General.load()
     
     if request.method == "POST":
         general.facebook_url = request.POST.get("facebook_url")
@@ -2232,6 +2256,18 @@ def delete_property_image(request, image_id):
     
 
 
+@login_required
+def property_sale_client_picture(request, sale_id):
+    """Client photo of a sale, for signed-in staff only"""
+    sale = get_object_or_404(PropertySale, id=sale_id)
+    if not sale.client_picture:
+        raise Http404("No client picture")
+    try:
+        return serve_file(request, sale.client_picture)
+    except FileNotFoundError:
+        raise Http404("File not found")
+
+
 @login_required
 def property_sale_invoice(request, sale_id):
     """
@@ -2242,12 +2278,8 @@ def property_sale_invoice(request, sale_id):
 
     # Calculate balance due
     balance_due = sale.selling_price - sale.amount_paid
-    # Get or create general settings (singleton pattern - only one instance)
-    # Don't force id=1 to avoid conflicts with database sequences
-    settings, created = General.objects.get_or_create()
-    # If multiple exist, use the first one
-    if not created and General.objects.count() > 1:
-        settings = General.objects.first()
+    # Cached general settings singleton (created on first use)
+    settings = General.load()
 
     context = {
         "sale": sale,
@@ -2446,6 +2478,7 @@ def realtor_unpaid_commissions_print(request, realtor_id):
 
 # =============================================================================================
 # ==================================Password reset===============================
+@rate_limit("password_reset")
 def password_reset_request(request):
     """
     View for handling password reset requests
@@ -2470,13 +2503,7 @@ def password_reset_request(request):
                     }
                     email = render_to_string(email_template_name, c)
                     try:
-                        send_mail(
-                            subject,
-                            email,
-                            "info@tripledhomes.com.ng",
-                            [user.email],
-                            fail_silently=False,
-                        )
+                        enqueue_email(subject, email, [user.email], from_email="info@tripledhomes.com.ng")
                     except BadHeaderError:
                         return HttpResponse("Invalid header found.")
                     return redirect("password_reset_done")
@@ -2546,13 +2573,8 @@ def general_settings(request):
     """
     View to handle displaying and updating general settings
     """
-    # Get or create general settings object (assuming only one instance exists)
-    # Get or create general settings (singleton pattern - only one instance)
-    # Don't force id=1 to avoid conflicts with database sequences
-    settings, created = General.objects.get_or_create()
-    # If multiple exist, use the first one
-    if not created and General.objects.count() > 1:
-        settings = General.objects.first()
+    # Cached general settings singleton (created on first use)
+    settings = General.load()
 
     if request.method == "POST":
         # Update settings with form data
@@ -2674,7 +2696,17 @@ def bulk_update_realtor_status(request):
     return redirect("realtor_list")  # Adjust to your realtor list URL
 
 
+def _realtor_status_validators(request, realtor_id):
+    if request.method != "GET":
+        return None, None
+    updated_at = Realtor.objects.filter(id=realtor_id).values_list("updated_at", flat=True).first()
+    if updated_at is None:
+        return None, None
+    return validators_from("realtor-status", realtor_id, updated_at)
+
+
 # Optional: API endpoint for AJAX status updates
+@conditional(_realtor_status_validators)
 def realtor_status_api(request, realtor_id):
     """
     API endpoint for realtor status operations.
@@ -2730,6 +2762,7 @@ def realtor_status_api(request, realtor_id):
 
 # /=====================================================
 
+@rate_limit("realtor_register")
 def realtor_register(request, referral_code=None):
     # Determine sponsor code
     sponsor_code = (
@@ -2876,19 +2909,13 @@ This is an automated message. Please do not reply to this email.
 For support, contact us through our official channels.
                 """.strip()
 
-                # Send the email
-                send_mail(
-                    subject=subject,
-                    message=message,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[email],
-                    fail_silently=False,
-                )
+                # Queue the email for the outbox worker
+                enqueue_email(subject, message, [email])
 
-                logger.info(f"Welcome email sent successfully to {email}")
+                logger.info(f"Welcome email queued for {email}")
                 messages.success(
                     request,
-                    "Registration successful! A welcome email with your referral details has been sent to your email address.",
+                    "Registration successful! A welcome email with your referral details is on its way to your email address.",
                 )
 
             except Exception as email_error:
@@ -3367,16 +3394,26 @@ def secretary_dashboard(request):
 # ====================================FRONTEND WEBSITE VIEWS================================================================================
 # ===================================                        =================================================================================
 
+@cache_public_page(General)
 def homepage(request):
     """Frontend website homepage"""
     return render(request, 'estate/index.html')
 
 
+@cache_public_page(General)
 def about(request):
     """Frontend website about page"""
     return render(request, 'estate/about.html')
 
 
+@never_cache
+def csrf_token(request):
+    """CSRF token for forms on cached public pages (fetched by their JS)"""
+    return JsonResponse({"csrfToken": get_token(request)})
+
+
+@cache_public_page(General)
+@rate_limit("contact")
 def contact(request):
     """Frontend website contact page with email functionality"""
     if request.method == 'POST':
@@ -3448,20 +3485,13 @@ Submitted on: {timezone.now().strftime('%B %d, %Y at %I:%M %p')}
 To reply, simply respond to this email or contact {email} directly.
         """.strip()
         
-        from django.core.mail import EmailMessage
-        
         try:
-            # Send email to the company using EmailMessage to support reply_to
-            email_msg = EmailMessage(
-                subject=full_subject,
-                body=email_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[settings.DEFAULT_FROM_EMAIL],
-                reply_to=[email],  # Set reply-to as the sender's email
+            # Queue email to the company, with reply-to set to the sender's email
+            company_email = build_email(
+                full_subject, email_message, [settings.DEFAULT_FROM_EMAIL], reply_to=[email]
             )
-            email_msg.send(fail_silently=False)
             
-            # Also send a confirmation email to the sender (this can stay as send_mail as it doesn't need reply_to)
+            # Also send a confirmation email to the sender
             confirmation_subject = "Thank you for contacting Triple D Big Dream Homes"
             confirmation_message = f"""
 Dear {name},
@@ -3490,16 +3520,12 @@ Best regards,
 The Triple D Big Dream Homes Team
             """.strip()
             
+            emails = [company_email]
             try:
-                send_mail(
-                    subject=confirmation_subject,
-                    message=confirmation_message,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[email],
-                    fail_silently=True,  # Don't fail if confirmation email fails
-                )
+                emails.append(build_email(confirmation_subject, confirmation_message, [email]))
             except Exception:
                 pass  # Ignore confirmation email errors
+            enqueue_emails(emails)
             
             logger.info(f"Contact form submitted successfully from {name} ({email})")
             
@@ -3519,24 +3545,57 @@ The Triple D Big Dream Homes Team
     return render(request, 'estate/contact.html')
 
 
+def _properties_validators(request):
+    """Listing changes whenever a property, its visibility or the site settings change"""
+    listing = WebsiteProperty.objects.aggregate(
+        visible=Count("id", filter=Q(is_visible=True)), latest=Max("updated_at")
+    )
+    general = General.load(create=False)
+    return validators_from(
+        "properties", listing["visible"], listing["latest"], general and general.updated_at
+    )
+
+
+def _property_detail_validators(request, id):
+    row = (
+        WebsiteProperty.objects.filter(id=id, is_visible=True)
+        .annotate(image_count=Count("images"), images_latest=Max("images__updated_at"))
+        .values("updated_at", "image_count", "images_latest")
+        .first()
+    )
+    if row is None:
+        return None, None  # let the view raise its 404
+    general = General.load(create=False)
+    return validators_from(
+        "property", id, row["updated_at"], row["image_count"], row["images_latest"],
+        general and general.updated_at,
+    )
+
+
+@cache_public_page(WebsiteProperty, General)
+@conditional(_properties_validators)
 def properties(request):
     """Frontend properties page"""
     properties = WebsiteProperty.objects.filter(is_visible=True).order_by('-created_at')
     return render(request, 'estate/properties.html', {'properties': properties})
 
 
+@cache_public_page(WebsiteProperty, WebsitePropertyImage, General)
+@conditional(_property_detail_validators)
 def frontend_property_detail(request, id):
     """Frontend property detail page"""
     property = get_object_or_404(WebsiteProperty, id=id, is_visible=True)
     return render(request, 'estate/property_detail.html', {'property': property})
 
 
+@cache_public_page(Gallery, General)
 def gallery(request):
     """Frontend gallery page with active gallery images"""
     gallery_images = Gallery.objects.filter(is_active=True).order_by('order', '-created_at')
     return render(request, 'estate/gallery.html', {'gallery_images': gallery_images})
 
 
+@cache_public_page(DownloadableForm, General)
 def downloadables(request):
     """Frontend downloadables page with active forms"""
     forms = DownloadableForm.objects.filter(is_active=True).order_by('order', '-created_at')
@@ -3722,13 +3781,17 @@ def download_form(request, form_id):
     """Track download and serve the form file"""
     form_obj = get_object_or_404(DownloadableForm, id=form_id, is_active=True)
     
-    # Increment download count
-    form_obj.download_count += 1
-    form_obj.save(update_fields=['download_count'])
+    # Increment download count (buffered, see tripled/counters.py); resumed
+    # downloads ask for a later byte range and aren't counted again
+    if request.META.get('HTTP_RANGE', 'bytes=0-').startswith('bytes=0-'):
+        increment_download(form_obj.id)
     
-    # Serve the file
+    # Serve the file (offloaded to the web server when FILE_DELIVERY is set)
     try:
-        return FileResponse(form_obj.file.open('rb'), as_attachment=True, filename=os.path.basename(form_obj.file.name))
+        # Stored names are content hashes, so name the download after the form
+        extension = os.path.splitext(form_obj.file.name)[1]
+        filename = f"{slugify(form_obj.name) or 'form'}{extension}"
+        return serve_file(request, form_obj.file, as_attachment=True, filename=filename)
     except Exception as e:
         raise Http404("File not found")
 
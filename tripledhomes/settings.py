@@ -10,9 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import importlib.util
 import os
 from pathlib import Path
 from decouple import config, Csv
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -65,8 +67,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     # Role-based security middleware
     'tripled.middleware.RoleDiscoveryMiddleware',
-    'tripled.middleware.PortalSecurityMiddleware',
-    'account.middleware.AccountingSecurityMiddleware',
+    'tripled.middleware.PortalSecurityMiddleware',  # Also guards the accounting app
 ]
 
 ROOT_URLCONF = 'tripledhomes.urls'
@@ -141,11 +142,6 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
-# WhiteNoise Configuration for Static Files
-# WhiteNoise comes with a storage backend that automatically compresses your files
-# and creates unique names for each version so they can safely be cached forever
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
-
 # WhiteNoise settings
 WHITENOISE_USE_FINDERS = True  # Use Django's finders for development
 WHITENOISE_AUTOREFRESH = True  # Automatically refresh static files in development
@@ -155,12 +151,107 @@ WHITENOISE_MANIFEST_STRICT = False  # Don't raise errors if a file is missing fr
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads are stored once per distinct content (see tripled/storage.py).
+# Django 5.x reads storage backends only from STORAGES; static files keep
+# the plain storage they have always been served with.
+STORAGES = {
+    "default": {"BACKEND": "tripled.storage.ContentAddressedStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+# How downloads and protected media are delivered (see tripled/delivery.py):
+# 'django' streams them from Python, 'x-accel' (nginx) or 'x-sendfile'
+# (Apache/lighttpd) hand the transfer to the front web server.
+FILE_DELIVERY = config('FILE_DELIVERY', default='django')
+FILE_DELIVERY_ACCEL_PREFIX = config('FILE_DELIVERY_ACCEL_PREFIX', default='/protected-media/')
+FILE_DELIVERY_PRIVATE_ACCEL_PREFIX = config('FILE_DELIVERY_PRIVATE_ACCEL_PREFIX', default='/protected-private-media/')
+
+# Personal data such as client pictures (tripled.storage.PrivateStorage). Keep
+# it outside MEDIA_ROOT and any location the web server serves publicly.
+PRIVATE_MEDIA_ROOT = config('PRIVATE_MEDIA_ROOT', default=os.path.join(BASE_DIR, 'private_media'))
+
+# Token-bucket limits for the public forms (see tripled/ratelimit.py):
+# (capacity, period in seconds) per client IP and per submitted email address.
+RATE_LIMIT_ENABLED = config('RATE_LIMIT_ENABLED', default=True, cast=bool)
+# Reverse proxies in front of Django that append to X-Forwarded-For: 1 for the
+# nginx of the deployment, 0 when Django faces clients directly (REMOTE_ADDR)
+RATE_LIMIT_PROXY_COUNT = config('RATE_LIMIT_PROXY_COUNT', default=1, cast=int)
+RATE_LIMITS = {
+    'contact': {'ip': (5, 600), 'email': (3, 3600)},
+    'realtor_register': {'ip': (10, 3600), 'email': (3, 3600)},
+    'password_reset': {'ip': (5, 900), 'email': (3, 3600)},
+    'realtors_check': {'ip': (30, 60)},
+    # Failed sign-ins only; see EmailOrUsernameBackend
+    'login': {'ip': (20, 600), 'account': (5, 900)},
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache shared by the page cache, counters, rate limits, sessions and
+# tripled.cache_keys. Most of them rely on every worker seeing the same cache,
+# so CACHE_BACKEND defaults to one that is shared:
+#   file      - a directory on local disk, shared by the workers of one host (default)
+#   redis     - a Redis-compatible server, e.g. redis://127.0.0.1:6379/1 (pip install redis)
+#   memcached - a memcached-compatible server, e.g. 127.0.0.1:11211 (pip install pymemcache)
+#   locmem    - per process: only for runserver and tests, never behind several workers
+#   dummy     - caches nothing
+# Any local server speaking the same protocol can stand in for the real one.
+CACHE_BACKEND = config('CACHE_BACKEND', default='file')
+_CACHE_BACKENDS = {
+    # name: (backend, default LOCATION, client module it needs)
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / 'cache'), None),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1', 'redis'),
+    'memcached': ('django.core.cache.backends.memcached.PyMemcacheCache', '127.0.0.1:11211', 'pymemcache'),
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'tripledhomes', None),
+    'dummy': ('django.core.cache.backends.dummy.DummyCache', '', None),
+}
+if CACHE_BACKEND not in _CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        f"Unknown CACHE_BACKEND {CACHE_BACKEND!r}; use one of: {', '.join(_CACHE_BACKENDS)}"
+    )
+_cache_backend, _cache_location, _cache_client = _CACHE_BACKENDS[CACHE_BACKEND]
+if _cache_client and importlib.util.find_spec(_cache_client) is None:
+    raise ImproperlyConfigured(
+        f"CACHE_BACKEND={CACHE_BACKEND} needs the {_cache_client!r} package (pip install {_cache_client})"
+    )
+CACHES = {
+    'default': {
+        'BACKEND': _cache_backend,
+        'LOCATION': config('CACHE_LOCATION', default=_cache_location),
+        'KEY_PREFIX': config('CACHE_KEY_PREFIX', default=''),
+        'TIMEOUT': config('CACHE_TIMEOUT', default=300, cast=int),
+    },
+}
+if CACHE_BACKEND in ('locmem', 'file'):
+    # Their default of 300 entries is too few for the page cache and rate limits
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=10000, cast=int)}
+# Whether every worker sees the same cache. Code that invalidates across
+# workers (roles, sessions, buffered counters) falls back to not caching
+# when it doesn't.
+CACHE_IS_SHARED = CACHE_BACKEND in ('file', 'redis', 'memcached')
+# Whether incr/decr are atomic. FileBasedCache reads, changes and rewrites
+# the file, and culls entries at random once full, so counters buffered in
+# the cache (tripled/counters.py) need redis or memcached.
+CACHE_HAS_ATOMIC_INCR = CACHE_BACKEND in ('redis', 'memcached')
+
+# Sessions only hold the login, so they can live in the cache (cached_db: cache
+# first, database as the fallback) or in a signed cookie (no database at all;
+# a session can't be revoked server-side before it expires). cached_db is only
+# the default with a shared cache: with a per-process one, other workers would
+# keep serving a session that was logged out, so sessions stay in the database.
+SESSION_ENGINE = config(
+    'SESSION_ENGINE',
+    default='django.contrib.sessions.backends.cached_db' if CACHE_IS_SHARED
+    else 'django.contrib.sessions.backends.db',
+)
+# Flash messages ride in a cookie instead of being written to the session
+MESSAGE_STORAGE = config('MESSAGE_STORAGE', default='django.contrib.messages.storage.cookie.CookieStorage')
+
 # Authentication settings
+AUTHENTICATION_BACKENDS = ['tripled.backends.EmailOrUsernameBackend']  # username or email, throttled
 LOGIN_URL = '/admin-portal/signin/'  # Updated for new URL structure
 LOGIN_REDIRECT_URL = '/admin-portal/'
 LOGOUT_REDIRECT_URL = '/admin-portal/signin/'